@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apiMZD.settings')
+# Las lecturas más frecuentes de api_clients usan las vistas async (aiobotocore,
+# que se instala con requirements-asgi.txt)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
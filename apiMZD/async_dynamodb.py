@@ -0,0 +1,145 @@
+"""
+Cliente asíncrono de DynamoDB (aiobotocore) para las vistas async.
+
+Bajo ASGI las vistas async comparten un solo cliente por event loop, con la
+misma configuración (pool, reintentos, timeouts) que el cliente síncrono de
+apiMZD.dynamodb. Un worker puede así tener muchas consultas en vuelo sin
+ocupar un hilo por cada una.
+
+Las funciones reciben y devuelven items en el formato de boto3 (Decimal,
+set, ...) y aceptan las condiciones de boto3.dynamodb.conditions, así que el
+código de las vistas se parece al de los repositorios síncronos.
+
+aiobotocore no está en requirements.txt: se instala con requirements-asgi.txt,
+que fija boto3/botocore en las versiones que acepta.
+"""
+
+import asyncio
+import weakref
+
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from django.conf import settings
+
+from .dynamodb import client_config
+from .metrics import install_hooks
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+_session = None
+# Un cliente por event loop: las conexiones de aiohttp no se pueden compartir entre loops
+_clients = weakref.WeakKeyDictionary()
+_client_locks = weakref.WeakKeyDictionary()
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        from aiobotocore.session import get_session
+
+        _session = get_session()
+    return _session
+
+
+async def get_client():
+    """Returns the DynamoDB client of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is not None:
+        return client
+
+    lock = _client_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        if loop not in _clients:
+            from aiobotocore.config import AioConfig
+
+            context = _get_session().create_client('dynamodb', config=client_config(AioConfig))
+            client = await context.__aenter__()
+            install_hooks(client)
+            _clients[loop] = client
+    return _clients[loop]
+
+
+async def close_client():
+    """Closes the client of the running event loop (scripts and benchmarks)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.__aexit__(None, None, None)
+
+
+def serialize_item(item):
+    return {name: _serializer.serialize(value) for name, value in item.items()}
+
+
+def deserialize_item(item):
+    return {name: _deserializer.deserialize(value) for name, value in item.items()}
+
+
+def _expression_kwargs(key_condition=None, filter_expression=None):
+    """Turns boto3 conditions into the expression parameters of the low-level API."""
+    builder = ConditionExpressionBuilder()
+    kwargs, names, values = {}, {}, {}
+    for parameter, condition, is_key_condition in (
+        ('KeyConditionExpression', key_condition, True),
+        ('FilterExpression', filter_expression, False),
+    ):
+        if condition is None:
+            continue
+        expression = builder.build_expression(condition, is_key_condition=is_key_condition)
+        kwargs[parameter] = expression.condition_expression
+        names.update(expression.attribute_name_placeholders)
+        values.update(expression.attribute_value_placeholders)
+    if names:
+        kwargs['ExpressionAttributeNames'] = names
+    if values:
+        kwargs['ExpressionAttributeValues'] = serialize_item(values)
+    return kwargs
+
+
+async def get_item(table_name, key, **kwargs):
+    """Returns the item stored under `key`, or None if it does not exist."""
+    client = await get_client()
+    response = await client.get_item(TableName=table_name, Key=serialize_item(key), **kwargs)
+    item = response.get('Item')
+    return deserialize_item(item) if item else None
+
+
+async def query_page(table_name, key_condition, filter_expression=None, exclusive_start_key=None, **kwargs):
+    """
+    Runs a single query. Returns (items, last_evaluated_key), both already
+    converted to boto3 types.
+    """
+    client = await get_client()
+    expression_kwargs = _expression_kwargs(key_condition, filter_expression)
+    # Los nombres de un ProjectionExpression (#p0...) se combinan con los de las condiciones
+    names = {**kwargs.pop('ExpressionAttributeNames', {}), **expression_kwargs.pop('ExpressionAttributeNames', {})}
+    query_kwargs = {'TableName': table_name, **kwargs, **expression_kwargs}
+    if names:
+        query_kwargs['ExpressionAttributeNames'] = names
+    if exclusive_start_key:
+        query_kwargs['ExclusiveStartKey'] = serialize_item(exclusive_start_key)
+    response = await client.query(**query_kwargs)
+    last_evaluated_key = response.get('LastEvaluatedKey')
+    return (
+        [deserialize_item(item) for item in response.get('Items', [])],
+        deserialize_item(last_evaluated_key) if last_evaluated_key else None,
+    )
+
+
+async def query_all(table_name, key_condition, filter_expression=None, **kwargs):
+    """Yields every item of a query, requesting the next page once the previous one is consumed."""
+    exclusive_start_key = None
+    while True:
+        items, exclusive_start_key = await query_page(
+            table_name, key_condition, filter_expression, exclusive_start_key, **kwargs
+        )
+        for item in items:
+            yield item
+        if not exclusive_start_key:
+            return
+
+
+def table_name(setting):
+    """Returns the table name stored in the Django setting `setting`."""
+    return getattr(settings, setting)
@@ -0,0 +1,128 @@
+"""
+Versiones async de las lecturas más frecuentes de los repositorios.
+
+Usan el cliente de apiMZD.async_dynamodb y las mismas entradas de caché que
+los repositorios síncronos, así que las escrituras de las vistas síncronas
+invalidan también lo que leen las vistas async.
+"""
+
+import asyncio
+
+from boto3.dynamodb.conditions import Key
+from django.conf import settings
+
+from . import async_dynamodb
+from .phone import to_e164
+from .repositories import ClientRepo, MessageRepo, with_projection
+
+
+async def _next_or_none(iterator):
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class AsyncClientRepo:
+    table_setting = 'CLIENT_TABLE_NAME'
+
+    async def get(self, client_id, fields=None):
+        async def load():
+            return await async_dynamodb.get_item(
+                async_dynamodb.table_name(self.table_setting), {'client_id': client_id}, **with_projection({}, fields),
+            )
+
+        if fields:
+            return await load()
+        return await ClientRepo.by_id.aget_or_load(client_id, load)
+
+    async def _query_index(self, index_name, attribute, value, fields=None):
+        items, _ = await async_dynamodb.query_page(
+            async_dynamodb.table_name(self.table_setting), Key(attribute).eq(value),
+            **with_projection({'IndexName': index_name}, fields),
+        )
+        return items
+
+    async def find_by_email(self, email, fields=None):
+        if fields:
+            return await self._query_index('email-index', 'email', email, fields)
+        return await ClientRepo.by_email.aget_or_load(email, lambda: self._query_index('email-index', 'email', email))
+
+    async def find_by_number(self, number, fields=None):
+        if settings.PHONE['E164_LOOKUPS']:
+            return await self.find_by_number_e164(to_e164(number), fields)
+        if fields:
+            return await self._query_index('number-index', 'number', number, fields)
+        return await ClientRepo.by_number.aget_or_load(number, lambda: self._query_index('number-index', 'number', number))
+
+    async def find_by_number_e164(self, number_e164, fields=None):
+        if number_e164 is None:
+            return []
+        if fields:
+            return await self._query_index('number_e164-index', 'number_e164', number_e164, fields)
+        return await ClientRepo.by_number_e164.aget_or_load(
+            number_e164, lambda: self._query_index('number_e164-index', 'number_e164', number_e164)
+        )
+
+    async def find_by_name(self, name, fields=None):
+        if fields:
+            return await self._query_index('name-index', 'name', name, fields)
+        # Misma entrada de caché que ClientRepo.find_by_name, con la misma proyección
+        return await ClientRepo.by_name.aget_or_load(
+            name, lambda: self._query_index('name-index', 'name', name, ClientRepo.NAME_LOOKUP_FIELDS)
+        )
+
+
+class AsyncEventRepo:
+    table_setting = 'EVENT_TABLE_NAME'
+
+    def iter_by_client(self, client_id, page_size=100, fields=None):
+        return async_dynamodb.query_all(
+            async_dynamodb.table_name(self.table_setting),
+            Key('client_id').eq(client_id),
+            **with_projection({'IndexName': 'client_id-index', 'Limit': page_size}, fields),
+        )
+
+
+class AsyncMessageRepo:
+    table_setting = 'MESSAGE_TABLE_NAME'
+
+    async def iter_conversation(self, numero, before=None, page_size=None, fields=None):
+        """
+        Async version of MessageRepo.iter_conversation: yields every message
+        sent from or to `numero`, newest first, without duplicates. The first
+        page of both indexes is requested concurrently.
+        """
+        table_name = async_dynamodb.table_name(self.table_setting)
+        sources = []
+        for attribute in MessageRepo.NUMBER_ATTRIBUTES:
+            index_name, key_condition = MessageRepo.number_key(attribute, numero)
+            if before:
+                key_condition &= Key('fecha').lt(before)
+            query_kwargs = {'IndexName': index_name, 'ScanIndexForward': False}
+            if page_size:
+                query_kwargs['Limit'] = page_size
+            sources.append(async_dynamodb.query_all(table_name, key_condition, **with_projection(query_kwargs, fields)))
+
+        heads = list(await asyncio.gather(*(_next_or_none(source) for source in sources)))
+        # Merge de dos fuentes ordenadas por fecha descendente; en empates gana la primera, como heapq.merge
+        current_fecha, seen = None, set()
+        while any(head is not None for head in heads):
+            index = max(
+                (i for i, head in enumerate(heads) if head is not None),
+                key=lambda i: heads[i]['fecha'],
+            )
+            message = heads[index]
+            heads[index] = await _next_or_none(sources[index])
+
+            if message['fecha'] != current_fecha:
+                current_fecha, seen = message['fecha'], set()
+            if message['id_chat'] in seen:
+                continue
+            seen.add(message['id_chat'])
+            yield message
+
+
+async_client_repo = AsyncClientRepo()
+async_event_repo = AsyncEventRepo()
+async_message_repo = AsyncMessageRepo()
@@ -0,0 +1,102 @@
+"""
+Caché de lectura (read-through) para búsquedas puntuales en DynamoDB.
+
+Usa el framework de caché de Django con el alias "dynamodb" (LocMemCache por
+defecto: LRU en memoria con TTL); se puede apuntar a Redis/Memcached desde
+settings.CACHES sin tocar el código. Los repositorios invalidan las entradas
+en cada escritura.
+"""
+
+import hashlib
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+
+CACHE_ALIAS = 'dynamodb'
+
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _record(namespace, outcome):
+    with _stats_lock:
+        _stats[(namespace, outcome)] += 1
+
+
+def cache_stats():
+    """Returns the hit/miss counters of this process, per namespace."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+
+    stats = {}
+    for (namespace, outcome), count in snapshot.items():
+        stats.setdefault(namespace, {'hits': 0, 'misses': 0})[outcome] = count
+    for counters in stats.values():
+        total = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / total, 4) if total else None
+    return stats
+
+
+class ItemCache:
+    """
+    Read-through cache for one kind of lookup, e.g. ItemCache('client:email').
+
+    Values are cached under "<namespace>:<hash of the lookup value>" so keys
+    stay valid for any backend (emails and names may contain spaces).
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    @property
+    def cache(self):
+        return caches[CACHE_ALIAS]
+
+    def key(self, value):
+        digest = hashlib.sha1(str(value).encode()).hexdigest()
+        return f'{self.namespace}:{digest}'
+
+    def get_or_load(self, value, loader):
+        """
+        Returns the cached result for `value`, calling `loader()` on a miss.
+        Empty results (None or []) are not cached.
+        """
+        key = self.key(value)
+        result = self.cache.get(key, _MISSING)
+        if result is not _MISSING:
+            _record(self.namespace, 'hits')
+            return result
+
+        _record(self.namespace, 'misses')
+        result = loader()
+        if result:
+            self.cache.set(key, result)
+        return result
+
+    async def aget_or_load(self, value, loader):
+        """
+        Async version of get_or_load; `loader` is a coroutine function.
+
+        The cache itself is still called synchronously: LocMemCache never
+        blocks, and Django's async cache methods only run the same calls in
+        a thread.
+        """
+        key = self.key(value)
+        result = self.cache.get(key, _MISSING)
+        if result is not _MISSING:
+            _record(self.namespace, 'hits')
+            return result
+
+        _record(self.namespace, 'misses')
+        result = await loader()
+        if result:
+            self.cache.set(key, result)
+        return result
+
+    def invalidate(self, *values):
+        """Drops the entries of the given lookup values (None values are ignored)."""
+        keys = [self.key(value) for value in values if value is not None]
+        if keys:
+            self.cache.delete_many(keys)
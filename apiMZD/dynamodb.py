@@ -0,0 +1,392 @@
+"""
+Helpers compartidos para operaciones de DynamoDB usadas por varias apps.
+
+Mantiene una única sesión de boto3 (y su pool de conexiones) por proceso y
+agrupa la paginación de consultas y las escrituras por lotes (BatchWriteItem)
+para que las vistas no repitan los mismos bucles.
+"""
+
+import contextvars
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from django.conf import settings
+
+from .metrics import install_hooks
+
+# BatchWriteItem acepta como máximo 25 solicitudes por llamada y BatchGetItem 100 llaves
+BATCH_WRITE_LIMIT = 25
+BATCH_GET_LIMIT = 100
+
+_dynamodb = None
+_dynamodb_lock = threading.Lock()
+_executor = None
+_stream_executor = None
+
+
+def client_config(config_class=None):
+    """
+    Builds the client Config from the DYNAMODB setting. `config_class` lets
+    the async client (apiMZD.async_dynamodb) reuse it with AioConfig.
+    """
+    if config_class is None:
+        from botocore.config import Config as config_class
+
+    options = settings.DYNAMODB
+    return config_class(
+        region_name=options['REGION_NAME'],
+        max_pool_connections=options['MAX_POOL_CONNECTIONS'],
+        retries={
+            'mode': options['RETRY_MODE'],
+            'max_attempts': options['MAX_ATTEMPTS'],
+        },
+        connect_timeout=options['CONNECT_TIMEOUT'],
+        read_timeout=options['READ_TIMEOUT'],
+        tcp_keepalive=options['TCP_KEEPALIVE'],
+    )
+
+
+def get_dynamodb():
+    """
+    Returns the DynamoDB resource shared by every table of the process.
+
+    The session and resource are built on first use, so importing the views
+    (e.g. during a Lambda cold start or `manage.py check`) does not load the
+    botocore service models until a request actually needs DynamoDB.
+    """
+    global _dynamodb
+    if _dynamodb is None:
+        with _dynamodb_lock:
+            if _dynamodb is None:
+                import boto3
+
+                session = boto3.session.Session()
+                resource = session.resource('dynamodb', config=client_config())
+                install_hooks(resource.meta.client)
+                _dynamodb = resource
+    return _dynamodb
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that runs each task in a copy of the submitter's
+    context, so the calls made by the workers count for the request that
+    submitted them (see apiMZD.metrics).
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def get_executor():
+    """
+    Returns the thread pool shared by the parallel DynamoDB helpers, sized by
+    DYNAMODB['MAX_WORKERS'].
+    """
+    global _executor
+    if _executor is None:
+        with _dynamodb_lock:
+            if _executor is None:
+                _executor = ContextThreadPoolExecutor(
+                    max_workers=settings.DYNAMODB['MAX_WORKERS'],
+                    thread_name_prefix='dynamodb',
+                )
+    return _executor
+
+
+def get_stream_executor():
+    """
+    Returns the thread pool of the streaming scans (scan_parallel), sized by
+    DYNAMODB['STREAM_WORKERS']. It is separate from get_executor(): a
+    streamed scan holds its threads for as long as the client takes to read
+    the response, which must not starve the request-scoped helpers.
+    """
+    global _stream_executor
+    if _stream_executor is None:
+        with _dynamodb_lock:
+            if _stream_executor is None:
+                _stream_executor = ContextThreadPoolExecutor(
+                    max_workers=settings.DYNAMODB['STREAM_WORKERS'],
+                    thread_name_prefix='dynamodb-stream',
+                )
+    return _stream_executor
+
+
+def query_all(table, **query_kwargs):
+    """
+    Yields every item matching a query, following LastEvaluatedKey until the
+    last page has been read.
+    """
+    while True:
+        response = table.query(**query_kwargs)
+        yield from response.get('Items', [])
+
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            break
+        query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+
+def count_all(table, **query_kwargs):
+    """
+    Returns how many items match a query (after its FilterExpression), adding
+    up the Count of every page. Items are not transferred (Select='COUNT').
+    """
+    query_kwargs['Select'] = 'COUNT'
+    total = 0
+    while True:
+        response = table.query(**query_kwargs)
+        total += response['Count']
+
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            return total
+        query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+
+def query_all_async(table, **query_kwargs):
+    """
+    Like `query_all`, but the first page is requested right away in the shared
+    executor, so several queries created one after the other run concurrently.
+    Following pages are requested only when the previous one has been consumed.
+    """
+    future = get_executor().submit(table.query, **query_kwargs)
+
+    def items():
+        response = future.result()
+        while True:
+            yield from response.get('Items', [])
+
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                return
+            query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+            response = table.query(**query_kwargs)
+
+    return items()
+
+
+def scan_pages(table, **scan_kwargs):
+    """
+    Yields every page (the raw response, with Items and LastEvaluatedKey) of
+    a scan or of one scan segment.
+    """
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield response
+
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+
+def scan_all(table, **scan_kwargs):
+    """Yields every item of a scan (or of one scan segment) across all of its pages."""
+    for response in scan_pages(table, **scan_kwargs):
+        yield from response.get('Items', [])
+
+
+def scan_segments(table, total_segments, handle_segment, **scan_kwargs):
+    """
+    Parallel scan: reads the table as `total_segments` segments on the shared
+    executor, calling `handle_segment(segment, items)` for each one with an
+    iterator over the items of that segment.
+
+    Returns:
+    - The values returned by `handle_segment`, in segment order.
+    """
+    def run(segment):
+        items = scan_all(table, Segment=segment, TotalSegments=total_segments, **scan_kwargs)
+        return handle_segment(segment, items)
+
+    futures = [get_executor().submit(run, segment) for segment in range(total_segments)]
+    return [future.result() for future in futures]
+
+
+def scan_parallel(table, total_segments, **scan_kwargs):
+    """
+    Yields every item of a parallel scan of `total_segments` segments as
+    their pages arrive (segments interleaved, no particular order).
+
+    The segments run on the streaming executor (get_stream_executor) and
+    wait while 2 pages per segment are pending, so memory stays bounded when
+    the consumer (e.g. a streamed response) is slower than DynamoDB; scans
+    beyond the pool's threads wait for a running one to finish. Closing the
+    generator stops the segments after their current page; an error in a
+    segment is raised to the consumer.
+    """
+    pages = queue.Queue(maxsize=2 * total_segments)
+    stop = threading.Event()
+    done = object()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run(segment):
+        try:
+            for response in scan_pages(table, Segment=segment, TotalSegments=total_segments, **scan_kwargs):
+                if stop.is_set():
+                    return
+                if response.get('Items'):
+                    put(response['Items'])
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    executor = get_stream_executor()
+    for segment in range(total_segments):
+        executor.submit(run, segment)
+    pending = total_segments
+    try:
+        while pending:
+            value = pages.get()
+            if value is done:
+                pending -= 1
+            elif isinstance(value, Exception):
+                raise value
+            else:
+                yield from value
+    finally:
+        stop.set()
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def backoff(attempt, base_delay, max_delay):
+    """
+    Sleeps before retry number `attempt`: exponential backoff with "full
+    jitter", capped at `max_delay` seconds. Also used by the event
+    write-behind worker (api_events/write_behind.py).
+    """
+    time.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+
+
+def _write_chunk(table, chunk, max_attempts, base_delay, max_delay):
+    """Sends one chunk of up to 25 requests; returns those left unprocessed."""
+    pending = chunk
+    for attempt in range(max_attempts):
+        response = table.meta.client.batch_write_item(RequestItems={table.name: pending})
+        pending = response.get('UnprocessedItems', {}).get(table.name, [])
+        if not pending:
+            break
+        if attempt < max_attempts - 1:
+            backoff(attempt, base_delay, max_delay)
+    return pending
+
+
+def batch_write(table, requests, concurrency=1, max_attempts=8, base_delay=0.05, max_delay=2.0):
+    """
+    Sends PutRequest/DeleteRequest entries through BatchWriteItem in chunks
+    of 25, retrying UnprocessedItems with exponential backoff.
+
+    Arguments:
+    - table: The boto3 Table resource to write to.
+    - requests: Iterable of write requests, e.g. {'PutRequest': {'Item': {...}}}.
+    - concurrency: How many chunks may be in flight at once on the shared
+      executor; 1 writes them one after the other in the calling thread.
+    - max_attempts: How many times a chunk is sent before giving up on it.
+
+    Returns:
+    - The list of requests that were still unprocessed after the last attempt.
+    """
+    failed = []
+    chunks = _chunks(requests, BATCH_WRITE_LIMIT)
+
+    if concurrency <= 1:
+        for chunk in chunks:
+            failed.extend(_write_chunk(table, chunk, max_attempts, base_delay, max_delay))
+        return failed
+
+    # Como mucho `concurrency` chunks en vuelo, para no leer todo `requests` a memoria
+    executor = get_executor()
+    in_flight = set()
+    for chunk in chunks:
+        if len(in_flight) >= concurrency:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                failed.extend(future.result())
+        in_flight.add(executor.submit(_write_chunk, table, chunk, max_attempts, base_delay, max_delay))
+
+    for future in in_flight:
+        failed.extend(future.result())
+    return failed
+
+
+def projection_kwargs(fields):
+    """
+    Builds ProjectionExpression/ExpressionAttributeNames for `fields`, using
+    placeholders so reserved words (name, number, timestamp...) are valid.
+    """
+    names = {f'#p{i}': field for i, field in enumerate(fields)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+    }
+
+
+def _get_chunk(table, keys, fields, max_attempts, base_delay, max_delay):
+    """Reads one chunk of up to 100 keys; returns (items, unprocessed keys)."""
+    request = {'Keys': keys}
+    if fields:
+        request.update(projection_kwargs(fields))
+
+    items = []
+    for attempt in range(max_attempts):
+        response = table.meta.client.batch_get_item(RequestItems={table.name: request})
+        items.extend(response.get('Responses', {}).get(table.name, []))
+        unprocessed = response.get('UnprocessedKeys', {}).get(table.name)
+        if not unprocessed:
+            return items, []
+        request = unprocessed
+        if attempt < max_attempts - 1:
+            backoff(attempt, base_delay, max_delay)
+    return items, request['Keys']
+
+
+def batch_get(table, keys, fields=None, concurrency=4, max_attempts=8, base_delay=0.05, max_delay=2.0):
+    """
+    Reads `keys` through BatchGetItem in chunks of 100 running concurrently on
+    the shared executor, retrying UnprocessedKeys with exponential backoff.
+
+    Arguments:
+    - keys: List of primary keys (duplicates are not allowed by DynamoDB).
+    - fields: Optional attribute names to project; must include the key attributes
+      if the caller needs to match items back to their keys.
+
+    Returns:
+    - (items, unprocessed_keys), items in no particular order.
+    """
+    chunks = list(_chunks(keys, BATCH_GET_LIMIT))
+    if len(chunks) <= 1 or concurrency <= 1:
+        results = [_get_chunk(table, chunk, fields, max_attempts, base_delay, max_delay) for chunk in chunks]
+    else:
+        executor = get_executor()
+        futures = [
+            executor.submit(_get_chunk, table, chunk, fields, max_attempts, base_delay, max_delay)
+            for chunk in chunks
+        ]
+        results = [future.result() for future in futures]
+
+    items, unprocessed = [], []
+    for chunk_items, chunk_unprocessed in results:
+        items.extend(chunk_items)
+        unprocessed.extend(chunk_unprocessed)
+    return items, unprocessed
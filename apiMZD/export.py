@@ -0,0 +1,417 @@
+"""
+Exportación de tablas completas a archivos, para análisis fuera de la API
+(ver `manage.py export_table`).
+
+La tabla se lee con un scan paralelo de N segmentos en el executor
+compartido. Cada segmento escribe sus propios archivos
+(part-s003-00012.ndjson.gz o .parquet) con a lo más `chunk_items` items; cada
+archivo se escribe como .tmp y se renombra al cerrarse, así un archivo con su
+nombre final siempre está completo. En memoria hay una página del scan por
+segmento (hasta 1 MB) y, en Parquet, las filas del archivo en curso.
+
+Al cerrar cada archivo se guarda checkpoint.json con la LastEvaluatedKey de
+cada segmento; una exportación interrumpida se reanuda desde el último
+archivo completo de cada segmento. Al terminar se escribe manifest.json con
+los archivos, el total de items, la capacidad consumida y el throughput.
+
+Con un atributo de tiempo (eventos: timestamp, mensajes: fecha) el manifest
+guarda también el valor más reciente exportado ("watermark", con su tipo de
+DynamoDB: {"S": "..."} o {"N": "..."}); una exportación incremental sólo
+escribe los items posteriores. El scan sigue leyendo (y
+cobrando) la tabla completa, pero transfiere y escribe sólo lo nuevo. Los
+items escritos después con un tiempo anterior al watermark no se exportan.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, wait
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import orjson
+from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+
+from .dynamodb import get_executor, scan_pages
+from .renderers import orjson_default, render_ndjson_line
+
+CHECKPOINT = 'checkpoint.json'
+MANIFEST = 'manifest.json'
+FORMATS = ('ndjson', 'parquet')
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+class ExportError(Exception):
+    """The export cannot start, resume or finish; the message says why."""
+
+
+class NDJSONPartWriter:
+    """One gzip-compressed newline-delimited JSON file, written as it goes."""
+
+    extension = '.ndjson.gz'
+
+    @staticmethod
+    def check():
+        pass
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp_path = path.with_name(path.name + '.tmp')
+        self._file = gzip.open(self._tmp_path, 'wb', compresslevel=6)
+
+    def write(self, items):
+        self._file.write(b''.join(render_ndjson_line(item) for item in items))
+
+    def close(self):
+        """Finishes the file and returns its size in bytes."""
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path.stat().st_size
+
+
+def parquet_value(value):
+    """A DynamoDB value as a Parquet cell: numbers as int/float, maps, lists and sets as JSON text."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (dict, list, set, frozenset)):
+        return orjson.dumps(value, default=orjson_default).decode()
+    if isinstance(value, Binary):
+        return value.value
+    return value
+
+
+def parquet_columns(rows):
+    """
+    Column name -> values of `rows`. DynamoDB items have no schema, so a
+    column whose values mix types (e.g. numbers and strings) is written as
+    text.
+    """
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    columns = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        kinds = {
+            'bool' if isinstance(value, bool) else 'number' if isinstance(value, (int, float)) else type(value).__name__
+            for value in values if value is not None
+        }
+        if len(kinds) > 1:
+            values = [None if value is None else str(value) for value in values]
+        columns[name] = values
+    return columns
+
+
+class ParquetPartWriter:
+    """One Parquet file (zstd); its rows are kept in memory until it is closed."""
+
+    extension = '.parquet'
+
+    def __init__(self, path):
+        self.path = path
+        self._rows = []
+
+    @staticmethod
+    def check():
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportError("El formato parquet necesita pyarrow (pip install pyarrow).")
+
+    def write(self, items):
+        self._rows.extend({name: parquet_value(value) for name, value in item.items()} for item in items)
+
+    def close(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        pyarrow.parquet.write_table(pyarrow.table(parquet_columns(self._rows)), tmp_path, compression='zstd')
+        self._rows = []
+        os.replace(tmp_path, self.path)
+        return self.path.stat().st_size
+
+
+WRITERS = {'ndjson': NDJSONPartWriter, 'parquet': ParquetPartWriter}
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def write_json(path, data):
+    """Writes `data` to `path` atomically (a crash leaves the previous version)."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    return json.loads(path.read_text())
+
+
+def encode_watermark(value):
+    """
+    `value` (a watermark or `since`) as stored in checkpoint.json and
+    manifest.json: with its DynamoDB type, since a numeric attribute gives a
+    Decimal that JSON cannot hold. None stays None.
+    """
+    return _serializer.serialize(value) if value is not None else None
+
+
+def decode_watermark(data):
+    """The value stored by encode_watermark (plain values of older manifests are returned as they are)."""
+    if isinstance(data, dict):
+        return _deserializer.deserialize(data)
+    return data
+
+
+def run_dirs(output, name):
+    """The export directories of table `name` under `output`, oldest first."""
+    base = Path(output) / name
+    if not base.is_dir():
+        return []
+    return sorted(path for path in base.iterdir() if path.is_dir())
+
+
+def last_watermark(output, name):
+    """The watermark of the newest finished export of `name`, or None."""
+    for run_dir in reversed(run_dirs(output, name)):
+        if (run_dir / MANIFEST).exists():
+            return decode_watermark(read_json(run_dir / MANIFEST).get('watermark'))
+    return None
+
+
+def unfinished_run(output, name):
+    """The newest export directory of `name` with a checkpoint and no manifest, or None."""
+    for run_dir in reversed(run_dirs(output, name)):
+        if (run_dir / MANIFEST).exists():
+            return None
+        if (run_dir / CHECKPOINT).exists():
+            return run_dir
+    return None
+
+
+class Progress:
+    """Thread-safe counters shared by the segments of an export."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.items = 0
+        self.scanned = 0
+        self.capacity = 0.0
+
+    def add(self, items, scanned, capacity):
+        with self._lock:
+            self.items += items
+            self.scanned += scanned
+            self.capacity += capacity
+
+    def snapshot(self):
+        with self._lock:
+            seconds = time.monotonic() - self.started
+            return {
+                'items': self.items,
+                'scanned': self.scanned,
+                'consumed_capacity': round(self.capacity, 1),
+                'seconds': round(seconds, 1),
+                'items_per_second': round(self.items / seconds, 1) if seconds else 0.0,
+            }
+
+
+class TableExport:
+    """
+    Parallel export of one table into `run_dir`.
+
+    Arguments:
+    - table: The boto3 Table to read.
+    - name: Name of the export (e.g. "events"), used in the manifest.
+    - timestamp_attribute: Attribute for the watermark and for `since`
+      (only items with a greater value are exported).
+    """
+
+    def __init__(self, table, name, run_dir, segments=8, format='ndjson', chunk_items=50000,
+                 timestamp_attribute=None, since=None):
+        self.table = table
+        self.name = name
+        self.run_dir = Path(run_dir)
+        self.segments = segments
+        self.format = format
+        self.chunk_items = chunk_items
+        self.timestamp_attribute = timestamp_attribute
+        self.since = since
+        self.progress = Progress()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.state = None
+
+    @classmethod
+    def resume(cls, table, run_dir):
+        """Continues the export saved in `run_dir`/checkpoint.json with the options it was started with."""
+        state = read_json(Path(run_dir) / CHECKPOINT)
+        export = cls(
+            table, state['name'], run_dir, state['segments'], state['format'], state['chunk_items'],
+            state['timestamp_attribute'], decode_watermark(state['since']),
+        )
+        export.state = state
+        return export
+
+    def start(self):
+        """Validates the options and writes the initial checkpoint (nothing to do when resuming)."""
+        if self.format not in WRITERS:
+            raise ExportError(f"Formato desconocido: {self.format}.")
+        WRITERS[self.format].check()
+        if self.segments < 1 or self.chunk_items < 1:
+            raise ExportError("--segments y --chunk-items deben ser mayores que 0.")
+        if self.since is not None and not self.timestamp_attribute:
+            raise ExportError(f"{self.name} no tiene un atributo de tiempo para exportar de forma incremental.")
+
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        # Archivos a medio escribir de una ejecución interrumpida
+        for tmp_path in self.run_dir.glob('*.tmp'):
+            tmp_path.unlink()
+        if self.state is None:
+            self.state = {
+                'name': self.name,
+                'table_name': self.table.name,
+                'format': self.format,
+                'segments': self.segments,
+                'chunk_items': self.chunk_items,
+                'timestamp_attribute': self.timestamp_attribute,
+                'since': encode_watermark(self.since),
+                'started_at': now_iso(),
+                'segment_state': {
+                    str(segment): {'start_key': None, 'parts': 0, 'items': 0, 'bytes': 0, 'files': [],
+                                   'watermark': None, 'done': False}
+                    for segment in range(self.segments)
+                },
+            }
+            self.save_checkpoint()
+
+    def save_checkpoint(self):
+        with self._lock:
+            write_json(self.run_dir / CHECKPOINT, self.state)
+
+    def stop(self):
+        """Asks the segments to stop after their current page; the export can be resumed."""
+        self._stop.set()
+
+    def _commit(self, segment_state, last_evaluated_key, items=0, size=0, file_name=None, watermark=None):
+        with self._lock:
+            segment_state['start_key'] = (
+                {name: _serializer.serialize(value) for name, value in last_evaluated_key.items()}
+                if last_evaluated_key else None
+            )
+            segment_state['items'] += items
+            segment_state['bytes'] += size
+            if file_name:
+                segment_state['parts'] += 1
+                segment_state['files'].append(file_name)
+            current = decode_watermark(segment_state['watermark'])
+            if watermark is not None and (current is None or watermark > current):
+                segment_state['watermark'] = encode_watermark(watermark)
+            if not last_evaluated_key:
+                segment_state['done'] = True
+        self.save_checkpoint()
+
+    def export_segment(self, segment):
+        segment_state = self.state['segment_state'][str(segment)]
+        if segment_state['done']:
+            return
+        scan_kwargs = {'Segment': segment, 'TotalSegments': self.segments, 'ReturnConsumedCapacity': 'TOTAL'}
+        if self.since is not None:
+            scan_kwargs['FilterExpression'] = Attr(self.timestamp_attribute).gt(self.since)
+        if segment_state['start_key']:
+            scan_kwargs['ExclusiveStartKey'] = {
+                name: _deserializer.deserialize(value) for name, value in segment_state['start_key'].items()
+            }
+
+        writer, file_name, part_items, watermark = None, None, 0, None
+        for page in scan_pages(self.table, **scan_kwargs):
+            if self._stop.is_set():
+                return
+            items = page.get('Items', [])
+            self.progress.add(len(items), page.get('ScannedCount', 0),
+                              float(page.get('ConsumedCapacity', {}).get('CapacityUnits', 0)))
+            if items:
+                if writer is None:
+                    file_name = f"part-s{segment:03d}-{segment_state['parts'] + 1:05d}{WRITERS[self.format].extension}"
+                    writer = WRITERS[self.format](self.run_dir / file_name)
+                writer.write(items)
+                part_items += len(items)
+                if self.timestamp_attribute:
+                    values = [item[self.timestamp_attribute] for item in items if self.timestamp_attribute in item]
+                    if values:
+                        watermark = max([*values, watermark] if watermark is not None else values)
+
+            last_evaluated_key = page.get('LastEvaluatedKey')
+            if writer is not None and (part_items >= self.chunk_items or not last_evaluated_key):
+                size = writer.close()
+                self._commit(segment_state, last_evaluated_key, part_items, size, file_name, watermark)
+                writer, part_items, watermark = None, 0, None
+            elif writer is None:
+                # Páginas sin items (p. ej. filtradas por `since`): se avanza el checkpoint igual
+                self._commit(segment_state, last_evaluated_key)
+
+    def run(self, report=None, report_interval=10):
+        """
+        Exports every pending segment. `report(progress_snapshot)` is called
+        every `report_interval` seconds while it runs.
+
+        Returns:
+        - The manifest (also written to manifest.json).
+
+        Raises:
+        - ExportError: A segment failed (the export can be resumed).
+        """
+        executor = get_executor()
+        futures = [executor.submit(self.export_segment, segment) for segment in range(self.segments)]
+        try:
+            while True:
+                done, pending = wait(futures, timeout=report_interval, return_when=FIRST_EXCEPTION)
+                failed = [future for future in done if future.exception() is not None]
+                if failed:
+                    self.stop()
+                    wait(pending)
+                    raise ExportError(f"Falló un segmento ({failed[0].exception()}); se puede reanudar.") \
+                        from failed[0].exception()
+                if not pending:
+                    break
+                if report:
+                    report(self.progress.snapshot())
+        except KeyboardInterrupt:
+            self.stop()
+            wait(futures)
+            raise
+
+        return self.finish()
+
+    def finish(self):
+        segment_states = self.state['segment_state'].values()
+        watermarks = [decode_watermark(state['watermark']) for state in segment_states if state['watermark'] is not None]
+        progress = self.progress.snapshot()
+        manifest = {
+            'name': self.name,
+            'table_name': self.state['table_name'],
+            'format': self.format,
+            'segments': self.segments,
+            'timestamp_attribute': self.timestamp_attribute,
+            'since': encode_watermark(self.since),
+            # Sin items nuevos se conserva el watermark anterior
+            'watermark': encode_watermark(max(watermarks) if watermarks else self.since),
+            'items': sum(state['items'] for state in segment_states),
+            'bytes': sum(state['bytes'] for state in segment_states),
+            'files': sorted(file_name for state in segment_states for file_name in state['files']),
+            'started_at': self.state['started_at'],
+            'finished_at': now_iso(),
+            # Throughput de esta ejecución (sin las anteriores si se reanudó)
+            'run': progress,
+        }
+        write_json(self.run_dir / MANIFEST, manifest)
+        (self.run_dir / CHECKPOINT).unlink()
+        return manifest
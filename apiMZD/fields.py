@@ -0,0 +1,55 @@
+"""
+Parámetro ?fields= para pedir sólo algunos atributos de cada item.
+
+Las vistas validan los campos contra su serializer y los repositorios los
+convierten en un ProjectionExpression (ver apiMZD.dynamodb.projection_kwargs),
+así DynamoDB sólo envía esos atributos.
+"""
+
+from functools import lru_cache
+
+
+class InvalidFields(ValueError):
+    """Raised when ?fields= names an attribute the endpoint does not have."""
+
+
+@lru_cache(maxsize=None)
+def serializer_fields(serializer_class):
+    """Returns the field names of a serializer class."""
+    return frozenset(serializer_class().fields)
+
+
+def parse_fields(request, allowed_fields, required_fields=()):
+    """
+    Reads ?fields=a,b,c from the request.
+
+    Arguments:
+    - allowed_fields: A serializer class or an iterable with the valid names.
+    - required_fields: Attributes the view itself needs (e.g. to sort or
+      paginate); they are always projected.
+
+    Returns:
+    - None when the parameter is absent (whole items), otherwise the list of
+      attributes to project, without duplicates.
+    """
+    value = request.GET.get('fields')
+    if value is None:
+        return None
+
+    if isinstance(allowed_fields, type):
+        allowed_fields = serializer_fields(allowed_fields)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    invalid = [field for field in fields if field not in allowed_fields]
+    if not fields or invalid:
+        raise InvalidFields(
+            "fields debe ser una lista separada por comas de: " + ', '.join(sorted(allowed_fields)) + "."
+        )
+    return list(dict.fromkeys([*fields, *required_fields]))
+
+
+def restrict_serializer(serializer, fields):
+    """Drops from `serializer` (an instance) every field not in `fields`; returns it."""
+    if fields:
+        for name in set(serializer.fields) - set(fields):
+            serializer.fields.pop(name)
+    return serializer
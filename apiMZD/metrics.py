@@ -0,0 +1,401 @@
+"""
+Métricas de DynamoDB por petición.
+
+DynamoDBMetricsMiddleware abre un RequestMetrics por petición; los hooks de
+botocore (install_hooks) anotan en él cada llamada a DynamoDB: operación,
+tabla, índice, tiempo y la capacidad consumida, que se pide a DynamoDB con
+ReturnConsumedCapacity. ORJSONRenderer anota el tiempo de serialización.
+
+Al terminar la petición:
+
+- Se agrega el header Server-Timing (dynamodb, render, app y total).
+- Cada exportador de settings.METRICS['EXPORTERS'] recibe un resumen:
+  RegistryExporter lo acumula en los histogramas del proceso que sirve
+  /metrics/ en formato de texto de Prometheus; EMFExporter escribe una línea
+  en CloudWatch Embedded Metric Format, para Lambda, donde no hay un proceso
+  al que consultar.
+
+Las llamadas hechas en los hilos de apiMZD.dynamodb.get_executor() cuentan
+para la petición que las lanzó; las de hilos propios (write-behind) no se
+registran.
+"""
+
+import contextvars
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.module_loading import import_string
+
+# Mismos límites que los histogramas por defecto de los clientes de Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+READ_OPERATIONS = {'GetItem', 'BatchGetItem', 'Query', 'Scan', 'TransactGetItems', 'ExecuteStatement'}
+
+_current = contextvars.ContextVar('apimzd_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """DynamoDB calls and timings of one request; safe to update from several threads."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.dynamodb_seconds = 0.0
+        self.render_seconds = 0.0
+        # (operation, table, index) -> llamadas; (operation, table, index, kind) -> unidades de capacidad
+        self.calls = defaultdict(int)
+        self.capacity = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def record_call(self, operation, table, index, seconds, consumed_capacity):
+        kind = 'read' if operation in READ_OPERATIONS else 'write'
+        if isinstance(consumed_capacity, dict):
+            consumed_capacity = [consumed_capacity]
+        with self._lock:
+            self.dynamodb_seconds += seconds
+            self.calls[(operation, table, index)] += 1
+            for capacity in consumed_capacity or ():
+                for capacity_table, capacity_index, units in _capacity_units(capacity, index):
+                    self.capacity[(operation, capacity_table, capacity_index, kind)] += units
+
+    def record_render(self, seconds):
+        with self._lock:
+            self.render_seconds += seconds
+
+    @property
+    def call_count(self):
+        return sum(self.calls.values())
+
+    def capacity_units(self, kind):
+        return sum(units for key, units in self.capacity.items() if key[3] == kind)
+
+
+def _capacity_units(capacity, index):
+    """Splits a ConsumedCapacity entry into (table, index, units) tuples."""
+    table = capacity.get('TableName', '')
+    breakdown = []
+    if 'Table' in capacity:
+        breakdown.append((table, '', capacity['Table'].get('CapacityUnits', 0)))
+    for key in ('GlobalSecondaryIndexes', 'LocalSecondaryIndexes'):
+        for index_name, index_capacity in capacity.get(key, {}).items():
+            breakdown.append((table, index_name, index_capacity.get('CapacityUnits', 0)))
+    if not breakdown:
+        # ReturnConsumedCapacity=TOTAL: sin desglose, se asigna al índice consultado
+        breakdown.append((table, index, capacity.get('CapacityUnits', 0)))
+    return [(table, index_name, float(units)) for table, index_name, units in breakdown if units]
+
+
+def current_metrics():
+    """The RequestMetrics of the running request, or None outside of one."""
+    return _current.get()
+
+
+def record_render(seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.record_render(seconds)
+
+
+# Hooks de botocore
+
+def _before_call(params, model, context, **kwargs):
+    metrics = _current.get()
+    if metrics is None:
+        return
+    return_capacity = settings.METRICS['CONSUMED_CAPACITY']
+    if (return_capacity != 'NONE' and 'ReturnConsumedCapacity' not in params
+            and 'ReturnConsumedCapacity' in model.input_shape.members):
+        params['ReturnConsumedCapacity'] = return_capacity
+
+    if 'TableName' in params:
+        table = params['TableName']
+    else:
+        # BatchGetItem / BatchWriteItem
+        table = ','.join(sorted(params.get('RequestItems', ())))
+    context['apimzd_metrics'] = (metrics, model.name, table, params.get('IndexName', ''), time.perf_counter())
+
+
+def _after_call(context, parsed=None, **kwargs):
+    call = context.pop('apimzd_metrics', None)
+    if call is None:
+        return
+    metrics, operation, table, index, started = call
+    consumed_capacity = parsed.get('ConsumedCapacity') if parsed else None
+    metrics.record_call(operation, table, index, time.perf_counter() - started, consumed_capacity)
+
+
+def _after_call_error(context, **kwargs):
+    call = context.pop('apimzd_metrics', None)
+    if call is not None:
+        metrics, operation, table, index, started = call
+        metrics.record_call(operation, table, index, time.perf_counter() - started, None)
+
+
+def install_hooks(client):
+    """Registers the metrics hooks on a (sync or aiobotocore) DynamoDB client."""
+    if not settings.METRICS['ENABLED']:
+        return
+    events = client.meta.events
+    # before-parameter-build: el recurso de boto3 copia los parámetros en provide-client-params
+    events.register('before-parameter-build.dynamodb', _before_call, unique_id='apimzd-metrics-before')
+    events.register('after-call.dynamodb', _after_call, unique_id='apimzd-metrics-after')
+    events.register('after-call-error.dynamodb', _after_call_error, unique_id='apimzd-metrics-error')
+
+
+# Agregación en el proceso (texto de Prometheus)
+
+METRIC_HELP = {
+    'apimzd_request_duration_seconds': ('histogram', 'Request duration by view.'),
+    'apimzd_request_dynamodb_seconds': ('histogram', 'Time spent in DynamoDB calls per request, by view.'),
+    'apimzd_request_render_seconds': ('histogram', 'Time spent rendering the response body per request, by view.'),
+    'apimzd_requests_total': ('counter', 'Requests by view, method and status.'),
+    'apimzd_dynamodb_calls_total': ('counter', 'DynamoDB calls by view, operation, table and index.'),
+    'apimzd_dynamodb_consumed_capacity_total': ('counter', 'DynamoDB capacity units consumed by view, operation, table, index and kind.'),
+    'apimzd_event_stats_failures_total': ('counter', 'Events whose daily aggregates could not be updated.'),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms of this process."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._counters = defaultdict(float)
+        # (name, labels) -> [conteos por bucket..., suma, total]
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[(name, labels)] += amount
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = [0] * len(self.buckets) + [0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[position] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(value)) for key, value in self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                metric_type, help_text = METRIC_HELP.get(name, ('untyped', name))
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f'{name}{_format_labels(labels)} {value:g}')
+        for (name, labels), histogram in histograms:
+            describe(name)
+            for bound, count in zip(self.buckets, histogram):
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", f"{bound:g}"),))} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {histogram[-2]:.6f}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+# Exportadores: reciben el resumen de cada petición (ver request_summary)
+
+class RegistryExporter:
+    """Accumulates requests into the process registry served by /metrics/."""
+
+    def __init__(self, registry=registry):
+        self.registry = registry
+
+    def export(self, summary):
+        view = (('view', summary['view']),)
+        self.registry.inc('apimzd_requests_total', view + (('method', summary['method']), ('status', str(summary['status']))))
+        self.registry.observe('apimzd_request_duration_seconds', view + (('method', summary['method']),), summary['duration'])
+        self.registry.observe('apimzd_request_dynamodb_seconds', view, summary['dynamodb_seconds'])
+        self.registry.observe('apimzd_request_render_seconds', view, summary['render_seconds'])
+        for call in summary['calls']:
+            labels = view + (('operation', call['operation']), ('table', call['table']), ('index', call['index']))
+            self.registry.inc('apimzd_dynamodb_calls_total', labels, call['count'])
+        for capacity in summary['capacity']:
+            labels = view + (
+                ('operation', capacity['operation']), ('table', capacity['table']),
+                ('index', capacity['index']), ('kind', capacity['kind']),
+            )
+            self.registry.inc('apimzd_dynamodb_consumed_capacity_total', labels, capacity['units'])
+
+
+class EMFExporter:
+    """
+    Writes one CloudWatch Embedded Metric Format line per request to stdout,
+    which Lambda ships to CloudWatch Logs and CloudWatch turns into metrics
+    (dimension: view).
+    """
+
+    METRICS = (
+        ('Duration', 'Milliseconds'),
+        ('DynamoDBTime', 'Milliseconds'),
+        ('RenderTime', 'Milliseconds'),
+        ('DynamoDBCalls', 'Count'),
+        ('ReadCapacityUnits', 'Count'),
+        ('WriteCapacityUnits', 'Count'),
+    )
+
+    def __init__(self, namespace=None, stream=None):
+        self.namespace = namespace or settings.METRICS['EMF_NAMESPACE']
+        self.stream = stream
+
+    def export(self, summary):
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [['view']],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, unit in self.METRICS],
+                }],
+            },
+            'view': summary['view'],
+            'method': summary['method'],
+            'status': summary['status'],
+            'Duration': round(summary['duration'] * 1000, 3),
+            'DynamoDBTime': round(summary['dynamodb_seconds'] * 1000, 3),
+            'RenderTime': round(summary['render_seconds'] * 1000, 3),
+            'DynamoDBCalls': sum(call['count'] for call in summary['calls']),
+            'ReadCapacityUnits': summary['read_capacity_units'],
+            'WriteCapacityUnits': summary['write_capacity_units'],
+            'calls': summary['calls'],
+        }
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(record, separators=(',', ':')) + '\n')
+        stream.flush()
+
+
+_exporters = None
+
+
+def get_exporters():
+    global _exporters
+    if _exporters is None:
+        _exporters = [import_string(path)() for path in settings.METRICS['EXPORTERS'] if path]
+    return _exporters
+
+
+def request_summary(request, response, metrics):
+    """Plain-data summary of a finished request, as passed to the exporters."""
+    match = getattr(request, 'resolver_match', None)
+    return {
+        'view': match.view_name if match and match.view_name else 'unresolved',
+        'method': request.method,
+        'status': response.status_code,
+        'duration': time.perf_counter() - metrics.started,
+        'dynamodb_seconds': metrics.dynamodb_seconds,
+        'render_seconds': metrics.render_seconds,
+        'read_capacity_units': metrics.capacity_units('read'),
+        'write_capacity_units': metrics.capacity_units('write'),
+        'calls': [
+            {'operation': operation, 'table': table, 'index': index, 'count': count}
+            for (operation, table, index), count in sorted(metrics.calls.items())
+        ],
+        'capacity': [
+            {'operation': operation, 'table': table, 'index': index, 'kind': kind, 'units': units}
+            for (operation, table, index, kind), units in sorted(metrics.capacity.items())
+        ],
+    }
+
+
+def server_timing(summary):
+    """Server-Timing header value for a request summary (durations in ms)."""
+    dynamodb_ms = summary['dynamodb_seconds'] * 1000
+    render_ms = summary['render_seconds'] * 1000
+    total_ms = summary['duration'] * 1000
+    calls = sum(call['count'] for call in summary['calls'])
+    description = (
+        f'{calls} calls, {summary["read_capacity_units"]:g} RCU, {summary["write_capacity_units"]:g} WCU'
+    )
+    return ', '.join([
+        f'dynamodb;dur={dynamodb_ms:.1f};desc="{description}"',
+        f'render;dur={render_ms:.1f}',
+        # Con llamadas en paralelo dynamodb puede superar al total; app no baja de 0
+        f'app;dur={max(total_ms - dynamodb_ms - render_ms, 0):.1f}',
+        f'total;dur={total_ms:.1f}',
+    ])
+
+
+class DynamoDBMetricsMiddleware:
+    """
+    Collects the DynamoDB calls of each request, adds the Server-Timing
+    header and hands the request summary to the configured exporters.
+    Works under WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        summary = request_summary(request, response, metrics)
+        if settings.METRICS['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(summary)
+        for exporter in get_exporters():
+            exporter.export(summary)
+        return response
@@ -0,0 +1,109 @@
+"""
+Tokens de paginación opacos para las vistas que listan tablas de DynamoDB.
+
+El LastEvaluatedKey se serializa con los tipos de DynamoDB (S, N, ...), se
+codifica en base64 url-safe y se firma con SECRET_KEY (django.core.signing),
+de modo que el cliente sólo tiene que devolver el mismo string para pedir la
+siguiente página y no puede fabricar ni modificar llaves. `scope` distingue
+los tokens de cada listado: un token de vendedores no sirve para clientes.
+"""
+
+import binascii
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from django.core import signing
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+class InvalidPageToken(ValueError):
+    """Raised when a page token cannot be decoded."""
+
+
+def _serialize_key(key):
+    return {name: _serializer.serialize(value) for name, value in key.items()}
+
+
+def _deserialize_key(payload):
+    return {name: _deserializer.deserialize(value) for name, value in payload.items()}
+
+
+def _salt(scope):
+    return f'apiMZD.pagination:{scope}'
+
+
+def _dumps(payload, scope=''):
+    return signing.dumps(payload, salt=_salt(scope))
+
+
+def _loads(token, scope=''):
+    return signing.loads(token, salt=_salt(scope))
+
+
+def encode_page_token(last_evaluated_key, scope=''):
+    """Returns an opaque, signed token for `last_evaluated_key`, or None on the last page."""
+    if not last_evaluated_key:
+        return None
+    return _dumps(_serialize_key(last_evaluated_key), scope)
+
+
+def decode_page_token(token, scope=''):
+    """Returns the ExclusiveStartKey encoded in `token` (signed with the same `scope`)."""
+    try:
+        return _deserialize_key(_loads(token, scope))
+    except (signing.BadSignature, binascii.Error, ValueError, TypeError, AttributeError) as e:
+        raise InvalidPageToken("Token de paginación inválido.") from e
+
+
+def page_token_param(request):
+    """The page token sent by the client: ?next_page_token=, or ?last_evaluated_key= (older name)."""
+    return request.GET.get('next_page_token') or request.GET.get('last_evaluated_key')
+
+
+def parse_page_size(request, default, maximum):
+    """
+    Reads ?page_size=.
+
+    Returns:
+    - `default` when absent, otherwise an integer between 1 and `maximum`.
+
+    Raises:
+    - ValueError: With a message for the client.
+    """
+    value = request.GET.get('page_size')
+    if value is None:
+        return default
+    try:
+        page_size = int(value)
+    except ValueError:
+        page_size = 0
+    if not 1 <= page_size <= maximum:
+        raise ValueError(f"page_size debe ser un entero entre 1 y {maximum}.")
+    return page_size
+
+
+def encode_cursor(keys_by_source, scope=''):
+    """
+    Returns a token for several paginated sources at once (e.g. two indexes),
+    mapping each source name to its LastEvaluatedKey. A None value marks a
+    source that has been read completely. Returns None once every source is
+    done. `scope` works as in encode_page_token.
+    """
+    if all(key is None for key in keys_by_source.values()):
+        return None
+    return _dumps({
+        source: _serialize_key(key) if key is not None else None
+        for source, key in keys_by_source.items()
+    }, scope)
+
+
+def decode_cursor(token, scope=''):
+    """Returns the {source: ExclusiveStartKey or None} mapping encoded in `token` (signed with the same `scope`)."""
+    try:
+        return {
+            source: _deserialize_key(key) if key is not None else None
+            for source, key in _loads(token, scope).items()
+        }
+    except (signing.BadSignature, binascii.Error, ValueError, TypeError, AttributeError) as e:
+        raise InvalidPageToken("Token de paginación inválido.") from e
@@ -0,0 +1,27 @@
+"""
+Operaciones de administración de la API (p. ej. el listado completo de
+clientes con GET /clients/?all=true) y endpoints internos (/metrics/,
+/cache/stats/).
+
+Se autorizan con "Authorization: Bearer <token>": ADMIN_API_TOKEN, o también
+METRICS_TOKEN para los endpoints internos. Sin token configurado quedan
+deshabilitados.
+"""
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+
+def has_bearer_token(request, token):
+    """True when the request carries "Authorization: Bearer <token>" (never when `token` is empty)."""
+    return bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def has_admin_token(request):
+    """True when the request carries ADMIN_API_TOKEN."""
+    return has_bearer_token(request, settings.ADMIN_API_TOKEN)
+
+
+def has_metrics_token(request):
+    """True when the request carries METRICS['TOKEN'] or ADMIN_API_TOKEN."""
+    return has_bearer_token(request, settings.METRICS['TOKEN']) or has_admin_token(request)
@@ -0,0 +1,72 @@
+"""
+Normalización de números de teléfono a E.164 ("+529991234567").
+
+Un mismo cliente llega como "+52 999 123 4567", "52 9991234567",
+"5219991234567" (WhatsApp, con el 1 de celular que México ya no usa),
+"044 999 123 4567" o "9991234567"; todos dan "+529991234567". Los números sin
+código de país se toman como nacionales de settings.PHONE['COUNTRY_CODE'].
+
+Clientes y mensajes guardan además el número normalizado (number_e164,
+de_numero_e164 y para_numero_e164) con su propio índice, así una búsqueda por
+número es una sola consulta sin importar cómo se escribió. Con
+settings.PHONE['E164_LOOKUPS'] las vistas consultan esos índices; activarlo
+después de crear los índices y de ejecutar `manage.py backfill_phone_numbers`.
+"""
+
+import re
+
+from django.conf import settings
+
+_non_digits = re.compile(r'\D+')
+
+# Prefijos nacionales que se quitan antes del número (México: 044/045 celular, 01 larga distancia)
+NATIONAL_PREFIXES = {'52': ('044', '045', '01')}
+# Dígito de celular entre el código de país y el número que algunos sistemas aún agregan
+MOBILE_PREFIXES = {'52': '1'}
+
+
+def to_e164(value, country_code=None, national_length=None):
+    """
+    Returns `value` as an E.164 string ("+" and 8 to 15 digits), or None when
+    it is empty or cannot be a phone number.
+
+    Arguments:
+    - country_code: Country of numbers written without one (default
+      settings.PHONE['COUNTRY_CODE']).
+    - national_length: Digits of a national number of that country (default
+      settings.PHONE['NATIONAL_LENGTH']).
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    digits = _non_digits.sub('', text)
+    if not digits:
+        return None
+    if country_code is None:
+        country_code = settings.PHONE['COUNTRY_CODE']
+    if national_length is None:
+        national_length = settings.PHONE['NATIONAL_LENGTH']
+
+    international = text.startswith('+')
+    if not international and digits.startswith('00'):
+        digits, international = digits[2:], True
+
+    if not international:
+        for prefix in NATIONAL_PREFIXES.get(country_code, ()):
+            if digits.startswith(prefix) and len(digits) == len(prefix) + national_length:
+                digits = digits[len(prefix):]
+                break
+        if len(digits) == national_length:
+            digits = country_code + digits
+
+    mobile_prefix = MOBILE_PREFIXES.get(country_code)
+    if (
+        mobile_prefix
+        and digits.startswith(country_code + mobile_prefix)
+        and len(digits) == len(country_code) + len(mobile_prefix) + national_length
+    ):
+        digits = country_code + digits[len(country_code) + len(mobile_prefix):]
+
+    if not 8 <= len(digits) <= 15:
+        return None
+    return '+' + digits
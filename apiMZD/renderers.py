@@ -0,0 +1,116 @@
+"""
+Renderers compartidos por las vistas de la API.
+"""
+
+import base64
+import time
+from decimal import Decimal
+
+import orjson
+from boto3.dynamodb.types import Binary
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import record_render
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+_fallback_encoder = JSONEncoder()
+
+
+def orjson_default(obj):
+    """
+    Converts the types boto3 returns for DynamoDB items that orjson does not
+    handle natively. orjson only calls this for those values, so items are
+    never walked in Python beforehand.
+    """
+    if isinstance(obj, Decimal):
+        # Los números de DynamoDB llegan como Decimal. Los enteros salen como
+        # int (5; el encoder de DRF daba 5.0); orjson sólo acepta enteros de
+        # 64 bits, los mayores y los que tienen decimales salen como float
+        if obj == obj.to_integral_value() and -2 ** 63 <= obj < 2 ** 64:
+            return int(obj)
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Binary):
+        return base64.b64encode(obj.value).decode()
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode()
+    # Lazy strings, timedelta, etc.: mismo resultado que el encoder de DRF
+    return _fallback_encoder.default(obj)
+
+
+def render_ndjson_line(item):
+    """Encodes one item as a line of newline-delimited JSON."""
+    return orjson.dumps(item, default=orjson_default, option=orjson.OPT_APPEND_NEWLINE)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer backed by orjson.
+
+    DynamoDB numbers are rendered as integers when they have no fractional
+    part (Decimal('5') -> 5) and fit in 64 bits, and as floats otherwise
+    (Decimal('5.5') -> 5.5). DRF's JSONRenderer renders every Decimal as a
+    float, so integral values change from 5.0 to 5: clients that compare
+    the raw text, or that tell ints and floats apart, see the difference.
+    Sets are rendered as lists and Binary values as base64. Data orjson
+    cannot encode falls back to DRF's encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        started = time.perf_counter()
+        option = 0
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        try:
+            try:
+                return orjson.dumps(data, default=orjson_default, option=option)
+            except orjson.JSONEncodeError:
+                # Errores de DRF con llaves enteras (p. ej. ListField); más lento, sólo como respaldo
+                return orjson.dumps(data, default=orjson_default, option=option | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            # Lo que orjson no codifica (p. ej. un int de más de 64 bits): encoder de DRF
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            record_render(time.perf_counter() - started)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON, selected with ?format=ndjson or
+    "Accept: application/x-ndjson".
+
+    Views stream their items with `ndjson_response`; anything rendered through
+    a regular Response (e.g. an error) is written as a single line.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return render_ndjson_line(data)
+
+
+def wants_ndjson(request):
+    """True when content negotiation picked the NDJSON renderer."""
+    return getattr(request, 'accepted_renderer', None) is not None and request.accepted_renderer.format == 'ndjson'
+
+
+def ndjson_response(items):
+    """Streams `items` one per line as they are produced, without buffering them."""
+    return StreamingHttpResponse((render_ndjson_line(item) for item in items), content_type=NDJSON_MEDIA_TYPE)
+
+
+# Renderers para las vistas que aceptan NDJSON además de los de por defecto.
+# Se define al final porque DEFAULT_RENDERER_CLASSES apunta a este módulo.
+STREAMING_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
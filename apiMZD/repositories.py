@@ -0,0 +1,961 @@
+"""
+Repositorios de DynamoDB para clientes, eventos, mensajes y vendedores.
+
+Las vistas usan estas clases en lugar de crear sus propios recursos de boto3;
+todas comparten el recurso (y el pool de conexiones) de apiMZD.dynamodb.
+"""
+
+import heapq
+from collections import Counter, defaultdict
+from concurrent.futures import wait
+from operator import itemgetter
+
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from django.conf import settings
+
+from .cache import ItemCache
+from .phone import to_e164
+from .dynamodb import (
+    batch_get, batch_write, count_all, get_dynamodb, get_executor, projection_kwargs, query_all, query_all_async,
+    scan_all, scan_parallel,
+)
+
+
+_deserializer = TypeDeserializer()
+
+
+def with_projection(kwargs, fields):
+    """
+    Adds the ProjectionExpression of `fields` to get/query/scan `kwargs`;
+    with `fields` None the whole items are read.
+    """
+    if fields:
+        projection = projection_kwargs(fields)
+        kwargs['ProjectionExpression'] = projection['ProjectionExpression']
+        kwargs.setdefault('ExpressionAttributeNames', {}).update(projection['ExpressionAttributeNames'])
+    return kwargs
+
+
+class ItemNotFound(Exception):
+    """Raised by update_fields (and conditional deletes) when the item does not exist or fails the extra condition."""
+
+
+class VersionConflict(Exception):
+    """Raised by update_fields when the stored version is not the expected one."""
+
+    def __init__(self, item):
+        super().__init__("El registro fue modificado por otra petición.")
+        # Item actual (tal como está en la tabla), para que el cliente pueda reintentar
+        self.item = item
+
+
+class DynamoRepository:
+    """
+    Base repository wrapping a single DynamoDB table.
+
+    Subclasses set `table_setting` to the name of the Django setting holding
+    the table name.
+    """
+
+    table_setting = None
+    # Atributo que update_fields incrementa en cada actualización (concurrencia optimista)
+    version_attribute = 'version'
+
+    def __init__(self, table_name=None):
+        self._table_name = table_name
+        self._table = None
+
+    @property
+    def table_name(self):
+        return self._table_name or getattr(settings, self.table_setting)
+
+    @property
+    def table(self):
+        """The boto3 Table, created on first access."""
+        if self._table is None:
+            self._table = get_dynamodb().Table(self.table_name)
+        return self._table
+
+    def get_item(self, key, **kwargs):
+        """Returns the item stored under `key`, or None if it does not exist."""
+        response = self.table.get_item(Key=key, **kwargs)
+        return response.get('Item', None)
+
+    def put_item(self, item, **kwargs):
+        return self.table.put_item(Item=item, **kwargs)
+
+    def update_item(self, key, **kwargs):
+        return self.table.update_item(Key=key, **kwargs)
+
+    def delete_item(self, key, **kwargs):
+        return self.table.delete_item(Key=key, **kwargs)
+
+    def update_fields(self, key, changes, expected_version=None, condition=None, remove=()):
+        """
+        Applies `changes` (attribute -> new value) to the item stored under
+        `key` with a single UpdateItem, and deletes the `remove` attributes;
+        the other attributes are left as they are. The version attribute is
+        incremented (a missing one counts as 0).
+
+        The same call checks that the item exists and, when given, that it
+        matches `condition` and that its version is `expected_version`.
+
+        Returns:
+        - (old_item, new_item)
+
+        Raises:
+        - ItemNotFound: There is no item under `key`, or it does not match `condition`.
+        - VersionConflict: The stored version is not `expected_version`.
+        """
+        names = {'#v': self.version_attribute}
+        values = {':zero': 0, ':one': 1}
+        assignments = []
+        for index, (name, value) in enumerate(changes.items()):
+            names[f'#u{index}'] = name
+            values[f':u{index}'] = value
+            assignments.append(f'#u{index} = :u{index}')
+        assignments.append('#v = if_not_exists(#v, :zero) + :one')
+        removals = []
+        for index, name in enumerate(remove):
+            names[f'#r{index}'] = name
+            removals.append(f'#r{index}')
+        update_expression = 'SET ' + ', '.join(assignments)
+        if removals:
+            update_expression += ' REMOVE ' + ', '.join(removals)
+
+        version = Attr(self.version_attribute)
+        conditions = [Attr(name).exists() for name in key]
+        if condition is not None:
+            conditions.append(condition)
+        if expected_version is not None:
+            version_condition = version.eq(expected_version)
+            if expected_version == 0:
+                # Items escritos antes de versionar (sin el atributo) están en la versión 0
+                version_condition |= version.not_exists()
+            conditions.append(version_condition)
+        condition_expression = conditions[0]
+        for extra in conditions[1:]:
+            condition_expression &= extra
+
+        try:
+            response = self.update_item(
+                key,
+                UpdateExpression=update_expression,
+                ConditionExpression=condition_expression,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                # ALL_OLD: el item nuevo se reconstruye con `changes`, y el viejo sirve para invalidar cachés
+                ReturnValues='ALL_OLD',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            raw_item = e.response.get('Item')
+            if not raw_item:
+                raise ItemNotFound() from e
+            item = {name: _deserializer.deserialize(value) for name, value in raw_item.items()}
+            if expected_version is not None and item.get(self.version_attribute, 0) != expected_version:
+                raise VersionConflict(item) from e
+            raise ItemNotFound() from e
+
+        old_item = response['Attributes']
+        new_item = {**old_item, **changes, self.version_attribute: old_item.get(self.version_attribute, 0) + 1}
+        for name in remove:
+            new_item.pop(name, None)
+        return old_item, new_item
+
+    def query(self, **kwargs):
+        """Runs a single query and returns the raw page."""
+        return self.table.query(**kwargs)
+
+    def query_all(self, **kwargs):
+        """Yields every item of a query across all of its pages."""
+        return query_all(self.table, **kwargs)
+
+    def scan(self, **kwargs):
+        """Runs a single scan and returns the raw page."""
+        return self.table.scan(**kwargs)
+
+    def batch_write(self, requests, concurrency=1):
+        """Writes requests through BatchWriteItem; returns the unprocessed ones."""
+        return batch_write(self.table, requests, concurrency=concurrency)
+
+    def get_many(self, key_attribute, values, fields=None):
+        """
+        Reads the items whose `key_attribute` is in `values` with BatchGetItem.
+
+        Returns:
+        - (items, unprocessed): `items` is aligned with `values` (None where
+          the item does not exist or could not be read) and `unprocessed`
+          lists the values DynamoDB did not return after every retry.
+        """
+        unique_values = list(dict.fromkeys(values))
+        if fields and key_attribute not in fields:
+            fields = [key_attribute, *fields]
+
+        found, unprocessed_keys = batch_get(
+            self.table, [{key_attribute: value} for value in unique_values], fields
+        )
+        by_key = {item[key_attribute]: item for item in found}
+        return [by_key.get(value) for value in values], [key[key_attribute] for key in unprocessed_keys]
+
+
+class ClientRepo(DynamoRepository):
+    """
+    Clients, with cached lookups by client_id and by the email, number and
+    name indexes. Every write invalidates the entries of both the previous
+    and the new version of the client.
+    """
+
+    table_setting = 'CLIENT_TABLE_NAME'
+
+    by_id = ItemCache('client')
+    by_email = ItemCache('client:email')
+    by_number = ItemCache('client:number')
+    by_number_e164 = ItemCache('client:number-e164')
+    # Guarda sólo NAME_LOOKUP_FIELDS; namespace propio para no servir entradas antiguas con el item completo
+    by_name = ItemCache('client:name-lookup')
+
+    def invalidate(self, *clients):
+        for client in clients:
+            if client:
+                self.by_id.invalidate(client.get('client_id'))
+                self.by_email.invalidate(client.get('email'))
+                self.by_number.invalidate(client.get('number'))
+                self.by_number_e164.invalidate(client.get('number_e164'))
+                self.by_name.invalidate(client.get('name'))
+
+    def get(self, client_id, fields=None):
+        if fields:
+            # Las lecturas parciales no pasan por la caché (guarda items completos)
+            return self.get_item({'client_id': client_id}, **with_projection({}, fields))
+        return self.by_id.get_or_load(client_id, lambda: self.get_item({'client_id': client_id}))
+
+    # Llaves de índices que sólo existen con valor: None quita el atributo (DynamoDB no acepta NULL en una llave)
+    SPARSE_ATTRIBUTES = ('number_e164',)
+
+    def save(self, client):
+        client = {name: value for name, value in client.items() if value is not None or name not in self.SPARSE_ATTRIBUTES}
+        response = self.put_item(client, ReturnValues='ALL_OLD')
+        self.invalidate(client, response.get('Attributes'))
+
+    def delete(self, client_id):
+        response = self.delete_item({'client_id': client_id}, ReturnValues='ALL_OLD')
+        self.by_id.invalidate(client_id)
+        self.invalidate(response.get('Attributes'))
+
+    def update(self, client_id, changes, expected_version=None):
+        """Updates only the `changes` attributes of a client (see update_fields); returns the new item."""
+        remove = [name for name in self.SPARSE_ATTRIBUTES if name in changes and changes[name] is None]
+        changes = {name: value for name, value in changes.items() if name not in remove}
+        old_client, new_client = self.update_fields({'client_id': client_id}, changes, expected_version, remove=remove)
+        self.invalidate(old_client, new_client)
+        return new_client
+
+    def set_id_chat(self, client_id, id_chat, expected_version=None):
+        return self.update(client_id, {'id_chat': id_chat}, expected_version)
+
+    # Atributos que devuelve la búsqueda por nombre (y que guarda su caché)
+    NAME_LOOKUP_FIELDS = ('client_id', 'email', 'number')
+
+    def _query_index(self, index_name, attribute, value, fields=None):
+        response = self.query(**with_projection({
+            'IndexName': index_name,
+            'KeyConditionExpression': Key(attribute).eq(value),
+        }, fields))
+        return response.get('Items', [])
+
+    def find_by_email(self, email, fields=None):
+        if fields:
+            return self._query_index('email-index', 'email', email, fields)
+        return self.by_email.get_or_load(email, lambda: self._query_index('email-index', 'email', email))
+
+    def set_number_e164(self, client, number_e164):
+        """
+        Stores (or, with None, removes) the normalized number of `client`
+        without bumping its version; skipped when the client's number changed
+        meanwhile (whoever changed it also wrote number_e164).
+
+        Returns:
+        - True if the client was updated.
+        """
+        key = {'client_id': client['client_id']}
+        number = Attr('number').eq(client['number']) if client.get('number') is not None else Attr('number').not_exists()
+        kwargs = {
+            'ConditionExpression': Attr('client_id').exists() & number,
+            'ExpressionAttributeNames': {'#e': 'number_e164'},
+        }
+        if number_e164 is None:
+            kwargs['UpdateExpression'] = 'REMOVE #e'
+        else:
+            kwargs['UpdateExpression'] = 'SET #e = :e'
+            kwargs['ExpressionAttributeValues'] = {':e': number_e164}
+        try:
+            self.update_item(key, **kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        self.invalidate(client, {**client, 'number_e164': number_e164})
+        return True
+
+    def find_by_number(self, number, fields=None):
+        """
+        Clients whose number is `number`; with settings.PHONE['E164_LOOKUPS']
+        any way of writing the number finds them (one number_e164-index query).
+        """
+        if settings.PHONE['E164_LOOKUPS']:
+            return self.find_by_number_e164(to_e164(number), fields)
+        if fields:
+            return self._query_index('number-index', 'number', number, fields)
+        return self.by_number.get_or_load(number, lambda: self._query_index('number-index', 'number', number))
+
+    def find_by_number_e164(self, number_e164, fields=None):
+        if number_e164 is None:
+            return []
+        if fields:
+            return self._query_index('number_e164-index', 'number_e164', number_e164, fields)
+        return self.by_number_e164.get_or_load(
+            number_e164, lambda: self._query_index('number_e164-index', 'number_e164', number_e164)
+        )
+
+    def find_by_name(self, name, fields=None):
+        """Clients named `name`; by default only NAME_LOOKUP_FIELDS are read."""
+        if fields:
+            return self._query_index('name-index', 'name', name, fields)
+        return self.by_name.get_or_load(
+            name, lambda: self._query_index('name-index', 'name', name, self.NAME_LOOKUP_FIELDS)
+        )
+
+    def scan_page(self, limit, exclusive_start_key=None, fields=None):
+        scan_kwargs = {'Limit': limit}
+        if exclusive_start_key:
+            scan_kwargs['ExclusiveStartKey'] = exclusive_start_key
+        return self.scan(**with_projection(scan_kwargs, fields))
+
+    def scan_parallel(self, total_segments, fields=None):
+        """Yields every client with a parallel scan (see apiMZD.dynamodb.scan_parallel)."""
+        return scan_parallel(self.table, total_segments, **with_projection({}, fields))
+
+
+class EventRepo(DynamoRepository):
+    table_setting = 'EVENT_TABLE_NAME'
+
+    by_id = ItemCache('event')
+
+    def get(self, event_id, fields=None):
+        if fields:
+            return self.get_item({'event_id': str(event_id)}, **with_projection({}, fields))
+        return self.by_id.get_or_load(str(event_id), lambda: self.get_item({'event_id': str(event_id)}))
+
+    def save(self, event):
+        self.put_item(event)
+        self.by_id.invalidate(str(event['event_id']))
+
+    def update(self, event_id, changes, expected_version=None, session_id=None):
+        """
+        Updates only the `changes` attributes of an event (see update_fields);
+        with `session_id` the event must also belong to that session.
+        Returns the new item.
+        """
+        condition = Attr('session_id').eq(str(session_id)) if session_id is not None else None
+        _, event = self.update_fields({'event_id': str(event_id)}, changes, expected_version, condition)
+        self.by_id.invalidate(str(event_id))
+        return event
+
+    def delete(self, event_id, session_id=None):
+        """
+        Deletes an event; with `session_id` it must belong to that session,
+        otherwise ItemNotFound is raised and nothing is deleted.
+        """
+        kwargs = {}
+        if session_id is not None:
+            kwargs['ConditionExpression'] = Attr('session_id').eq(str(session_id))
+        try:
+            self.delete_item({'event_id': str(event_id)}, **kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            raise ItemNotFound() from e
+        self.by_id.invalidate(str(event_id))
+
+    def save_many(self, events):
+        """
+        Writes events with BatchWriteItem.
+
+        Returns:
+        - The set of event_ids that could not be written after every retry.
+        """
+        failed = self.batch_write([{'PutRequest': {'Item': event}} for event in events], concurrency=4)
+        self.by_id.invalidate(*(event['event_id'] for event in events))
+        return {request['PutRequest']['Item']['event_id'] for request in failed}
+
+    def by_session(self, session_id, fields=None):
+        return list(self.query_all(**with_projection({
+            'IndexName': 'session_id-index',
+            'KeyConditionExpression': Key('session_id').eq(session_id),
+        }, fields)))
+
+    def iter_by_client(self, client_id, page_size=100, fields=None):
+        return self.query_all(**with_projection({
+            'IndexName': 'client_id-index',
+            'KeyConditionExpression': Key('client_id').eq(client_id),
+            'Limit': page_size,
+        }, fields))
+
+    def by_type_on_day(self, event_type, day, fields=None):
+        """Returns every event of a type whose timestamp starts with `day` (YYYY-MM-DD)."""
+        return list(self.query_all(**with_projection({
+            'IndexName': 'event_type-timestamp-index',
+            'KeyConditionExpression': Key('event_type').eq(event_type) & Key('timestamp').begins_with(day),
+        }, fields)))
+
+    def count_by_day(self, event_type, days, sucursal=None):
+        """
+        Counts the events of a type on each of `days` (YYYY-MM-DD strings),
+        with one COUNT query per day running in parallel.
+
+        Returns:
+        - {day: count} in the order of `days`.
+        """
+        def count(day):
+            query_kwargs = {
+                'IndexName': 'event_type-timestamp-index',
+                'KeyConditionExpression': Key('event_type').eq(event_type) & Key('timestamp').begins_with(day),
+            }
+            if sucursal:
+                query_kwargs['FilterExpression'] = Attr('event_data.sucursal').eq(sucursal)
+            return count_all(self.table, **query_kwargs)
+
+        futures = [get_executor().submit(count, day) for day in days]
+        return {day: future.result() for day, future in zip(days, futures)}
+
+    @staticmethod
+    def list_index(client_id=None, session_id=None, event_type=None):
+        """The index list_page queries for these filters, or None when it scans the table."""
+        if client_id:
+            return 'client_id-index'
+        if session_id:
+            return 'session_id-index'
+        if event_type:
+            return 'event_type-timestamp-index'
+        return None
+
+    def list_page(self, limit, exclusive_start_key=None, event_type=None, date_from=None,
+                  date_to=None, event_source=None, client_id=None, session_id=None,
+                  segment=None, total_segments=None, sucursal=None, fields=None):
+        """
+        Returns one page of events matching the given filters.
+
+        Uses "client_id-index", "session_id-index" or "event_type-timestamp-index"
+        when a filter matches one of them and scans the table only as a last
+        resort. Dates are YYYY-MM-DD strings compared against the timestamp
+        prefix; `date_to` is inclusive. `sucursal` is matched against
+        event_data.sucursal. `segment`/`total_segments` split the scan for
+        parallel exports and are rejected for index queries. `fields` limits
+        the attributes returned.
+        """
+        timestamp_range = None
+        if date_from or date_to:
+            # '\uffff' ordena después de cualquier hora del día `date_to`
+            timestamp_range = (date_from or '0000-01-01', (date_to or '9999-12-31') + '\uffff')
+
+        filters = []
+        if event_source:
+            filters.append(Attr('event_source').eq(event_source))
+        if sucursal:
+            filters.append(Attr('event_data.sucursal').eq(sucursal))
+
+        index_name = self.list_index(client_id, session_id, event_type)
+        if index_name == 'client_id-index':
+            key_condition = Key('client_id').eq(client_id)
+        elif index_name == 'session_id-index':
+            key_condition = Key('session_id').eq(session_id)
+        elif index_name == 'event_type-timestamp-index':
+            key_condition = Key('event_type').eq(event_type)
+            if timestamp_range:
+                key_condition &= Key('timestamp').between(*timestamp_range)
+                timestamp_range = None
+        else:
+            key_condition = None
+
+        # Filtros que no forman parte de la llave del índice elegido
+        if event_type and index_name != 'event_type-timestamp-index':
+            filters.append(Attr('event_type').eq(event_type))
+        if timestamp_range:
+            filters.append(Attr('timestamp').between(*timestamp_range))
+
+        kwargs = with_projection({'Limit': limit}, fields)
+        if exclusive_start_key:
+            kwargs['ExclusiveStartKey'] = exclusive_start_key
+        if filters:
+            filter_expression = filters[0]
+            for condition in filters[1:]:
+                filter_expression &= condition
+            kwargs['FilterExpression'] = filter_expression
+
+        if index_name:
+            if total_segments:
+                raise ValueError("La búsqueda por segmentos sólo está disponible sin filtros de índice.")
+            return self.query(IndexName=index_name, KeyConditionExpression=key_condition, **kwargs)
+
+        if total_segments:
+            kwargs['Segment'] = segment
+            kwargs['TotalSegments'] = total_segments
+        return self.scan(**kwargs)
+
+    def link_session(self, session_id, attribute, value):
+        """
+        Sets `attribute` = `value` on every event of a session (e.g. the
+        client_id of a client created after browsing anonymously).
+
+        Reads the event_ids of "session_id-index" and updates each event with
+        its own UpdateItem (see update_fields) on the shared executor: only
+        `attribute` and the version change, so concurrent updates of other
+        attributes are kept. Events deleted or moved to another session in
+        the meantime are skipped.
+
+        Returns:
+        - The number of events that were linked.
+        """
+        event_ids = [event['event_id'] for event in self.query_all(
+            IndexName='session_id-index',
+            KeyConditionExpression=Key('session_id').eq(session_id),
+            **projection_kwargs(['event_id'])
+        )]
+
+        def link(event_id):
+            try:
+                self.update_fields({'event_id': event_id}, {attribute: value}, condition=Attr('session_id').eq(session_id))
+            except ItemNotFound:
+                return False
+            return True
+
+        futures = [get_executor().submit(link, event_id) for event_id in event_ids]
+        wait(futures)
+        self.by_id.invalidate(*event_ids)
+        return sum(future.result() for future in futures)
+
+
+class EventStatsRepo(DynamoRepository):
+    """
+    Daily event aggregates: one item per day under the "DAILY" partition,
+    with flat counters ("total", "type#<event_type>", "source#<event_source>")
+    incremented atomically with UpdateItem ADD.
+    """
+
+    table_setting = 'EVENT_STATS_TABLE_NAME'
+
+    PARTITION = 'DAILY'
+
+    @staticmethod
+    def counters(event):
+        """Returns the counters one event adds to its day."""
+        return {
+            'total': 1,
+            f"type#{event.get('event_type') or 'unknown'}": 1,
+            f"source#{event.get('event_source') or 'unknown'}": 1,
+        }
+
+    def record(self, events):
+        """Adds `events` to the counters of their days (one UpdateItem per day)."""
+        by_day = defaultdict(Counter)
+        for event in events:
+            by_day[event['timestamp'][:10]].update(self.counters(event))
+
+        for day, counters in by_day.items():
+            names = {f'#c{i}': name for i, name in enumerate(counters)}
+            values = {f':c{i}': count for i, count in enumerate(counters.values())}
+            self.update_item(
+                {'pk': self.PARTITION, 'day': day},
+                UpdateExpression='ADD ' + ', '.join(f'#c{i} :c{i}' for i in range(len(counters))),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+            )
+
+    def between(self, date_from, date_to):
+        """Returns the aggregates of every day from `date_from` to `date_to` (inclusive) with one query."""
+        return list(self.query_all(
+            KeyConditionExpression=Key('pk').eq(self.PARTITION) & Key('day').between(date_from, date_to),
+        ))
+
+    def replace(self, counters_by_day, date_from, date_to):
+        """
+        Overwrites the aggregates of the range with `counters_by_day`
+        ({day: {counter: count}}) and deletes the days of the range that no
+        longer have events.
+
+        Returns:
+        - The number of write requests DynamoDB did not process.
+        """
+        stale_days = {item['day'] for item in self.between(date_from, date_to)} - set(counters_by_day)
+        requests = [
+            {'PutRequest': {'Item': {'pk': self.PARTITION, 'day': day, **counters}}}
+            for day, counters in counters_by_day.items()
+        ]
+        requests += [{'DeleteRequest': {'Key': {'pk': self.PARTITION, 'day': day}}} for day in stale_days]
+        return len(self.batch_write(requests, concurrency=4))
+
+
+class MessageRepo(DynamoRepository):
+    table_setting = 'MESSAGE_TABLE_NAME'
+    # Atributos de un mensaje (no hay serializer; los escribe el bot de mensajería)
+    FIELDS = ('id_chat', 'fecha', 'de_numero', 'para_numero', 'mensaje')
+
+    # Atributos de número; cada uno tiene su índice y su versión E.164 (<atributo>_e164, ver apiMZD.phone)
+    NUMBER_ATTRIBUTES = ('de_numero', 'para_numero')
+
+    @staticmethod
+    def number_key(attribute, numero):
+        """
+        Returns (IndexName, key condition) to query the messages whose
+        `attribute` ("de_numero" or "para_numero") is `numero`. With
+        settings.PHONE['E164_LOOKUPS'] the <attribute>_e164 index is queried
+        with `numero` normalized, so any way of writing it finds them.
+        """
+        if settings.PHONE['E164_LOOKUPS']:
+            attribute, numero = f'{attribute}_e164', to_e164(numero) or numero
+        return f'{attribute}-index', Key(attribute).eq(numero)
+
+    def query_from(self, numero, **kwargs):
+        """Queries the de_numero index (see number_key), newest messages first."""
+        index_name, key_condition = self.number_key('de_numero', numero)
+        return self.query(
+            IndexName=index_name,
+            KeyConditionExpression=key_condition,
+            ScanIndexForward=False,
+            **kwargs
+        )
+
+    def query_to(self, numero, **kwargs):
+        """Queries the para_numero index (see number_key), newest messages first."""
+        index_name, key_condition = self.number_key('para_numero', numero)
+        return self.query(
+            IndexName=index_name,
+            KeyConditionExpression=key_condition,
+            ScanIndexForward=False,
+            **kwargs
+        )
+
+    @classmethod
+    def missing_e164(cls, message):
+        """The <attribute>_e164 values of `message` that are missing or out of date ({name: value or None})."""
+        changes = {}
+        for attribute in cls.NUMBER_ATTRIBUTES:
+            value = to_e164(message.get(attribute))
+            if message.get(f'{attribute}_e164') != value:
+                changes[f'{attribute}_e164'] = value
+        return changes
+
+    def set_numbers_e164(self, message, changes):
+        """
+        Writes the normalized numbers of `message` (`changes` from
+        missing_e164; None removes the attribute). Skipped when the message
+        was deleted or its numbers changed meanwhile.
+
+        Returns:
+        - True if the message was updated.
+        """
+        names, values, assignments, removals = {}, {}, [], []
+        condition = Attr('id_chat').exists()
+        for attribute in self.NUMBER_ATTRIBUTES:
+            if message.get(attribute) is None:
+                condition &= Attr(attribute).not_exists()
+            else:
+                condition &= Attr(attribute).eq(message[attribute])
+        for index, (name, value) in enumerate(changes.items()):
+            names[f'#e{index}'] = name
+            if value is None:
+                removals.append(f'#e{index}')
+            else:
+                values[f':e{index}'] = value
+                assignments.append(f'#e{index} = :e{index}')
+        update_expression = ' '.join(
+            f'{action} {", ".join(parts)}' for action, parts in (('SET', assignments), ('REMOVE', removals)) if parts
+        )
+        kwargs = {'ExpressionAttributeValues': values} if values else {}
+        try:
+            self.update_item(
+                {'id_chat': message['id_chat'], 'fecha': message['fecha']},
+                UpdateExpression=update_expression,
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                **kwargs
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    # Texto que identifica el mensaje de aprobación de crédito (ver CreditApprovalMessageView)
+    CREDIT_APPROVAL_TEXT = 'expediente'
+
+    def first_to(self, numero, condition=None, page_size=1, max_page_size=100, fields=None):
+        """
+        Returns the newest message sent to `numero` (see number_key) that
+        matches `condition` (a FilterExpression), or None.
+
+        Pages are read newest first with Limit `page_size`, doubled on every
+        page up to `max_page_size`, and the query stops at the first match:
+        DynamoDB applies Limit before the filter, so a page can come back
+        empty and still not be the last one.
+        """
+        index_name, key_condition = self.number_key('para_numero', numero)
+        query_kwargs = with_projection({
+            'IndexName': index_name,
+            'KeyConditionExpression': key_condition,
+            'ScanIndexForward': False,
+            'Limit': page_size,
+        }, fields)
+        if condition is not None:
+            query_kwargs['FilterExpression'] = condition
+
+        while True:
+            response = self.query(**query_kwargs)
+            if response['Items']:
+                return response['Items'][0]
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                return None
+            query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+            query_kwargs['Limit'] = min(query_kwargs['Limit'] * 2, max_page_size)
+
+    def latest_to(self, numero, fields=None):
+        """The newest message sent to `numero` (a single one-item query), or None."""
+        return self.first_to(numero, fields=fields)
+
+    def credit_approval_to(self, numero, fields=None):
+        """The newest credit-approval message sent to `numero`, or None."""
+        return self.first_to(numero, Attr('mensaje').contains(self.CREDIT_APPROVAL_TEXT), page_size=10, fields=fields)
+
+    @classmethod
+    def is_credit_approval(cls, message):
+        return cls.CREDIT_APPROVAL_TEXT in str(message.get('mensaje', ''))
+
+    # El merge de iter_conversation ordena por fecha y deduplica por id_chat
+    CONVERSATION_KEY_FIELDS = ('id_chat', 'fecha')
+
+    def iter_conversation(self, numero, before=None, page_size=None, fields=None):
+        """
+        Yields every message sent from or to `numero`, newest first.
+
+        Both indexes are queried concurrently and their (already ordered)
+        results are merged lazily on `fecha`. Messages returned by both
+        indexes (de_numero == para_numero) are yielded once. With `before`
+        only messages strictly older than that fecha are returned. `fields`
+        must include CONVERSATION_KEY_FIELDS.
+        """
+        sources = []
+        for attribute in self.NUMBER_ATTRIBUTES:
+            index_name, key_condition = self.number_key(attribute, numero)
+            if before:
+                key_condition &= Key('fecha').lt(before)
+            query_kwargs = {
+                'IndexName': index_name,
+                'KeyConditionExpression': key_condition,
+                'ScanIndexForward': False,
+            }
+            if page_size:
+                query_kwargs['Limit'] = page_size
+            sources.append(query_all_async(self.table, **with_projection(query_kwargs, fields)))
+
+        current_fecha, seen = None, set()
+        for message in heapq.merge(*sources, key=itemgetter('fecha'), reverse=True):
+            if message['fecha'] != current_fecha:
+                current_fecha, seen = message['fecha'], set()
+            if message['id_chat'] in seen:
+                continue
+            seen.add(message['id_chat'])
+            yield message
+
+    def delete(self, id_chat, fecha):
+        self.delete_item({'id_chat': id_chat, 'fecha': fecha})
+
+    def delete_many(self, keys, concurrency=1):
+        """
+        Deletes (id_chat, fecha) keys in 25-key BatchWriteItem batches.
+
+        Returns:
+        - The number of messages that could not be deleted.
+        """
+        requests = [{'DeleteRequest': {'Key': {'id_chat': id_chat, 'fecha': fecha}}} for id_chat, fecha in keys]
+        return len(self.batch_write(requests, concurrency=concurrency))
+
+    def purge_number(self, numero, max_items, cursor=None, concurrency=4):
+        """
+        Deletes up to `max_items` messages sent from or to `numero`.
+
+        Reads only the keys of both indexes, dedupes them on (id_chat, fecha)
+        and deletes them in parallel batches. `cursor` is the mapping returned
+        by a previous call ({index_name: ExclusiveStartKey or None when done}).
+
+        Returns:
+        - (deleted, failed, cursor); cursor is None when both indexes are done.
+        """
+        indexes = [self.number_key(attribute, numero) for attribute in self.NUMBER_ATTRIBUTES]
+        # {} = índice aún sin leer, None = índice terminado
+        cursor = {index_name: {} for index_name, _ in indexes} | dict(cursor or {})
+        keys = set()
+
+        for index_name, key_condition in indexes:
+            start_key = cursor[index_name]
+            while start_key is not None and len(keys) < max_items:
+                query_kwargs = {
+                    'IndexName': index_name,
+                    'KeyConditionExpression': key_condition,
+                    'ProjectionExpression': 'id_chat, fecha',
+                    'Limit': max_items - len(keys),
+                }
+                if start_key:
+                    query_kwargs['ExclusiveStartKey'] = start_key
+                response = self.query(**query_kwargs)
+                keys.update((item['id_chat'], item['fecha']) for item in response.get('Items', []))
+                start_key = response.get('LastEvaluatedKey')
+            cursor[index_name] = start_key
+
+        failed = self.delete_many(keys, concurrency=concurrency)
+        if all(start_key is None for start_key in cursor.values()):
+            cursor = None
+        return len(keys) - failed, failed, cursor
+
+
+class VendedorRepo(DynamoRepository):
+    table_setting = 'VENDEDORES_TABLE_NAME'
+
+    by_id = ItemCache('vendedor')
+
+    def get(self, vendedor_id, fields=None):
+        if fields:
+            return self.get_item({'vendedor_id': vendedor_id}, **with_projection({}, fields))
+        return self.by_id.get_or_load(vendedor_id, lambda: self.get_item({'vendedor_id': vendedor_id}))
+
+    def save(self, vendedor):
+        self.put_item(vendedor)
+        self.by_id.invalidate(vendedor['vendedor_id'])
+
+    def find_by_email(self, email, fields=None):
+        response = self.query(**with_projection({
+            'IndexName': 'email-index',
+            'KeyConditionExpression': Key('email').eq(email),
+        }, fields))
+        return response.get('Items', [])
+
+    def list_page(self, limit, exclusive_start_key=None, fields=None):
+        """Lists vendedores through "gsi_pk-nombre-index", ordered by nombre."""
+        query_kwargs = {
+            'IndexName': 'gsi_pk-nombre-index',
+            'KeyConditionExpression': Key('gsi_pk').eq('VENDEDORES'),
+            'Limit': limit,
+        }
+        if exclusive_start_key:
+            query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+        return self.query(**with_projection(query_kwargs, fields))
+
+    def by_sucursal_page(self, sucursal, limit, exclusive_start_key=None, fields=None):
+        query_kwargs = {
+            'IndexName': 'sucursal-index',
+            'KeyConditionExpression': Key('sucursal').eq(sucursal),
+            'Limit': limit,
+        }
+        if exclusive_start_key:
+            query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+        return self.query(**with_projection(query_kwargs, fields))
+
+
+class MessagePointerRepo(DynamoRepository):
+    """
+    One item per number ("numero") pointing to the newest message sent to it
+    ("latest") and to the newest credit-approval message ("credit_approval"),
+    so both lookups are a single GetItem. Kept up to date from the messages
+    table stream (see api_clients/message_pointers.py).
+
+    An item is always written complete (both pointers computed from the
+    index); a missing pointer inside an existing item means there is no such
+    message.
+    """
+
+    table_setting = 'MESSAGE_POINTER_TABLE_NAME'
+    KINDS = ('latest', 'credit_approval')
+
+    @property
+    def enabled(self):
+        return bool(self.table_name)
+
+    def get(self, numero):
+        return self.get_item({'numero': numero})
+
+    def create(self, pointer):
+        """Writes a new pointer item; returns False if the number already has one."""
+        try:
+            self.put_item(pointer, ConditionExpression=Attr('numero').not_exists())
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    def advance(self, numero, kind, message):
+        """
+        Points `kind` of `numero` to `message` unless it already points to a
+        newer one.
+
+        Returns:
+        - False when the number has no pointer item yet (it has to be built
+          from the index), True otherwise.
+        """
+        try:
+            self.update_item(
+                {'numero': numero},
+                UpdateExpression='SET #k = :m',
+                ConditionExpression=Attr('numero').exists() & (
+                    Attr(kind).not_exists() | Attr(f'{kind}.fecha').lte(message['fecha'])
+                ),
+                ExpressionAttributeNames={'#k': kind},
+                ExpressionAttributeValues={':m': message},
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Sin Item: no hay puntero; con Item: ya apunta a un mensaje más nuevo
+            return bool(e.response.get('Item'))
+        return True
+
+    def forget(self, numero, message):
+        """Deletes the pointer item of `numero` if either pointer refers to `message`."""
+        condition = None
+        for kind in self.KINDS:
+            same = Attr(f'{kind}.id_chat').eq(message['id_chat']) & Attr(f'{kind}.fecha').eq(message['fecha'])
+            condition = same if condition is None else condition | same
+        try:
+            self.delete_item({'numero': numero}, ConditionExpression=condition)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    def replace_all(self, pointers):
+        """
+        Overwrites every pointer item with `pointers` ({numero: item}) and
+        deletes the items of numbers that are not in it.
+
+        Returns:
+        - The number of write requests DynamoDB did not process.
+        """
+        stale = {
+            item['numero'] for item in scan_all(self.table, **projection_kwargs(['numero']))
+        } - set(pointers)
+        requests = [{'PutRequest': {'Item': item}} for item in pointers.values()]
+        requests += [{'DeleteRequest': {'Key': {'numero': numero}}} for numero in stale]
+        return len(self.batch_write(requests, concurrency=4))
+
+
+client_repo = ClientRepo()
+event_repo = EventRepo()
+event_stats_repo = EventStatsRepo()
+message_repo = MessageRepo()
+message_pointer_repo = MessagePointerRepo()
+vendedor_repo = VendedorRepo()
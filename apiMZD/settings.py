@@ -54,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apiMZD.metrics.DynamoDBMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -98,6 +99,14 @@ CORS_ALLOW_HEADERS = [
 ]
 
 
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'apiMZD.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+
 ROOT_URLCONF = 'apiMZD.urls'
 
 TEMPLATES = [
@@ -118,6 +127,141 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'apiMZD.wsgi.application'
 
+# Vistas async (aiobotocore) para las lecturas más frecuentes; apiMZD/asgi.py
+# las activa. Bajo WSGI cada vista async correría en su propio event loop.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+
+# DynamoDB
+# Tablas y configuración del cliente compartido (ver apiMZD/dynamodb.py)
+
+CLIENT_TABLE_NAME = config('CLIENT_TABLE_NAME', default='clients_default')
+EVENT_TABLE_NAME = config('EVENT_TABLE_NAME', default='eventsv2_default')
+EVENT_STATS_TABLE_NAME = config('EVENT_STATS_TABLE_NAME', default='event_stats_default')
+MESSAGE_TABLE_NAME = config('MESSAGE_TABLE_NAME', default='chat-mensaje-dev2')
+VENDEDORES_TABLE_NAME = config('VENDEDORES_TABLE_NAME', default='vendedores')
+# Punteros por número al último mensaje y a la última aprobación de crédito
+# (llave "numero"). Sólo se mantienen con el stream de MESSAGE_TABLE_NAME
+# conectado a api_clients.message_pointers.handle_stream. Vacío: las vistas
+# consultan para_numero-index.
+MESSAGE_POINTER_TABLE_NAME = config('MESSAGE_POINTER_TABLE_NAME', default='')
+
+# Números de teléfono normalizados a E.164 (ver apiMZD/phone.py). COUNTRY_CODE
+# y NATIONAL_LENGTH aplican a los números escritos sin código de país. Con
+# E164_LOOKUPS las búsquedas por número usan number_e164-index (clientes) y
+# de_numero_e164-index/para_numero_e164-index (mensajes); activarlo después de
+# `manage.py backfill_phone_numbers`.
+PHONE = {
+    'COUNTRY_CODE': config('PHONE_COUNTRY_CODE', default='52'),
+    'NATIONAL_LENGTH': config('PHONE_NATIONAL_LENGTH', default=10, cast=int),
+    'E164_LOOKUPS': config('PHONE_E164_LOOKUPS', default=False, cast=bool),
+}
+
+DYNAMODB = {
+    'REGION_NAME': config('DYNAMODB_REGION_NAME', default='us-east-1'),
+    'MAX_POOL_CONNECTIONS': config('DYNAMODB_MAX_POOL_CONNECTIONS', default=50, cast=int),
+    'RETRY_MODE': config('DYNAMODB_RETRY_MODE', default='adaptive'),
+    'MAX_ATTEMPTS': config('DYNAMODB_MAX_ATTEMPTS', default=5, cast=int),
+    'CONNECT_TIMEOUT': config('DYNAMODB_CONNECT_TIMEOUT', default=2, cast=float),
+    'READ_TIMEOUT': config('DYNAMODB_READ_TIMEOUT', default=5, cast=float),
+    'TCP_KEEPALIVE': config('DYNAMODB_TCP_KEEPALIVE', default=True, cast=bool),
+    # Hilos para consultas/escrituras en paralelo; no debe superar MAX_POOL_CONNECTIONS
+    'MAX_WORKERS': config('DYNAMODB_MAX_WORKERS', default=16, cast=int),
+    # Hilos aparte para los scans que se transmiten al cliente (GET /clients/?all=true)
+    'STREAM_WORKERS': config('DYNAMODB_STREAM_WORKERS', default=8, cast=int),
+}
+
+
+# Token de las operaciones de administración (ver apiMZD/permissions.py), como
+# el listado completo de clientes (GET /clients/?all=true). Vacío: deshabilitadas.
+ADMIN_API_TOKEN = config('ADMIN_API_TOKEN', default='')
+
+
+# Cache
+# "dynamodb" guarda las búsquedas puntuales de clientes, vendedores y eventos
+# (ver apiMZD/cache.py). Por defecto es un LRU en memoria por proceso; para
+# compartirla entre instancias basta con cambiar el BACKEND/LOCATION.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dynamodb': {
+        'BACKEND': config('DYNAMODB_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('DYNAMODB_CACHE_LOCATION', default='dynamodb-items'),
+        'TIMEOUT': config('DYNAMODB_CACHE_TIMEOUT', default=60, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('DYNAMODB_CACHE_MAX_ENTRIES', default=5000, cast=int),
+        },
+    },
+}
+
+
+# Escritura diferida de eventos (ver api_events/write_behind.py)
+# Con ENABLED, POST /events/create/ responde 202 y el evento se escribe en
+# segundo plano. SPILL_PATH guarda la cola pendiente entre reinicios (vacío:
+# var/event-queue.jsonl o var/event-queue.sqlite3 según el BACKEND); cada
+# worker bloquea su propio archivo. Dejar ENABLED en False en Lambda (Zappa):
+# el hilo que escribe se congela entre invocaciones.
+
+EVENT_WRITE_BEHIND = {
+    'ENABLED': config('EVENT_WRITE_BEHIND_ENABLED', default=False, cast=bool),
+    'BACKEND': config('EVENT_WRITE_BEHIND_BACKEND', default='api_events.write_behind.MemoryQueue'),
+    'SPILL_PATH': config('EVENT_WRITE_BEHIND_SPILL_PATH', default=''),
+    'MAX_QUEUE': config('EVENT_WRITE_BEHIND_MAX_QUEUE', default=10000, cast=int),
+    'MAX_BATCH': config('EVENT_WRITE_BEHIND_MAX_BATCH', default=100, cast=int),
+    'FLUSH_INTERVAL': config('EVENT_WRITE_BEHIND_FLUSH_INTERVAL', default=1.0, cast=float),
+}
+
+
+# Agregados diarios de eventos en EVENT_STATS_TABLE_NAME (ver api_events/stats.py).
+# Con ENABLED cada escritura de eventos suma a los contadores de su día (una
+# UpdateItem más por día en segundo plano). Los fallos se cuentan en
+# apimzd_event_stats_failures_total; `manage.py rebuild_event_stats`
+# recalcula los días afectados (o todos, al activarlo).
+
+EVENT_STATS = {
+    'ENABLED': config('EVENT_STATS_ENABLED', default=False, cast=bool),
+}
+
+
+# Búsqueda de clientes por nombre, email, teléfono e instagram (ver api_clients/search.py)
+# El índice es un archivo SQLite (PATH; ':memory:' para uno por proceso).
+# Vacío: la búsqueda está apagada (503). `manage.py rebuild_client_search` lo
+# reconstruye desde la tabla de clientes; con REBUILD_ON_START cada proceso lo
+# reconstruye al abrirlo vacío. El archivo es de cada instancia: en Lambda
+# (p. ej. /tmp/client-search.sqlite3) cada instancia sólo ve los clientes
+# escritos desde su arranque en frío, salvo que PATH esté en EFS.
+
+CLIENT_SEARCH = {
+    'BACKEND': config('CLIENT_SEARCH_BACKEND', default='api_clients.search.SQLiteSearchBackend'),
+    'PATH': config('CLIENT_SEARCH_PATH', default=''),
+    'REBUILD_ON_START': config('CLIENT_SEARCH_REBUILD_ON_START', default=True, cast=bool),
+}
+
+
+# Métricas por petición (ver apiMZD/metrics.py)
+# Cuenta las llamadas a DynamoDB de cada petición, con su tiempo y capacidad
+# consumida, y agrega el header Server-Timing. RegistryExporter acumula
+# histogramas por vista en /metrics/ (formato de Prometheus); en Lambda usar
+# apiMZD.metrics.EMFExporter. CONSUMED_CAPACITY=NONE deja de pedir la
+# capacidad consumida a DynamoDB. /metrics/ y /cache/stats/ exigen
+# "Authorization: Bearer <TOKEN>" (o ADMIN_API_TOKEN); sin ninguno de los dos
+# responden 403.
+
+METRICS = {
+    'ENABLED': config('METRICS_ENABLED', default=True, cast=bool),
+    'SERVER_TIMING': config('METRICS_SERVER_TIMING', default=True, cast=bool),
+    'CONSUMED_CAPACITY': config('METRICS_CONSUMED_CAPACITY', default='INDEXES'),
+    'EXPORTERS': config(
+        'METRICS_EXPORTERS',
+        default='apiMZD.metrics.RegistryExporter',
+        cast=lambda v: [s.strip() for s in v.split(',') if s.strip()],
+    ),
+    'EMF_NAMESPACE': config('METRICS_EMF_NAMESPACE', default='apiMZD'),
+    'TOKEN': config('METRICS_TOKEN', default=''),
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -0,0 +1,42 @@
+"""
+Slim Django settings for the DynamoDB-only API.
+
+Same as apiMZD.settings, minus the contrib apps and middleware the API never
+uses (admin, auth, sessions, messages, static files) and the browsable API.
+Fewer modules to import means faster Lambda cold starts; select it with
+DJANGO_SETTINGS_MODULE=apiMZD.settings_slim or "django_settings" in
+zappa_settings.json.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'rest_framework',
+    'corsheaders',
+    'api_clients',
+    'api_events',
+    'api_vendedores',
+]
+
+MIDDLEWARE = [
+    'apiMZD.metrics.DynamoDBMetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+
+# Las tablas viven en DynamoDB; no hay modelos de Django
+DATABASES = {}
+
+AUTH_PASSWORD_VALIDATORS = []
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'apiMZD.renderers.ORJSONRenderer',
+    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+}
@@ -0,0 +1,111 @@
+"""
+Base de las pruebas que usan DynamoDB, simulado con moto.
+
+Cada prueba de un DynamoDBTestCase corre contra tablas vacías creadas con los
+nombres de settings (las mismas llaves e índices que en AWS, ver
+benchmarks/load.py), con el recurso de boto3, las tablas de los repositorios
+y la caché "dynamodb" recién creados.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+try:
+    from moto import mock_aws
+except ImportError:
+    # moto < 5
+    from moto import mock_dynamodb as mock_aws
+
+from . import dynamodb, repositories
+from .cache import CACHE_ALIAS
+
+
+def _index(name, hash_key, range_key=None):
+    key_schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+    if range_key:
+        key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+    return {'IndexName': name, 'KeySchema': key_schema, 'Projection': {'ProjectionType': 'ALL'}}
+
+
+# Setting con el nombre de la tabla -> (llave, atributos de llaves e índices, índices)
+TABLES = {
+    'CLIENT_TABLE_NAME': (
+        [('client_id', 'HASH')], ['client_id', 'email', 'number', 'number_e164', 'name'],
+        [
+            _index('email-index', 'email'),
+            _index('number-index', 'number'),
+            _index('number_e164-index', 'number_e164'),
+            _index('name-index', 'name'),
+        ],
+    ),
+    'EVENT_TABLE_NAME': (
+        [('event_id', 'HASH')], ['event_id', 'session_id', 'client_id', 'event_type', 'timestamp'],
+        [
+            _index('session_id-index', 'session_id'),
+            _index('client_id-index', 'client_id'),
+            _index('event_type-timestamp-index', 'event_type', 'timestamp'),
+        ],
+    ),
+    'EVENT_STATS_TABLE_NAME': ([('pk', 'HASH'), ('day', 'RANGE')], ['pk', 'day'], []),
+    'MESSAGE_TABLE_NAME': (
+        [('id_chat', 'HASH'), ('fecha', 'RANGE')],
+        ['id_chat', 'fecha', 'de_numero', 'para_numero', 'de_numero_e164', 'para_numero_e164'],
+        [
+            _index('de_numero-index', 'de_numero', 'fecha'),
+            _index('para_numero-index', 'para_numero', 'fecha'),
+            _index('de_numero_e164-index', 'de_numero_e164', 'fecha'),
+            _index('para_numero_e164-index', 'para_numero_e164', 'fecha'),
+        ],
+    ),
+    'MESSAGE_POINTER_TABLE_NAME': ([('numero', 'HASH')], ['numero'], []),
+    'VENDEDORES_TABLE_NAME': (
+        [('vendedor_id', 'HASH')], ['vendedor_id', 'email', 'sucursal', 'gsi_pk', 'nombre'],
+        [_index('email-index', 'email'), _index('sucursal-index', 'sucursal'), _index('gsi_pk-nombre-index', 'gsi_pk', 'nombre')],
+    ),
+}
+
+
+def create_table(resource, setting):
+    """Creates the table named by `setting` (see TABLES); skipped when the setting is empty."""
+    table_name = getattr(settings, setting)
+    if not table_name:
+        return None
+    key_schema, attributes, indexes = TABLES[setting]
+    options = {
+        'TableName': table_name,
+        'KeySchema': [{'AttributeName': key, 'KeyType': key_type} for key, key_type in key_schema],
+        'AttributeDefinitions': [{'AttributeName': attribute, 'AttributeType': 'S'} for attribute in attributes],
+        'BillingMode': 'PAY_PER_REQUEST',
+    }
+    if indexes:
+        options['GlobalSecondaryIndexes'] = indexes
+    return resource.create_table(**options)
+
+
+class DynamoDBTestCase(SimpleTestCase):
+    """
+    TestCase whose tests run against moto. `tables` lists the settings of the
+    tables to create (all of TABLES by default).
+    """
+
+    tables = tuple(TABLES)
+
+    def setUp(self):
+        super().setUp()
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.addCleanup(self.reset_dynamodb)
+        self.reset_dynamodb()
+        for setting in self.tables:
+            create_table(dynamodb.get_dynamodb(), setting)
+
+    @staticmethod
+    def reset_dynamodb():
+        """Drops the shared resource, the repositories' tables and the cached items."""
+        dynamodb._dynamodb = None
+        for repo in vars(repositories).values():
+            if isinstance(repo, repositories.DynamoRepository):
+                repo._table = None
+        caches[CACHE_ALIAS].clear()
@@ -0,0 +1,404 @@
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from boto3.dynamodb.types import Binary
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from . import export
+from .dynamodb import batch_write, get_dynamodb
+from .export import CHECKPOINT, MANIFEST, ExportError, TableExport, last_watermark, unfinished_run
+from .metrics import EMFExporter, RequestMetrics, registry, request_summary
+from .pagination import (
+    InvalidPageToken, decode_cursor, decode_page_token, encode_cursor, encode_page_token, page_token_param,
+    parse_page_size,
+)
+from .phone import to_e164
+from .renderers import ORJSONRenderer, render_ndjson_line
+from .repositories import client_repo, event_repo, message_repo
+from .testing import DynamoDBTestCase
+
+
+class LazyInitializationTests(SimpleTestCase):
+
+    # Carga las rutas (y con ellas todas las vistas y repositorios) como en un cold start
+    script = (
+        'import django; django.setup()\n'
+        'from django.urls import get_resolver; get_resolver().url_patterns\n'
+        'from apiMZD import dynamodb, repositories\n'
+        'repos = [r for r in vars(repositories).values() if isinstance(r, repositories.DynamoRepository)]\n'
+        'print(dynamodb._dynamodb is None, bool(repos) and all(r._table is None for r in repos))\n'
+    )
+
+    def test_importing_the_views_does_not_build_the_resource(self):
+        for settings_module in ('apiMZD.settings', 'apiMZD.settings_slim'):
+            with self.subTest(settings_module=settings_module):
+                result = subprocess.run(
+                    [sys.executable, '-c', self.script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                    env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module, 'SECRET_KEY': settings.SECRET_KEY},
+                )
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertEqual(result.stdout.split(), ['True', 'True'])
+
+    def test_resource_is_built_once_on_first_use(self):
+        DynamoDBTestCase.reset_dynamodb()
+        self.addCleanup(DynamoDBTestCase.reset_dynamodb)
+        self.assertIs(get_dynamodb(), get_dynamodb())
+        self.assertIs(event_repo.table, event_repo.table)
+
+
+class LoadTestHarnessTests(SimpleTestCase):
+    """Smoke run of benchmarks/load.py: every route has a scenario and answers without errors."""
+
+    def test_every_endpoint_runs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'load.json'
+            result = subprocess.run(
+                [
+                    sys.executable, 'benchmarks/load.py', '--clients', '5', '--requests', '2', '--concurrency', '2',
+                    '--events-per-client', '2', '--messages-per-client', '3', '--vendedores', '3', '--latency-ms', '0',
+                    '--output', str(output),
+                ],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+                env={**os.environ, 'SECRET_KEY': settings.SECRET_KEY},
+            )
+            self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+            report = json.loads(output.read_text())
+
+        self.assertEqual(report['uncovered'], [])
+        failing = {
+            f"{endpoint['method']} {endpoint['name']}": endpoint['statuses']
+            for endpoint in report['endpoints'] if endpoint['errors']
+        }
+        self.assertEqual(failing, {})
+        self.assertEqual({sum(endpoint['statuses'].values()) for endpoint in report['endpoints']}, {2})
+        # Las llamadas a DynamoDB de cada petición se cuentan con apiMZD.metrics
+        detail = next(e for e in report['endpoints'] if (e['name'], e['method']) == ('detail_client', 'GET'))
+        self.assertIn('GetItem', detail['dynamodb']['operations'])
+
+
+class PhoneNumberTests(SimpleTestCase):
+
+    def test_every_format_of_a_mexican_number(self):
+        for value in (
+            '+52 999 123 4567', '52 9991234567', '5219991234567', '+521 999 123 4567', '044 999 123 4567',
+            '(999) 123-4567', '9991234567', '0052 999 123 4567', 9991234567,
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(to_e164(value), '+529991234567')
+
+    def test_other_countries_and_invalid_values(self):
+        self.assertEqual(to_e164('+1 (305) 555-0100'), '+13055550100')
+        self.assertEqual(to_e164('3055550100', country_code='1'), '+13055550100')
+        for value in (None, '', 'bot', '123', '+1234567890123456'):
+            with self.subTest(value=value):
+                self.assertIsNone(to_e164(value))
+
+
+class PageTokenTests(SimpleTestCase):
+
+    key = {'client_id': 'c1', 'fecha': Decimal('1700000000.5'), 'gsi_pk': 'CLIENTS'}
+
+    def test_round_trip_keeps_dynamodb_types(self):
+        token = encode_page_token(self.key, 'clients')
+        self.assertEqual(decode_page_token(token, 'clients'), self.key)
+        self.assertIsInstance(decode_page_token(token, 'clients')['fecha'], Decimal)
+
+    def test_last_page_has_no_token(self):
+        self.assertIsNone(encode_page_token(None, 'clients'))
+        self.assertIsNone(encode_page_token({}, 'clients'))
+
+    def test_token_is_bound_to_its_scope(self):
+        token = encode_page_token(self.key, 'vendedores-sucursal:Mérida')
+        for scope in ('clients', 'vendedores-sucursal:Cancún', ''):
+            with self.subTest(scope=scope), self.assertRaises(InvalidPageToken):
+                decode_page_token(token, scope)
+
+    def test_tampered_or_invalid_tokens(self):
+        token = encode_page_token(self.key, 'clients')
+        payload, _, signature = token.rpartition(':')
+        tampered = [
+            token[:-1] + ('A' if token[-1] != 'A' else 'B'),
+            payload.replace(payload[1], 'x' if payload[1] != 'x' else 'y', 1) + ':' + signature,
+            'c1',
+            '',
+            'e30:1abc:xyz',
+        ]
+        for value in tampered:
+            with self.subTest(token=value), self.assertRaises(InvalidPageToken):
+                decode_page_token(value, 'clients')
+
+    @override_settings(SECRET_KEY='otra')
+    def test_other_secret_key(self):
+        with override_settings(SECRET_KEY='una'):
+            token = encode_page_token(self.key, 'clients')
+        with self.assertRaises(InvalidPageToken):
+            decode_page_token(token, 'clients')
+
+    def test_cursor_of_several_sources(self):
+        keys = {'from': self.key, 'to': None}
+        self.assertEqual(decode_cursor(encode_cursor(keys)), keys)
+        self.assertIsNone(encode_cursor({'from': None, 'to': None}))
+        with self.assertRaises(InvalidPageToken):
+            decode_cursor(encode_page_token(self.key, 'clients'))
+
+    def test_cursor_is_bound_to_its_scope(self):
+        keys = {'from': self.key, 'to': None}
+        token = encode_cursor(keys, 'messages-purge:9991234567')
+        self.assertEqual(decode_cursor(token, 'messages-purge:9991234567'), keys)
+        for scope in ('messages-purge:9995550000', ''):
+            with self.subTest(scope=scope), self.assertRaises(InvalidPageToken):
+                decode_cursor(token, scope)
+
+
+class PageParametersTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_page_token_param(self):
+        self.assertEqual(page_token_param(self.factory.get('/', {'next_page_token': 'a'})), 'a')
+        self.assertEqual(page_token_param(self.factory.get('/', {'last_evaluated_key': 'b'})), 'b')
+        self.assertEqual(page_token_param(self.factory.get('/', {'next_page_token': 'a', 'last_evaluated_key': 'b'})), 'a')
+        self.assertIsNone(page_token_param(self.factory.get('/')))
+
+    def test_parse_page_size(self):
+        self.assertEqual(parse_page_size(self.factory.get('/'), 100, 1000), 100)
+        self.assertEqual(parse_page_size(self.factory.get('/', {'page_size': '1000'}), 100, 1000), 1000)
+        for value in ('0', '1001', '-5', 'diez', '1.5', ''):
+            with self.subTest(page_size=value), self.assertRaises(ValueError):
+                parse_page_size(self.factory.get('/', {'page_size': value}), 100, 1000)
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    def test_dynamodb_types(self):
+        data = {
+            'entero': Decimal('5'), 'decimal': Decimal('5.5'), 'grande': Decimal(2 ** 70),
+            'etiquetas': {'a'}, 'archivo': Binary(b'hola'),
+        }
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(data)),
+            {'entero': 5, 'decimal': 5.5, 'grande': float(2 ** 70), 'etiquetas': ['a'], 'archivo': 'aG9sYQ=='},
+        )
+
+    def test_integral_decimals_render_as_ints(self):
+        # A diferencia de DRF, que da 5.0
+        self.assertEqual(JSONRenderer().render({'n': Decimal('5')}), b'{"n":5.0}')
+        self.assertEqual(ORJSONRenderer().render({'n': Decimal('5')}), b'{"n":5}')
+        self.assertEqual(render_ndjson_line({'n': Decimal('5'), 'm': Decimal('0.25')}), b'{"n":5,"m":0.25}\n')
+
+    def test_integers_beyond_64_bits_fall_back_to_drf(self):
+        self.assertEqual(json.loads(ORJSONRenderer().render({'n': 2 ** 70})), {'n': 2 ** 70})
+
+
+class BatchWriteTests(DynamoDBTestCase):
+
+    def requests(self, count):
+        return [{'PutRequest': {'Item': {'event_id': f'e{i}', 'session_id': 's1'}}} for i in range(count)]
+
+    def test_every_chunk_is_written(self):
+        for concurrency in (1, 4):
+            with self.subTest(concurrency=concurrency):
+                self.assertEqual(batch_write(event_repo.table, self.requests(60), concurrency=concurrency), [])
+                self.assertEqual(event_repo.table.scan(Select='COUNT')['Count'], 60)
+
+    @mock.patch('apiMZD.dynamodb.time.sleep')
+    def test_unprocessed_items_are_retried(self, sleep):
+        table = mock.Mock()
+        table.name = 'events'
+        requests = self.requests(3)
+        table.meta.client.batch_write_item.side_effect = [
+            {'UnprocessedItems': {'events': requests[1:]}},
+            {'UnprocessedItems': {'events': requests[2:]}},
+            {'UnprocessedItems': {}},
+        ]
+        self.assertEqual(batch_write(table, requests), [])
+        sent = [call.kwargs['RequestItems']['events'] for call in table.meta.client.batch_write_item.call_args_list]
+        self.assertEqual(sent, [requests, requests[1:], requests[2:]])
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch('apiMZD.dynamodb.time.sleep')
+    def test_unprocessed_items_are_returned_after_the_last_attempt(self, sleep):
+        table = mock.Mock()
+        table.name = 'events'
+        requests = self.requests(2)
+        table.meta.client.batch_write_item.return_value = {'UnprocessedItems': {'events': requests[1:]}}
+        self.assertEqual(batch_write(table, requests, max_attempts=3), requests[1:])
+        self.assertEqual(table.meta.client.batch_write_item.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+
+class TableExportTests(DynamoDBTestCase):
+    """Exports of a table whose timestamp attribute is a number (a Decimal once read)."""
+
+    tables = ()
+
+    def setUp(self):
+        super().setUp()
+        self.table = get_dynamodb().create_table(
+            TableName='lecturas', KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}], BillingMode='PAY_PER_REQUEST',
+        )
+        self.put(range(1, 9))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = directory.name
+
+    def put(self, moments):
+        for moment in moments:
+            self.table.put_item(Item={'id': f'r{moment}', 'ts': moment})
+
+    def export(self, since=None, run='1'):
+        table_export = TableExport(
+            self.table, 'lecturas', Path(self.output) / 'lecturas' / run, segments=2, chunk_items=2,
+            timestamp_attribute='ts', since=since,
+        )
+        table_export.start()
+        return table_export
+
+    def exported_ids(self, run_dir):
+        ids = []
+        for path in Path(run_dir).glob('part-*.ndjson.gz'):
+            with gzip.open(path, 'rt') as part:
+                ids += [json.loads(line)['id'] for line in part]
+        return sorted(ids)
+
+    def test_numeric_watermark_round_trips(self):
+        manifest = self.export().run()
+        self.assertEqual(manifest['watermark'], {'N': '8'})
+        self.assertEqual(json.loads((Path(self.output) / 'lecturas' / '1' / MANIFEST).read_text())['watermark'], {'N': '8'})
+        self.assertEqual(last_watermark(self.output, 'lecturas'), Decimal(8))
+
+        self.put([9, 10])
+        manifest = self.export(since=last_watermark(self.output, 'lecturas'), run='2').run()
+        self.assertEqual(manifest['items'], 2)
+        self.assertEqual(manifest['since'], {'N': '8'})
+        self.assertEqual(last_watermark(self.output, 'lecturas'), Decimal(10))
+
+    def test_interrupted_export_resumes_from_the_checkpoint(self):
+        export_segment = TableExport.export_segment
+        segment_0_done = threading.Event()
+
+        def fail_segment_1(table_export, segment):
+            # El segmento 1 falla después de que el 0 terminó (y guardó su watermark)
+            if segment == 1:
+                segment_0_done.wait(5)
+                raise RuntimeError('sin conexión')
+            export_segment(table_export, segment)
+            segment_0_done.set()
+
+        with mock.patch.object(TableExport, 'export_segment', fail_segment_1), self.assertRaises(ExportError):
+            self.export(since=Decimal(0)).run()
+
+        run_dir = unfinished_run(self.output, 'lecturas')
+        checkpoint = json.loads((run_dir / CHECKPOINT).read_text())
+        self.assertEqual(checkpoint['since'], {'N': '0'})
+        self.assertTrue(checkpoint['segment_state']['0']['done'])
+        self.assertEqual(list(checkpoint['segment_state']['0']['watermark']), ['N'])
+
+        resumed = TableExport.resume(self.table, run_dir)
+        self.assertEqual(resumed.since, Decimal(0))
+        resumed.start()
+        manifest = resumed.run()
+        self.assertEqual(manifest['items'], 8)
+        self.assertEqual(manifest['watermark'], {'N': '8'})
+        self.assertEqual(self.exported_ids(run_dir), sorted(f'r{moment}' for moment in range(1, 9)))
+
+    def test_manifests_with_plain_watermarks_are_still_read(self):
+        run_dir = Path(self.output) / 'lecturas' / '0'
+        run_dir.mkdir(parents=True)
+        export.write_json(run_dir / MANIFEST, {'watermark': '2024-01-01 10:00:00 CST-0600'})
+        self.assertEqual(last_watermark(self.output, 'lecturas'), '2024-01-01 10:00:00 CST-0600')
+
+
+class MetricsTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(registry.clear)
+        registry.clear()
+        client_repo.put_item({'client_id': 'c1', 'name': 'Ana'})
+
+    def test_calls_of_each_request_are_counted(self):
+        response = self.client.get(reverse('detail_client', args=['c1']))
+        self.assertRegex(response['Server-Timing'], r'^dynamodb;dur=[\d.]+;desc="1 calls, [\d.]+ RCU, 0 WCU", render;dur=')
+        self.assertIn(
+            f'apimzd_dynamodb_calls_total{{view="detail_client",operation="GetItem",'
+            f'table="{settings.CLIENT_TABLE_NAME}",index=""}} 1',
+            registry.render(),
+        )
+
+        # Segunda lectura: la sirve la caché
+        response = self.client.get(reverse('detail_client', args=['c1']))
+        self.assertIn('desc="0 calls', response['Server-Timing'])
+        self.assertIn('apimzd_requests_total{view="detail_client",method="GET",status="200"} 2', registry.render())
+
+    def test_calls_made_on_the_shared_executor_count_for_the_request(self):
+        message_repo.put_item({
+            'id_chat': 'm1', 'fecha': '2024-01-01 10:00:00 CST-0600', 'de_numero': '9991234567', 'para_numero': '9990000000',
+        })
+        response = self.client.get(reverse('messages-by-phone-number', args=['9991234567']))
+        self.assertIn('desc="2 calls', response['Server-Timing'])
+
+    @override_settings(METRICS={**settings.METRICS, 'SERVER_TIMING': False})
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get(reverse('detail_client', args=['c1']))
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('apimzd_requests_total{view="detail_client"', registry.render())
+
+    def test_metrics_endpoint_requires_a_token(self):
+        self.client.get(reverse('detail_client', args=['c1']))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS={**settings.METRICS, 'TOKEN': 's3cret'}):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE apimzd_request_duration_seconds histogram', response.content)
+        with override_settings(ADMIN_API_TOKEN='admin'):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer admin').status_code, 200)
+
+
+class RequestMetricsTests(SimpleTestCase):
+
+    def test_capacity_is_split_by_table_and_index(self):
+        metrics = RequestMetrics()
+        metrics.record_call('Query', 'clients', 'email-index', 0.01, {
+            'TableName': 'clients', 'CapacityUnits': 1.5, 'Table': {'CapacityUnits': 0.5},
+            'GlobalSecondaryIndexes': {'email-index': {'CapacityUnits': 1.0}},
+        })
+        metrics.record_call('PutItem', 'clients', '', 0.02, {'TableName': 'clients', 'CapacityUnits': 2.0})
+        metrics.record_call('BatchWriteItem', 'clients,events', '', 0.03, [
+            {'TableName': 'clients', 'CapacityUnits': 1.0}, {'TableName': 'events', 'CapacityUnits': 3.0},
+        ])
+        self.assertEqual(metrics.call_count, 3)
+        self.assertEqual(metrics.capacity_units('read'), 1.5)
+        self.assertEqual(metrics.capacity_units('write'), 6.0)
+        self.assertEqual(metrics.capacity[('Query', 'clients', 'email-index', 'read')], 1.0)
+        self.assertAlmostEqual(metrics.dynamodb_seconds, 0.06)
+
+    def test_emf_line(self):
+        metrics = RequestMetrics()
+        metrics.record_call('GetItem', 'clients', '', 0.004, {'TableName': 'clients', 'CapacityUnits': 0.5})
+        request = RequestFactory().get('/')
+        response = mock.Mock(status_code=200)
+        stream = io.StringIO()
+        EMFExporter(namespace='apiMZD-test', stream=stream).export(request_summary(request, response, metrics))
+
+        record = json.loads(stream.getvalue())
+        self.assertEqual(record['_aws']['CloudWatchMetrics'][0]['Namespace'], 'apiMZD-test')
+        self.assertEqual(
+            (record['view'], record['status'], record['DynamoDBCalls'], record['ReadCapacityUnits']), ('unresolved', 200, 1, 0.5),
+        )
+        self.assertEqual(record['DynamoDBTime'], 4.0)
@@ -14,15 +14,26 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
+from .views import CacheStatsView, MetricsView
+
 
 urlpatterns = [
      # Suponiendo que 'api_events' es el nombre de tu app
-    path('admin/', admin.site.urls),
-    path('api-auth/', include('rest_framework.urls')),
     path('clients/', include('api_clients.urls')), 
     path('events/', include('api_events.urls')),
-    path('vendedores/', include('api_vendedores.urls'))
-]
\ No newline at end of file
+    path('vendedores/', include('api_vendedores.urls')),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+]
+
+# El perfil apiMZD.settings_slim no instala el admin ni las apps de sesión
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+        path('api-auth/', include('rest_framework.urls')),
+    ]
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+Validación rápida de serializers DRF para los endpoints de alto volumen.
+
+Cada `Serializer(data=...)` copia (deepcopy) todos sus campos declarados, y
+luego cada campo pasa por varias capas genéricas antes de validar el valor.
+CompiledSerializer prepara una sola vez una función por campo:
+
+- CharField, EmailField, IntegerField y JSONField se validan con una
+  versión directa de lo que hace DRF (mismas conversiones y validadores).
+- El resto de los campos (fechas, campos propios como UUIDFieldToString) y
+  los valores vacíos o nulos usan la `run_validation` del campo de DRF, ya
+  instanciado.
+
+Si cualquier campo no pasa, los datos se validan otra vez con el serializer
+de DRF, así que los errores (y su formato) son exactamente los de DRF; el
+camino rápido sólo decide los casos válidos.
+"""
+
+import json
+import re
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import EmailValidator, MaxLengthValidator, MinLengthValidator
+from django.utils.datastructures import MultiValueDict
+from rest_framework import fields as drf_fields
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, empty
+from rest_framework.serializers import Serializer
+
+
+class _Fallback(Exception):
+    """The fast path cannot decide; validate with DRF."""
+
+
+_CHAR_VALIDATORS = (
+    MaxLengthValidator,
+    MinLengthValidator,
+    drf_fields.ProhibitNullCharactersValidator,
+    drf_fields.ProhibitSurrogateCharactersValidator,
+)
+_SURROGATES = re.compile('[\ud800-\udfff]')
+
+
+def _char_validator(field):
+    allow_blank = field.allow_blank
+    trim_whitespace = field.trim_whitespace
+    max_length = field.max_length
+    min_length = field.min_length
+    email_validator = next((v for v in field.validators if isinstance(v, EmailValidator)), None)
+
+    def validate(data):
+        # Mismo orden que CharField.run_validation + to_internal_value + validadores
+        if data == '' or (trim_whitespace and str(data).strip() == ''):
+            if not allow_blank:
+                raise _Fallback
+            return ''
+        if isinstance(data, bool) or not isinstance(data, (str, int, float)):
+            raise _Fallback
+        value = str(data)
+        if trim_whitespace:
+            value = value.strip()
+        if (max_length is not None and len(value) > max_length) or (min_length is not None and len(value) < min_length):
+            raise _Fallback
+        if '\x00' in value or _SURROGATES.search(value):
+            raise _Fallback
+        if email_validator is not None:
+            try:
+                email_validator(value)
+            except DjangoValidationError:
+                raise _Fallback
+        return value
+
+    return validate
+
+
+def _integer_validator(field):
+    max_string_length = field.MAX_STRING_LENGTH
+    re_decimal = field.re_decimal
+
+    def validate(data):
+        if isinstance(data, str) and len(data) > max_string_length:
+            raise _Fallback
+        try:
+            return int(re_decimal.sub('', str(data)))
+        except (ValueError, TypeError):
+            raise _Fallback
+
+    return validate
+
+
+def _json_validator(field):
+    encoder = field.encoder
+
+    def validate(data):
+        if getattr(data, 'is_json_string', False):
+            raise _Fallback
+        try:
+            json.dumps(data, cls=encoder)
+        except (TypeError, ValueError):
+            raise _Fallback
+        return data
+
+    return validate
+
+
+def _fast_validator(field):
+    """Returns a fast validation function for `field`, or None if DRF's has to be used."""
+    field_class = type(field)
+    # Sólo los validadores que las funciones rápidas reproducen (max_length, email, ...)
+    if field_class is drf_fields.CharField:
+        known_validators = _CHAR_VALIDATORS
+    elif field_class is drf_fields.EmailField:
+        known_validators = (*_CHAR_VALIDATORS, EmailValidator)
+    else:
+        known_validators = ()
+    if not all(isinstance(validator, known_validators) for validator in field.validators):
+        return None
+
+    if field_class in (drf_fields.CharField, drf_fields.EmailField):
+        return _char_validator(field)
+    if field_class is drf_fields.IntegerField:
+        return _integer_validator(field)
+    if field_class is drf_fields.JSONField and not field.binary:
+        return _json_validator(field)
+    return None
+
+
+def _field_validator(field, fast):
+    def validate(data):
+        if fast is not None and data is not empty and data is not None:
+            return fast(data)
+        try:
+            return field.run_validation(data)
+        except (ValidationError, DjangoValidationError):
+            raise _Fallback
+
+    return validate
+
+
+class CompiledSerializer:
+    """
+    Validates data like `serializer_class(data=data).is_valid()`, without
+    building a serializer for valid input.
+
+    A serializer's `validate()` runs after the fast path on the validated
+    fields (a ValidationError from it falls back to DRF for the errors); it
+    is called on a shared instance, so it must not use `partial` or
+    `initial_data`.
+    Serializers with `validate_<field>()` methods, serializer level
+    validators or fields with a `source` are always validated by DRF.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plan = None
+        self._validate_method = None
+
+    def _compile(self):
+        serializer = self.serializer_class()
+        if self.serializer_class.validate is not Serializer.validate:
+            self._validate_method = serializer.validate
+        compilable = (
+            not serializer.validators
+            and not any(hasattr(serializer, 'validate_' + name) for name in serializer.fields)
+        )
+        if not compilable:
+            return ()
+        plan = []
+        for field in serializer._writable_fields:
+            if field.source_attrs != [field.field_name]:
+                return ()
+            plan.append((field.field_name, field.required, _field_validator(field, _fast_validator(field))))
+        return tuple(plan)
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            self._plan = self._compile()
+        return self._plan
+
+    def validate(self, data, partial=False):
+        """
+        Returns (validated_data, errors): the validated dict and None, or None
+        and `serializer.errors` for invalid data.
+        """
+        plan = self.plan
+        if plan and isinstance(data, dict) and not isinstance(data, MultiValueDict):
+            try:
+                return self._validate(plan, data, partial), None
+            except _Fallback:
+                pass
+
+        serializer = self.serializer_class(data=data, partial=partial)
+        if serializer.is_valid():
+            return serializer.validated_data, None
+        return None, serializer.errors
+
+    def _validate(self, plan, data, partial):
+        validated = {}
+        for name, required, validate in plan:
+            value = data.get(name, empty)
+            if value is empty:
+                if partial:
+                    continue
+                if required:
+                    raise _Fallback
+            try:
+                validated[name] = validate(value)
+            except SkipField:
+                pass
+        if self._validate_method is not None:
+            try:
+                validated = self._validate_method(validated)
+            except (ValidationError, DjangoValidationError):
+                raise _Fallback
+        return validated
@@ -0,0 +1,50 @@
+"""
+Concurrencia optimista para las vistas PUT/PATCH.
+
+Cada actualización parcial incrementa el atributo `version` del item (ver
+DynamoRepository.update_fields). El cliente que quiera evitar pisar cambios
+ajenos manda la versión que leyó en el header If-Match; si el item cambió
+mientras tanto la vista responde 412 con el item actual.
+"""
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class InvalidVersion(ValueError):
+    """Raised when the If-Match header is not a version number."""
+
+
+def expected_version(request):
+    """
+    Returns the version sent in the If-Match header (`3`, `"3"` or `W/"3"`),
+    or None when the header is absent or `*`.
+    """
+    value = request.headers.get('If-Match')
+    if value is None or value.strip() == '*':
+        return None
+    value = value.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        version = int(value.strip('"'))
+    except ValueError:
+        raise InvalidVersion("If-Match debe ser el número de versión del registro.")
+    if version < 0:
+        raise InvalidVersion("If-Match debe ser el número de versión del registro.")
+    return version
+
+
+def etag(version):
+    """ETag header value for `version`."""
+    return f'"{int(version)}"'
+
+
+def conflict_response(error):
+    """412 response for a VersionConflict, with the current item and its ETag."""
+    version = error.item.get('version', 0)
+    return Response(
+        {"error": str(error), "current": error.item},
+        status=status.HTTP_412_PRECONDITION_FAILED,
+        headers={'ETag': etag(version)},
+    )
@@ -0,0 +1,40 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views import View
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .cache import cache_stats
+from .metrics import registry
+from .permissions import has_metrics_token
+
+
+class CacheStatsView(APIView):
+    """
+    View exposing the hit/miss counters of the DynamoDB lookup cache.
+    Supports:
+    - GET: Counters of the current process, per lookup (client, client:email, ...).
+      Requires "Authorization: Bearer <token>" with METRICS['TOKEN'] or
+      ADMIN_API_TOKEN (403 otherwise, also when neither is set).
+    """
+
+    def get(self, request):
+        if not has_metrics_token(request):
+            return Response({"error": "Se requiere el token de métricas."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(cache_stats())
+
+
+class MetricsView(View):
+    """
+    View exposing the request and DynamoDB metrics of the current process in
+    the Prometheus text format (see apiMZD/metrics.py).
+    Supports:
+    - GET: Counters and histograms per view. Requires "Authorization: Bearer
+      <token>" with METRICS['TOKEN'] or ADMIN_API_TOKEN (403 otherwise, also
+      when neither is set).
+    """
+
+    def get(self, request):
+        if not has_metrics_token(request):
+            return HttpResponseForbidden()
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
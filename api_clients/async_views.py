@@ -0,0 +1,189 @@
+"""
+Vistas async (ASGI) para las lecturas más frecuentes de clientes y mensajes.
+
+Sólo se montan cuando settings.ASYNC_VIEWS está activo (lo activa
+apiMZD/asgi.py; ver api_clients/urls.py). Responden lo mismo que sus equivalentes en views.py, pero
+consultan DynamoDB con aiobotocore, así que un worker ASGI atiende muchas
+peticiones en paralelo sin un hilo por cada una. Los métodos distintos de GET
+se delegan a la vista síncrona de la misma ruta.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+
+from api_events.serializers import EventSerializer
+from apiMZD.async_repositories import async_client_repo, async_event_repo, async_message_repo
+from apiMZD.fields import InvalidFields, parse_fields
+from apiMZD.renderers import NDJSON_MEDIA_TYPE, ORJSONRenderer, render_ndjson_line
+from apiMZD.repositories import message_repo
+
+from .serializers import ClientSerializer
+from .views import ClientDetailView, MessagesByPhoneNumberView
+
+_renderer = ORJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+
+
+def wants_ndjson(request):
+    return request.GET.get('format') == 'ndjson' or NDJSON_MEDIA_TYPE in request.headers.get('Accept', '')
+
+
+def ndjson_response(items):
+    """Streams an async iterator of items as newline-delimited JSON."""
+    async def lines():
+        async for item in items:
+            yield render_ndjson_line(item)
+
+    return StreamingHttpResponse(lines(), content_type=NDJSON_MEDIA_TYPE)
+
+
+class AsyncReadView(View):
+    """
+    Async view for GET requests. Any other method goes to `sync_view` (the
+    DRF view of the same URL) in a worker thread.
+    """
+
+    sync_view = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') or self.sync_view is None:
+            return super().dispatch(request, *args, **kwargs)
+        return self.delegate(request, *args, **kwargs)
+
+    async def delegate(self, request, *args, **kwargs):
+        view = self.sync_view.as_view()
+        return await sync_to_async(view, thread_sensitive=False)(request, *args, **kwargs)
+
+
+class AsyncClientDetailView(AsyncReadView):
+    """Async GET of ClientDetailView (PUT/PATCH/DELETE are delegated)."""
+
+    sync_view = ClientDetailView
+
+    async def get(self, request, client_id):
+        try:
+            fields = parse_fields(request, ClientSerializer)
+        except InvalidFields as e:
+            return json_response({"error": str(e)}, status=400)
+        try:
+            client = await async_client_repo.get(client_id, fields)
+        except Exception as e:
+            return json_response({"error": str(e)}, status=500)
+        if client:
+            return json_response(client)
+        return json_response({"error": "Cliente no encontrado."}, status=404)
+
+
+class AsyncClientQueryByEmailView(AsyncReadView):
+    """Async version of ClientQueryByEmailAPIView."""
+
+    async def get(self, request, email):
+        try:
+            fields = parse_fields(request, ClientSerializer)
+        except InvalidFields as e:
+            return json_response({"error": str(e)}, status=400)
+        try:
+            clients = await async_client_repo.find_by_email(email, fields)
+        except Exception as e:
+            return json_response({"error": str(e)}, status=500)
+        if clients:
+            return json_response(clients[0])
+        return json_response({"message": "No se encontraron clientes con ese correo electrónico"}, status=404)
+
+
+class AsyncClientQueryByNumberView(AsyncReadView):
+    """Async version of ClientQueryByNumberAPIView."""
+
+    async def get(self, request, number):
+        try:
+            fields = parse_fields(request, ClientSerializer)
+        except InvalidFields as e:
+            return json_response({"error": str(e)}, status=400)
+        try:
+            clients = await async_client_repo.find_by_number(number, fields)
+        except Exception as e:
+            return json_response({"error": str(e)}, status=500)
+        if clients:
+            return json_response(clients)
+        return json_response({"message": "No se encontraron clientes con ese número"}, status=404)
+
+
+class AsyncClientQueryByNameView(AsyncReadView):
+    """Async version of ClientQueryByNameAPIView."""
+
+    async def get(self, request, name):
+        try:
+            fields = parse_fields(request, ClientSerializer)
+        except InvalidFields as e:
+            return json_response({"error": str(e)}, status=400)
+        try:
+            clients = await async_client_repo.find_by_name(name, fields)
+        except Exception as e:
+            return json_response({"error": str(e)}, status=500)
+        if clients:
+            return json_response(clients)
+        return json_response({"message": "No se encontraron clientes con ese nombre"}, status=404)
+
+
+class AsyncClientEventsView(AsyncReadView):
+    """Async version of ClientEventsView, including ?format=ndjson streaming."""
+
+    async def get(self, request, client_id):
+        try:
+            fields = parse_fields(request, EventSerializer)
+        except InvalidFields as e:
+            return json_response({"error": str(e)}, status=400)
+        events = async_event_repo.iter_by_client(client_id, fields=fields)
+        if wants_ndjson(request):
+            return ndjson_response(events)
+        return json_response({"events": [event async for event in events]})
+
+
+class AsyncMessagesByPhoneNumberView(AsyncReadView):
+    """Async version of MessagesByPhoneNumberView (same limit/before paging)."""
+
+    max_limit = MessagesByPhoneNumberView.max_limit
+
+    async def get(self, request, phone_number):
+        before = request.GET.get("before")
+        limit = request.GET.get("limit")
+        if limit is not None:
+            try:
+                limit = int(limit)
+                if not 1 <= limit <= self.max_limit:
+                    raise ValueError
+            except ValueError:
+                return json_response(
+                    {"error": f"limit debe ser un entero entre 1 y {self.max_limit}."}, status=400,
+                )
+
+        try:
+            fields = parse_fields(request, message_repo.FIELDS, message_repo.CONVERSATION_KEY_FIELDS)
+        except InvalidFields as e:
+            return json_response({"error": str(e)}, status=400)
+
+        if wants_ndjson(request):
+            return ndjson_response(async_message_repo.iter_conversation(phone_number, before, fields=fields))
+
+        try:
+            if limit is None:
+                messages = async_message_repo.iter_conversation(phone_number, before, fields=fields)
+                return json_response([message async for message in messages])
+
+            messages = async_message_repo.iter_conversation(phone_number, before, page_size=limit + 1, fields=fields)
+            page, next_before = [], None
+            async for message in messages:
+                # Igual que la vista síncrona: no se corta la página entre mensajes con la misma fecha
+                if len(page) >= limit and message["fecha"] != page[-1]["fecha"]:
+                    next_before = page[-1]["fecha"]
+                    break
+                page.append(message)
+            await messages.aclose()
+            return json_response({"messages": page, "next_before": next_before})
+
+        except Exception as e:
+            return json_response({"error": str(e)}, status=500)
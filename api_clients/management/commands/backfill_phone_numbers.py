@@ -0,0 +1,84 @@
+"""
+Completa los números normalizados (E.164, ver apiMZD/phone.py) de clientes
+(number_e164) y mensajes (de_numero_e164 y para_numero_e164).
+
+    python manage.py backfill_phone_numbers
+    python manage.py backfill_phone_numbers --only clients --segments 16
+    python manage.py backfill_phone_numbers --dry-run
+
+Lee cada tabla con un scan paralelo (sólo los números y la llave) y actualiza
+los items cuyo número normalizado falta o no coincide; ejecutarlo otra vez no
+cambia nada. No incrementa la versión de los clientes. Los clientes escritos
+por la API y los mensajes que pasan por api_clients.message_numbers ya traen
+los atributos, así que basta con ejecutarlo una vez después de crear los
+índices number_e164-index, de_numero_e164-index y para_numero_e164-index y
+antes de activar PHONE_E164_LOOKUPS.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apiMZD.dynamodb import projection_kwargs, scan_segments
+from apiMZD.phone import to_e164
+from apiMZD.repositories import client_repo, message_repo
+
+TABLES = ('clients', 'messages')
+
+
+class Command(BaseCommand):
+    help = "Fills in the E.164 phone number attributes of clients and messages with a parallel scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segments', type=int, default=8, help="Parallel scan segments (default 8).")
+        parser.add_argument('--only', choices=TABLES, help="Backfill only this table.")
+        parser.add_argument('--dry-run', action='store_true', help="Count the items to update without writing.")
+
+    def handle(self, *args, segments=8, only=None, dry_run=False, **options):
+        if segments < 1:
+            raise CommandError("--segments debe ser mayor que 0.")
+
+        for table in TABLES:
+            if only and table != only:
+                continue
+            backfill = getattr(self, f'backfill_{table}')
+            scanned, pending, updated = map(sum, zip(*backfill(segments, dry_run)))
+            if dry_run:
+                summary = f"{table}: {scanned} leídos, {pending} por actualizar."
+            else:
+                summary = (
+                    f"{table}: {scanned} leídos, {updated} actualizados, "
+                    f"{pending - updated} omitidos (cambiaron durante el proceso)."
+                )
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def backfill_clients(self, segments, dry_run):
+        def backfill_segment(segment, clients):
+            scanned = pending = updated = 0
+            for client in clients:
+                scanned += 1
+                number_e164 = to_e164(client.get('number'))
+                if client.get('number_e164') == number_e164:
+                    continue
+                pending += 1
+                if not dry_run and client_repo.set_number_e164(client, number_e164):
+                    updated += 1
+            return scanned, pending, updated
+
+        fields = ('client_id', 'number', 'number_e164')
+        return scan_segments(client_repo.table, segments, backfill_segment, **projection_kwargs(fields))
+
+    def backfill_messages(self, segments, dry_run):
+        def backfill_segment(segment, messages):
+            scanned = pending = updated = 0
+            for message in messages:
+                scanned += 1
+                changes = message_repo.missing_e164(message)
+                if not changes:
+                    continue
+                pending += 1
+                if not dry_run and message_repo.set_numbers_e164(message, changes):
+                    updated += 1
+            return scanned, pending, updated
+
+        fields = ('id_chat', 'fecha', *message_repo.NUMBER_ATTRIBUTES,
+                  *(f'{attribute}_e164' for attribute in message_repo.NUMBER_ATTRIBUTES))
+        return scan_segments(message_repo.table, segments, backfill_segment, **projection_kwargs(fields))
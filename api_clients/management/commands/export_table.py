@@ -0,0 +1,97 @@
+"""
+Exporta una tabla completa (clientes, eventos, mensajes o vendedores) a
+archivos NDJSON comprimidos o Parquet, con un scan paralelo (ver
+apiMZD/export.py).
+
+    python manage.py export_table events
+    python manage.py export_table clients --segments 16 --format parquet --output /data/exports
+    python manage.py export_table events --incremental
+    python manage.py export_table events --resume
+
+Cada ejecución escribe en <output>/<tabla>/<fecha UTC>/ los archivos
+part-sNNN-NNNNN, manifest.json al terminar y, mientras corre, checkpoint.json.
+--resume continúa la última exportación sin terminar de la tabla (con las
+opciones con que empezó). --incremental exporta sólo los eventos o mensajes
+posteriores al watermark de la última exportación terminada; --since fija ese
+valor a mano (mismo formato que el atributo: timestamp o fecha).
+
+El throughput (items por segundo, capacidad consumida) se muestra cada
+--report-interval segundos y queda en el manifest.
+"""
+
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apiMZD.export import FORMATS, ExportError, TableExport, decode_watermark, last_watermark, unfinished_run
+from apiMZD.repositories import client_repo, event_repo, message_repo, vendedor_repo
+
+# Tabla -> (repositorio, atributo de tiempo para las exportaciones incrementales)
+TABLES = {
+    'clients': (client_repo, None),
+    'events': (event_repo, 'timestamp'),
+    'messages': (message_repo, 'fecha'),
+    'vendedores': (vendedor_repo, None),
+}
+
+
+class Command(BaseCommand):
+    help = "Exports a whole table to compressed NDJSON or Parquet files with a parallel scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(TABLES))
+        parser.add_argument('--output', default='exports', help="Base directory (default ./exports).")
+        parser.add_argument('--segments', type=int, default=8, help="Parallel scan segments (default 8).")
+        parser.add_argument('--format', choices=FORMATS, default='ndjson', help="ndjson (gzip) or parquet (needs pyarrow).")
+        parser.add_argument('--chunk-items', type=int, default=50000, help="Items per file (default 50000).")
+        parser.add_argument('--resume', action='store_true', help="Continue the last unfinished export of the table.")
+        parser.add_argument('--incremental', action='store_true', help="Only items newer than the last finished export.")
+        parser.add_argument('--since', help="Only items whose timestamp/fecha is greater than this value.")
+        parser.add_argument('--report-interval', type=float, default=10, help="Seconds between progress lines (default 10).")
+
+    def handle(self, *args, table, output, segments, format, chunk_items, resume, incremental, since,
+               report_interval, **options):
+        repo, timestamp_attribute = TABLES[table]
+        if resume and (incremental or since):
+            raise CommandError("--resume usa las opciones de la exportación original; no se combina con --incremental ni --since.")
+        if (incremental or since) and not timestamp_attribute:
+            raise CommandError(f"{table} no tiene un atributo de tiempo; sólo se puede exportar completa.")
+
+        if resume:
+            run_dir = unfinished_run(output, table)
+            if run_dir is None:
+                raise CommandError(f"No hay una exportación sin terminar de {table} en {output}.")
+            export = TableExport.resume(repo.table, run_dir)
+            self.stdout.write(f"Reanudando {run_dir}")
+        else:
+            if incremental:
+                since = last_watermark(output, table)
+                if since is None:
+                    raise CommandError(f"No hay una exportación terminada de {table} en {output}; exporta completa primero.")
+            run_dir = f"{output}/{table}/{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+            # Las exportaciones completas también guardan el watermark
+            export = TableExport(
+                repo.table, table, run_dir, segments, format, chunk_items, timestamp_attribute, since,
+            )
+            self.stdout.write(f"Exportando {table} a {run_dir}" + (f" ({timestamp_attribute} > {since})" if since else ""))
+
+        def report(progress):
+            self.stdout.write(
+                f"{progress['items']} items ({progress['scanned']} leídos), {progress['items_per_second']} items/s, "
+                f"{progress['consumed_capacity']} RCU, {progress['seconds']} s"
+            )
+
+        try:
+            export.start()
+            manifest = export.run(report, report_interval)
+        except ExportError as e:
+            raise CommandError(str(e))
+        except KeyboardInterrupt:
+            raise CommandError(f"Interrumpida; continúa con: manage.py export_table {table} --resume --output {output}")
+
+        run = manifest['run']
+        self.stdout.write(self.style.SUCCESS(
+            f"{manifest['items']} items en {len(manifest['files'])} archivos ({manifest['bytes'] / 1e6:.1f} MB), "
+            f"{run['seconds']} s, {run['items_per_second']} items/s, {run['consumed_capacity']} RCU."
+            + (f" Watermark: {decode_watermark(manifest['watermark'])}" if manifest['watermark'] is not None else "")
+        ))
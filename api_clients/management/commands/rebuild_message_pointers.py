@@ -0,0 +1,62 @@
+"""
+Reconstruye los punteros de mensajes (último mensaje y última aprobación de
+crédito por número) a partir de la tabla de mensajes.
+
+    python manage.py rebuild_message_pointers
+    python manage.py rebuild_message_pointers --segments 16
+
+Lee la tabla con un scan paralelo, se queda en memoria con los dos mensajes
+más recientes de cada para_numero (agrupados por número normalizado, ver
+api_clients.message_pointers.pointer_key) y sobrescribe la tabla de punteros
+(los números que ya no tienen mensajes se borran). Los mensajes que lleguen
+mientras corre pueden quedar fuera hasta el siguiente mensaje del número;
+conviene ejecutarlo con poco tráfico.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apiMZD.dynamodb import projection_kwargs, scan_segments
+from apiMZD.repositories import message_pointer_repo, message_repo
+from api_clients.message_pointers import newest, pointer_key, pointer_message
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-number message pointers with a parallel scan of the messages table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segments', type=int, default=8, help="Parallel scan segments (default 8).")
+
+    def handle(self, *args, segments=8, **options):
+        if not message_pointer_repo.enabled:
+            raise CommandError("MESSAGE_POINTER_TABLE_NAME no está configurado.")
+        if segments < 1:
+            raise CommandError("--segments debe ser mayor que 0.")
+
+        def latest_segment(segment, messages):
+            latest = {}
+            for message in messages:
+                numero = message.get('para_numero')
+                if not numero or not message.get('fecha'):
+                    continue
+                pointer = latest.setdefault(pointer_key(numero), {})
+                pointer['latest'] = newest(pointer.get('latest'), message)
+                if message_repo.is_credit_approval(message):
+                    pointer['credit_approval'] = newest(pointer.get('credit_approval'), message)
+            return latest
+
+        pointers = {}
+        for latest in scan_segments(message_repo.table, segments, latest_segment, **projection_kwargs(message_repo.FIELDS)):
+            for numero, found in latest.items():
+                pointer = pointers.setdefault(numero, {'numero': numero})
+                for kind, message in found.items():
+                    pointer[kind] = newest(pointer.get(kind), message)
+
+        for pointer in pointers.values():
+            for kind in message_pointer_repo.KINDS:
+                if kind in pointer:
+                    pointer[kind] = pointer_message(pointer[kind])
+
+        unprocessed = message_pointer_repo.replace_all(pointers)
+        if unprocessed:
+            raise CommandError(f"{unprocessed} punteros no se pudieron escribir; vuelve a ejecutar el comando.")
+        self.stdout.write(self.style.SUCCESS(f"Punteros reconstruidos: {len(pointers)} números."))
@@ -0,0 +1,42 @@
+"""
+Números normalizados (E.164) de los mensajes: de_numero_e164 y
+para_numero_e164, llaves de los índices que usan MessagesByPhoneNumberView y
+DeleteMessagesByPhoneNumberView con settings.PHONE['E164_LOOKUPS'].
+
+Los mensajes los escribe el bot de mensajería con el número como lo recibe,
+así que los atributos se agregan desde el stream de la tabla de mensajes con
+`handle_stream`, registrado en Zappa como evento (junto al de
+api_clients.message_pointers, mismo stream):
+
+    "events": [{
+        "function": "api_clients.message_numbers.handle_stream",
+        "event_source": {"arn": "<stream ARN>", "starting_position": "LATEST", "batch_size": 100}
+    }]
+
+La escritura genera otro MODIFY en el stream, que ya trae los números al día
+y no vuelve a escribir. Los mensajes anteriores se completan con
+`manage.py backfill_phone_numbers`.
+"""
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from apiMZD.repositories import message_repo
+
+_deserializer = TypeDeserializer()
+
+
+def handle_stream(event, context=None):
+    """Lambda handler for the stream of the messages table: fills in the E.164 numbers of new and modified messages."""
+    records = event.get('Records', [])
+    updated = 0
+    for stream_record in records:
+        if stream_record.get('eventName') not in ('INSERT', 'MODIFY'):
+            continue
+        new_image = stream_record.get('dynamodb', {}).get('NewImage')
+        if not new_image:
+            continue
+        message = {name: _deserializer.deserialize(value) for name, value in new_image.items()}
+        changes = message_repo.missing_e164(message)
+        if changes and message_repo.set_numbers_e164(message, changes):
+            updated += 1
+    return {'records': len(records), 'updated': updated}
@@ -0,0 +1,139 @@
+"""
+Punteros al último mensaje y a la última aprobación de crédito de cada número.
+
+Con MESSAGE_POINTER_TABLE_NAME, MessagesToClienteView y
+CreditApprovalMessageView leen un solo item (GetItem) en lugar de consultar
+para_numero-index. Los mensajes los escribe el bot de mensajería, así que los
+punteros se mantienen desde el stream de la tabla de mensajes
+(NEW_AND_OLD_IMAGES) con `handle_stream`, registrado en Zappa como evento:
+
+    "events": [{
+        "function": "api_clients.message_pointers.handle_stream",
+        "event_source": {"arn": "<stream ARN>", "starting_position": "LATEST", "batch_size": 100}
+    }]
+
+Los punteros se guardan por número normalizado (ver apiMZD.phone), así
+"+52 999 123 4567" y "9991234567" leen y mueven el mismo item. Un número sin
+puntero se calcula desde el índice la primera vez que se lee o que recibe un
+mensaje (con PHONE['E164_LOOKUPS'] el cálculo incluye los mensajes escritos
+en cualquier formato); `manage.py rebuild_message_pointers` los reconstruye
+todos. Si se borra o modifica un mensaje al que apunta un puntero, el puntero
+se borra y se vuelve a calcular en la siguiente lectura.
+"""
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from apiMZD.phone import to_e164
+from apiMZD.repositories import message_pointer_repo, message_repo
+
+_deserializer = TypeDeserializer()
+
+
+def pointer_key(numero):
+    """The "numero" of the pointer item of `numero`: its E.164 form, or `numero` itself if it has none."""
+    return to_e164(numero) or numero
+
+
+def pointer_message(message):
+    """The attributes of `message` stored in a pointer."""
+    return {name: message[name] for name in message_repo.FIELDS if name in message}
+
+
+def newest(current, message):
+    """The newest of two messages (either may be None); ties keep `message`."""
+    if current is None or (message is not None and current['fecha'] <= message['fecha']):
+        return message
+    return current
+
+
+def refresh(numero, message=None):
+    """
+    Builds the pointer item of `numero` from para_numero-index and stores it.
+    `message` is a message just written for `numero`, which the index (a GSI,
+    eventually consistent) may not return yet.
+
+    Returns:
+    - The pointer item.
+    """
+    latest = message_repo.latest_to(numero)
+    credit_approval = message_repo.credit_approval_to(numero)
+    if message is not None:
+        latest = newest(latest, message)
+        if message_repo.is_credit_approval(message):
+            credit_approval = newest(credit_approval, message)
+
+    pointer = {'numero': pointer_key(numero)}
+    for kind, value in (('latest', latest), ('credit_approval', credit_approval)):
+        if value is not None:
+            pointer[kind] = pointer_message(value)
+
+    if not message_pointer_repo.create(pointer):
+        # Otro proceso lo creó mientras tanto: se aplica el mensaje sobre el suyo
+        if message is not None:
+            record(message)
+        return message_pointer_repo.get(pointer_key(numero)) or pointer
+    return pointer
+
+
+def record(message):
+    """Moves the pointers of the recipient of a new (or modified) message."""
+    numero = message.get('para_numero')
+    if not numero or not message.get('fecha'):
+        return
+    kinds = ['latest']
+    if message_repo.is_credit_approval(message):
+        kinds.append('credit_approval')
+    for kind in kinds:
+        if not message_pointer_repo.advance(pointer_key(numero), kind, pointer_message(message)):
+            refresh(numero, message)
+            return
+
+
+def forget(message):
+    """Drops the pointer item of the recipient if it points to `message` (deleted or modified)."""
+    numero = message.get('para_numero')
+    if numero and message.get('id_chat') and message.get('fecha'):
+        message_pointer_repo.forget(pointer_key(numero), message)
+
+
+def find(numero, kind, fields=None):
+    """
+    Returns the message `kind` ("latest" or "credit_approval") of `numero`,
+    or None: from the pointer item when the pointer table is configured, from
+    para_numero-index otherwise.
+    """
+    if not message_pointer_repo.enabled:
+        if kind == 'credit_approval':
+            return message_repo.credit_approval_to(numero, fields)
+        return message_repo.latest_to(numero, fields)
+
+    pointer = message_pointer_repo.get(pointer_key(numero)) or refresh(numero)
+    message = pointer.get(kind)
+    if message is not None and fields:
+        message = {name: message[name] for name in fields if name in message}
+    return message
+
+
+def handle_stream(event, context=None):
+    """
+    Lambda handler for the stream of the messages table: INSERT moves the
+    pointers forward, REMOVE drops the ones that point to the deleted message
+    and MODIFY does both (unless only attributes the pointers do not store
+    changed).
+    """
+    records = event.get('Records', [])
+    for stream_record in records:
+        change = stream_record.get('dynamodb', {})
+        old_image = {name: _deserializer.deserialize(value) for name, value in change.get('OldImage', {}).items()}
+        new_image = {name: _deserializer.deserialize(value) for name, value in change.get('NewImage', {}).items()}
+        if (
+            stream_record.get('eventName') == 'MODIFY'
+            and old_image and pointer_message(old_image) == pointer_message(new_image)
+        ):
+            # Sólo cambiaron atributos que los punteros no guardan (p. ej. los números E.164)
+            continue
+        if stream_record.get('eventName') in ('MODIFY', 'REMOVE') and old_image:
+            forget(old_image)
+        if stream_record.get('eventName') in ('INSERT', 'MODIFY') and new_image:
+            record(new_image)
+    return {'records': len(records)}
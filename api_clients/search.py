@@ -0,0 +1,366 @@
+"""
+Búsqueda de clientes por nombre, email, teléfono e instagram_username.
+
+Los valores se normalizan (minúsculas, sin acentos ni signos) y se parten en
+tokens; "Juan Pérez", "juan perez" y "JUAN  PÉREZ" dan los mismos tokens.
+Cada token de la búsqueda coincide con los tokens del índice de tres formas,
+de mayor a menor peso:
+
+- exacta: "perez" con "perez".
+- prefijo: "pe" con "perez" (tokens de 2 o más caracteres).
+- aproximada: "peres" con "perez", a distancia de edición 1 (2 para tokens
+  de 8 o más caracteres), sólo para palabras de 4 o más caracteres.
+
+Los resultados se ordenan por cuántos tokens de la búsqueda coinciden y luego
+por el peso total. Los números se indexan completos y con sus últimos 10
+dígitos, así que "9991234567" encuentra "5219991234567".
+
+El índice vive fuera de DynamoDB (settings.CLIENT_SEARCH['BACKEND']), en un
+archivo SQLite (PATH, ':memory:' para uno en memoria). Sin PATH la búsqueda
+está apagada: la vista responde 503 y las escrituras de clientes no tocan el
+índice. Las vistas de clientes lo actualizan al crear, modificar y borrar;
+`manage.py rebuild_client_search` lo reconstruye desde la tabla y, con
+REBUILD_ON_START, cada proceso lo reconstruye la primera vez que lo usa si
+lo encuentra vacío.
+
+Cada instancia tiene su propio archivo: en Lambda (PATH en /tmp) una
+instancia no ve los clientes que se escriben en otra hasta su siguiente
+arranque en frío. Para resultados al día entre instancias el archivo debe
+estar en almacenamiento compartido (EFS).
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from apiMZD.dynamodb import projection_kwargs, scan_segments
+from apiMZD.repositories import client_repo
+
+logger = logging.getLogger(__name__)
+
+# Atributos del cliente que se indexan y se devuelven en los resultados
+SEARCH_FIELDS = ('client_id', 'name', 'email', 'number', 'instagram_username')
+INDEXED_FIELDS = ('name', 'email', 'number', 'instagram_username')
+
+FIELD_WEIGHTS = {'name': 1.0, 'number': 1.0, 'email': 0.9, 'instagram_username': 0.9}
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.5
+
+# Filas de tokens que se leen como máximo por token de la búsqueda
+MAX_CANDIDATES = 5000
+
+_separators = re.compile(r'[^0-9a-z]+')
+_digits = re.compile(r'\D+')
+
+
+def normalize(text):
+    """Lowercase, accent-folded text with only letters, digits and single spaces."""
+    text = unicodedata.normalize('NFKD', str(text)).casefold()
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _separators.sub(' ', text).strip()
+
+
+def document_tokens(document):
+    """Returns the (token, field) pairs to index for a client."""
+    tokens = set()
+    for field in INDEXED_FIELDS:
+        value = document.get(field)
+        if value in (None, ''):
+            continue
+        if field == 'number':
+            digits = _digits.sub('', str(value))
+            if digits:
+                tokens.add((digits, field))
+                tokens.add((digits[-10:], field))
+            continue
+        words = normalize(value).split()
+        tokens.update((word, field) for word in words)
+        if field in ('email', 'instagram_username') and len(words) > 1:
+            # "ana.perez" también como "anaperez"
+            local_part = normalize(str(value).split('@')[0]).split()
+            tokens.add((''.join(local_part), field))
+    return tokens
+
+
+def query_tokens(query):
+    """Normalized tokens of a search; consecutive numbers ("999 123 4567") are joined."""
+    tokens = []
+    for token in normalize(query).split():
+        if token.isdigit() and tokens and tokens[-1].isdigit():
+            tokens[-1] += token
+        else:
+            tokens.append(token)
+    return list(dict.fromkeys(tokens))
+
+
+def max_distance(token):
+    # Los números sólo coinciden exactos o por prefijo
+    if len(token) < 4 or token.isdigit():
+        return 0
+    return 2 if len(token) >= 8 else 1
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between `a` and `b`, or limit + 1 once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _upper_bound(prefix):
+    return prefix + '\U0010ffff'
+
+
+class SQLiteSearchBackend:
+    """
+    Token index in a SQLite file (or ':memory:'). One connection per
+    backend, shared by the threads of the process; WAL lets other processes
+    read while one writes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or ':memory:'
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        if self.path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS clients (
+                client_id TEXT PRIMARY KEY, name TEXT, email TEXT, number TEXT, instagram_username TEXT
+            );
+            CREATE TABLE IF NOT EXISTS tokens (
+                token TEXT NOT NULL, field TEXT NOT NULL, client_id TEXT NOT NULL,
+                PRIMARY KEY (token, field, client_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS tokens_client ON tokens (client_id);
+        ''')
+
+    def _write(self, documents):
+        for document in documents:
+            client_id = document['client_id']
+            self._db.execute('DELETE FROM tokens WHERE client_id = ?', (client_id,))
+            self._db.execute(
+                'INSERT OR REPLACE INTO clients VALUES (?, ?, ?, ?, ?)',
+                tuple(None if document.get(field) is None else str(document[field]) for field in SEARCH_FIELDS),
+            )
+            self._db.executemany(
+                'INSERT OR IGNORE INTO tokens VALUES (?, ?, ?)',
+                [(token, field, client_id) for token, field in document_tokens(document)],
+            )
+
+    def index(self, document):
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._write([document])
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def remove(self, client_id):
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.execute('DELETE FROM tokens WHERE client_id = ?', (client_id,))
+                self._db.execute('DELETE FROM clients WHERE client_id = ?', (client_id,))
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def replace_all(self, documents):
+        """Replaces the whole index with `documents` in one transaction; readers see the old one until it commits."""
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.execute('DELETE FROM tokens')
+                self._db.execute('DELETE FROM clients')
+                self._write(documents)
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def count(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM clients').fetchone()[0]
+
+    def matches(self, token, fuzzy=True):
+        """Returns [(client_id, field, weight)] for one query token (exact, prefix and fuzzy matches)."""
+        with self._lock:
+            if len(token) >= 2:
+                rows = self._db.execute(
+                    'SELECT token, field, client_id FROM tokens WHERE token >= ? AND token < ? LIMIT ?',
+                    (token, _upper_bound(token), MAX_CANDIDATES),
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    'SELECT token, field, client_id FROM tokens WHERE token = ? LIMIT ?', (token, MAX_CANDIDATES),
+                ).fetchall()
+
+            found = []
+            for candidate, field, client_id in rows:
+                if candidate == token:
+                    found.append((client_id, field, EXACT))
+                else:
+                    # Prefijos más cercanos al token completo pesan más
+                    found.append((client_id, field, PREFIX * (0.5 + 0.5 * len(token) / len(candidate))))
+
+            distance = max_distance(token)
+            if not fuzzy or not distance or len(rows) >= MAX_CANDIDATES:
+                return found
+            # Aproximada: mismo primer carácter y longitud parecida
+            candidates = self._db.execute(
+                'SELECT DISTINCT token FROM tokens WHERE token >= ? AND token < ? AND length(token) BETWEEN ? AND ? LIMIT ?',
+                (token[0], _upper_bound(token[0]), len(token) - distance, len(token) + distance, MAX_CANDIDATES),
+            ).fetchall()
+            close = {}
+            for (candidate,) in candidates:
+                if candidate.startswith(token):
+                    continue
+                edits = edit_distance(token, candidate, distance)
+                if edits <= distance:
+                    close[candidate] = edits
+            if close:
+                placeholders = ','.join('?' * len(close))
+                for candidate, field, client_id in self._db.execute(
+                    f'SELECT token, field, client_id FROM tokens WHERE token IN ({placeholders})', list(close),
+                ):
+                    found.append((client_id, field, FUZZY / close[candidate]))
+            return found
+
+    def documents(self, client_ids):
+        with self._lock:
+            placeholders = ','.join('?' * len(client_ids))
+            rows = self._db.execute(
+                f'SELECT {", ".join(SEARCH_FIELDS)} FROM clients WHERE client_id IN ({placeholders})', list(client_ids),
+            ).fetchall()
+        return {row[0]: dict(zip(SEARCH_FIELDS, row)) for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def search(query, limit=20, fuzzy=True, backend=None):
+    """
+    Returns up to `limit` clients matching `query`, best first, each with the
+    SEARCH_FIELDS attributes plus "score" and "matched" (query tokens found).
+    """
+    backend = backend or get_backend()
+    tokens = query_tokens(query)
+    best = defaultdict(dict)
+    for token in tokens:
+        for client_id, field, weight in backend.matches(token, fuzzy):
+            weight *= FIELD_WEIGHTS[field]
+            if weight > best[client_id].get(token, 0):
+                best[client_id][token] = weight
+
+    ranked = sorted(best.items(), key=lambda entry: (-len(entry[1]), -sum(entry[1].values()), entry[0]))[:limit]
+    if not ranked:
+        return []
+    documents = backend.documents([client_id for client_id, _ in ranked])
+    results = []
+    for client_id, weights in ranked:
+        if client_id in documents:
+            results.append({**documents[client_id], 'score': round(sum(weights.values()), 3), 'matched': len(weights)})
+    return results
+
+
+def search_document(client):
+    return {field: client.get(field) for field in SEARCH_FIELDS}
+
+
+class SearchNotConfigured(Exception):
+    pass
+
+
+def is_enabled():
+    """Whether client search is on (settings.CLIENT_SEARCH['PATH'] is set)."""
+    return bool(settings.CLIENT_SEARCH['PATH'])
+
+
+def index_client(client):
+    """Adds or refreshes a client in the search index; failures are logged, never raised."""
+    if not is_enabled():
+        return
+    try:
+        get_backend().index(search_document(client))
+    except Exception as error:
+        logger.error("No se pudo indexar el cliente %s para la búsqueda: %s", client.get('client_id'), error)
+
+
+def remove_client(client_id):
+    """Removes a client from the search index; failures are logged, never raised."""
+    if not is_enabled():
+        return
+    try:
+        get_backend().remove(client_id)
+    except Exception as error:
+        logger.error("No se pudo quitar el cliente %s de la búsqueda: %s", client_id, error)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def rebuild(backend, segments=8):
+    """
+    Replaces the contents of `backend` with every client of the table, read
+    with a parallel scan of the SEARCH_FIELDS attributes.
+
+    Returns:
+    - The number of clients indexed.
+    """
+    def read_segment(segment, clients):
+        return [search_document(client) for client in clients]
+
+    documents = []
+    for segment_documents in scan_segments(
+        client_repo.table, segments, read_segment, **projection_kwargs(SEARCH_FIELDS),
+    ):
+        documents.extend(segment_documents)
+    backend.replace_all(documents)
+    return len(documents)
+
+
+def get_backend(rebuild_empty=True):
+    """
+    Returns this process' search backend, creating it on first use. A new
+    backend that is empty is rebuilt from the table first when
+    CLIENT_SEARCH['REBUILD_ON_START'] is set (and `rebuild_empty` is true).
+
+    Raises:
+    - SearchNotConfigured: CLIENT_SEARCH['PATH'] is empty.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                options = settings.CLIENT_SEARCH
+                if not options['PATH']:
+                    raise SearchNotConfigured("La búsqueda de clientes no está configurada (CLIENT_SEARCH_PATH).")
+                backend = import_string(options['BACKEND'])(options['PATH'])
+                if rebuild_empty and options['REBUILD_ON_START'] and not backend.count():
+                    logger.info("Índice de búsqueda vacío; reconstruyendo desde la tabla de clientes")
+                    rebuild(backend)
+                _backend = backend
+    return _backend
@@ -1,6 +1,9 @@
 import uuid
 from rest_framework import serializers
 
+from apiMZD.phone import to_e164
+from apiMZD.validation import CompiledSerializer
+
 class ClientSerializer(serializers.Serializer):
     client_id = serializers.CharField(max_length=40, allow_blank=True)  # Asumiendo que es un CharField
     name = serializers.CharField(max_length=200, allow_blank=True)
@@ -19,7 +22,14 @@ class ClientSerializer(serializers.Serializer):
     fecha_cumpleanos = serializers.CharField(max_length=30, required=False, allow_null=True)  # Fecha de cumpleaños del cliente
     unidades_de_interes = serializers.JSONField(required=False)
     color_coche = serializers.CharField(max_length=30, required=False, allow_blank=True)
-    
+    # "number" en E.164 (ver apiMZD.phone); se calcula al escribir, no se envía
+    number_e164 = serializers.CharField(read_only=True)
+
+    def validate(self, attrs):
+        if 'number' in attrs:
+            # None si no es un número: el repositorio quita el atributo (llave de number_e164-index)
+            attrs['number_e164'] = to_e164(attrs['number'])
+        return attrs
 
     
 class UUIDFieldToString(serializers.Field):
@@ -30,4 +40,7 @@ class UUIDFieldToString(serializers.Field):
         try:
             return str(uuid.UUID(data))
         except ValueError:
-            raise serializers.ValidationError("Invalid UUID format.")
\ No newline at end of file
+            raise serializers.ValidationError("Invalid UUID format.")
+
+# Validación compilada de ClientSerializer (mismo resultado y errores; ver apiMZD.validation)
+client_validator = CompiledSerializer(ClientSerializer)
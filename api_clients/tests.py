@@ -1,3 +1,823 @@
-from django.test import TestCase
+import io
+import json
+import os
+from unittest import mock
 
-# Create your tests here.
+import boto3
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from apiMZD.dynamodb import client_config, get_dynamodb
+from apiMZD.repositories import client_repo, event_repo, message_pointer_repo, message_repo
+from apiMZD.testing import DynamoDBTestCase, create_table
+
+from . import async_views, message_pointers, search as client_search
+from .search import SQLiteSearchBackend, edit_distance, get_backend, index_client, normalize, query_tokens, search
+from .serializers import ClientSerializer, client_validator
+
+
+class CompiledClientValidationTests(SimpleTestCase):
+    """client_validator must give exactly what ClientSerializer(data=...).is_valid() gives."""
+
+    def assertSameResult(self, data, partial=False):
+        serializer = ClientSerializer(data=data, partial=partial)
+        if serializer.is_valid():
+            expected = (dict(serializer.validated_data), None)
+        else:
+            expected = (None, serializer.errors)
+
+        validated_data, errors = client_validator.validate(data, partial=partial)
+        self.assertEqual((dict(validated_data) if validated_data is not None else None, errors), expected)
+        return expected
+
+    def test_serializer_is_compiled(self):
+        # Si no, las pruebas sólo compararían DRF consigo mismo
+        self.assertTrue(client_validator.plan)
+
+    def test_valid_payloads(self):
+        payloads = [
+            {"client_id": "c1", "name": "Ana"},
+            {
+                "client_id": "c1", "name": "Ana López", "email": "ana@example.com", "number": "9993334444",
+                "vendedor_asignado": "v1", "unidad_de_interes": "CX-30", "id_chat": "chat-1", "sucursal": "Mérida",
+                "personal_chat": "p1", "id_chat_instagram": "ig-1", "instagram_username": "ana",
+                "instagram_user_id": "123", "color_coche": "rojo", "numero_catalogo": 7,
+                "fecha_cumpleanos": "1990-01-01", "unidades_de_interes": [{"modelo": "CX-5", "año": 2024}],
+            },
+            # Campos desconocidos y de sólo lectura se ignoran
+            {"client_id": "c1", "name": "Ana", "otro": 1, "number_e164": "+520000000000"},
+        ]
+        for data in payloads:
+            with self.subTest(data=data):
+                validated_data, errors = self.assertSameResult(data)
+                self.assertIsNone(errors)
+
+    def test_conversions(self):
+        payloads = [
+            # Espacios alrededor, valores en blanco, números en campos de texto
+            {"client_id": " c1 ", "name": "  Ana  "},
+            {"client_id": "c1", "name": "Ana", "email": " ana@example.com "},
+            {"client_id": "c1", "name": "Ana", "sucursal": "   "},
+            {"client_id": 12, "name": 1.5},
+            {"client_id": "c1", "name": "Ana", "numero_catalogo": "12"},
+            {"client_id": "c1", "name": "Ana", "numero_catalogo": "12.0"},
+            {"client_id": "c1", "name": "Ana", "numero_catalogo": 12.0},
+            {"client_id": "c1", "name": "Ana", "fecha_cumpleanos": None},
+            {"client_id": "", "name": ""},
+            # number_e164 sale de number (None si no es un número)
+            {"client_id": "c1", "name": "Ana", "number": "+52 9993334444"},
+            {"client_id": "c1", "name": "Ana", "number": "abc"},
+            {"client_id": "c1", "name": "Ana", "number": ""},
+        ]
+        for data in payloads:
+            with self.subTest(data=data):
+                self.assertSameResult(data)
+
+    def test_invalid_payloads(self):
+        payloads = [
+            {},
+            {"name": "Ana"},
+            {"client_id": "c1"},
+            {"client_id": None, "name": "Ana"},
+            {"client_id": "c1", "name": True},
+            {"client_id": "c1", "name": ["Ana"]},
+            {"client_id": "c1", "name": {"first": "Ana"}},
+            {"client_id": "c" * 41, "name": "Ana"},
+            {"client_id": "c1", "name": "Ana", "email": "ana"},
+            {"client_id": "c1", "name": "Ana", "number": "+52 999 333 4444"},
+            {"client_id": "c1", "name": "Ana", "numero_catalogo": "1.5"},
+            {"client_id": "c1", "name": "Ana", "numero_catalogo": "siete"},
+            {"client_id": "c1", "name": "Ana", "numero_catalogo": "1" * 1001},
+            {"client_id": "c1", "name": "Ana", "numero_catalogo": None},
+            {"client_id": "c1", "name": "Ana\x00"},
+            {"client_id": "c1", "name": "Ana", "sucursal": None},
+            [{"client_id": "c1", "name": "Ana"}],
+            "c1",
+        ]
+        for data in payloads:
+            with self.subTest(data=data):
+                validated_data, errors = self.assertSameResult(data)
+                self.assertIsNotNone(errors)
+
+    def test_partial(self):
+        payloads = [
+            {},
+            {"number": "9993334444"},
+            {"email": "ana@example.com", "numero_catalogo": "3"},
+            {"name": ""},
+            {"email": "ana"},
+            {"client_id": None},
+        ]
+        for data in payloads:
+            with self.subTest(data=data):
+                self.assertSameResult(data, partial=True)
+
+    def test_form_data(self):
+        # Los QueryDict (formularios) siempre se validan con DRF
+        self.assertSameResult(QueryDict("client_id=c1&name=Ana&numero_catalogo=4"))
+        self.assertSameResult(QueryDict("client_id=c1"))
+
+
+class ClientSearchTests(SimpleTestCase):
+
+    def setUp(self):
+        self.backend = SQLiteSearchBackend(':memory:')
+        self.addCleanup(self.backend.close)
+        self.backend.replace_all([
+            {'client_id': 'c1', 'name': 'Juan Pérez', 'email': 'juan.perez@example.com', 'number': '5219991234567'},
+            {'client_id': 'c2', 'name': 'Juana Perea', 'email': 'jp@example.com', 'number': '9997654321'},
+            {'client_id': 'c3', 'name': 'Ana Pérez López', 'instagram_username': 'ana_lopez', 'number': '9990001111'},
+            {'client_id': 'c4', 'name': 'Juan Peres', 'email': None, 'number': ''},
+        ])
+
+    def search(self, query, **kwargs):
+        return [result['client_id'] for result in search(query, backend=self.backend, **kwargs)]
+
+    def test_normalization(self):
+        self.assertEqual(normalize('  JUAN  Pérez-Ñúñez '), 'juan perez nunez')
+        self.assertEqual(query_tokens('Juan 999 123 4567 juan'), ['juan', '9991234567'])
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('perez', 'peres', 2), 1)
+        self.assertEqual(edit_distance('perez', 'perez', 2), 0)
+        self.assertEqual(edit_distance('ana', 'anastasia', 2), 3)
+
+    def test_accents_and_case_are_ignored(self):
+        self.assertEqual(self.search('JUAN PEREZ')[0], 'c1')
+        self.assertEqual(self.search('juan pérez')[0], 'c1')
+
+    def test_exact_ranks_above_prefix_and_fuzzy(self):
+        # c1 exacto, c2 por prefijo ("juan" en "juana"), c4 aproximado ("perez" ~ "peres")
+        results = self.search('juan perez')
+        self.assertEqual(results[0], 'c1')
+        self.assertLess(results.index('c4'), results.index('c2'))
+        scores = {result['client_id']: result['score'] for result in search('perez', backend=self.backend)}
+        self.assertGreater(scores['c3'], scores['c4'])
+
+    def test_more_matched_tokens_rank_first(self):
+        results = search('ana lopez', backend=self.backend)
+        self.assertEqual(results[0]['client_id'], 'c3')
+        self.assertEqual(results[0]['matched'], 2)
+
+    def test_fuzzy_can_be_disabled(self):
+        self.assertNotIn('c4', self.search('perez', fuzzy=False))
+
+    def test_numbers(self):
+        # Completo, por sus últimos 10 dígitos y por prefijo; nunca aproximado
+        self.assertEqual(self.search('5219991234567'), ['c1'])
+        self.assertEqual(self.search('999 123 4567'), ['c1'])
+        self.assertEqual(self.search('99976'), ['c2'])
+        self.assertEqual(self.search('9991234568'), [])
+
+    def test_email_and_instagram_local_part(self):
+        self.assertEqual(self.search('juanperez'), ['c1'])
+        self.assertEqual(self.search('analopez')[0], 'c3')
+
+    def test_index_and_remove(self):
+        self.backend.index({'client_id': 'c1', 'name': 'Pedro Gómez', 'email': None, 'number': None})
+        self.assertNotIn('c1', self.search('juan'))
+        self.assertEqual(self.search('gomez'), ['c1'])
+        self.backend.remove('c1')
+        self.assertEqual(self.search('gomez'), [])
+        self.assertEqual(self.backend.count(), 3)
+
+    def test_limit(self):
+        self.assertEqual(len(self.search('9', limit=2)), 0)
+        self.assertEqual(len(self.search('99', limit=2)), 2)
+
+
+class ClientSearchSettingsTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(client_search, '_backend', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: client_search._backend and client_search._backend.close())
+        client_repo.put_item({'client_id': 'c1', 'name': 'Juan Pérez', 'number': '9991234567'})
+
+    def test_search_is_off_without_a_path(self):
+        response = self.client.get(reverse('client-search'), {'q': 'juan'})
+        self.assertEqual(response.status_code, 503)
+        index_client({'client_id': 'c2', 'name': 'Ana'})
+        self.assertIsNone(client_search._backend)
+
+    @override_settings(CLIENT_SEARCH={**settings.CLIENT_SEARCH, 'PATH': ':memory:'})
+    def test_empty_index_is_rebuilt_on_first_use(self):
+        response = self.client.get(reverse('client-search'), {'q': 'juan'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['client_id'] for result in response.json()['results']], ['c1'])
+
+    @override_settings(CLIENT_SEARCH={**settings.CLIENT_SEARCH, 'PATH': ':memory:', 'REBUILD_ON_START': False})
+    def test_rebuild_on_start_can_be_disabled(self):
+        self.assertEqual(get_backend().count(), 0)
+
+
+@override_settings(MESSAGE_POINTER_TABLE_NAME='message-pointers')
+class MessagePointerTests(DynamoDBTestCase):
+
+    def message(self, id_chat, fecha, para_numero, mensaje='hola'):
+        message = {
+            'id_chat': id_chat, 'fecha': f'2024-01-0{fecha} 10:00:00 CST-0600', 'de_numero': '5219990000000',
+            'para_numero': para_numero, 'mensaje': mensaje,
+        }
+        message_repo.put_item(message)
+        return message
+
+    def pointer_numbers(self):
+        return [item['numero'] for item in message_pointer_repo.table.scan()['Items']]
+
+    def test_one_pointer_for_every_format_of_a_number(self):
+        message_pointers.record(self.message('m1', 1, '9991234567'))
+        self.assertEqual(message_pointers.find('+52 999 123 4567', 'latest')['id_chat'], 'm1')
+
+        # Llega un mensaje con el número escrito de otra forma
+        message_pointers.record(self.message('m2', 2, '5219991234567', 'tu expediente está listo'))
+        for numero in ('9991234567', '+52 999 123 4567', '5219991234567'):
+            with self.subTest(numero=numero):
+                self.assertEqual(message_pointers.find(numero, 'latest')['id_chat'], 'm2')
+                self.assertEqual(message_pointers.find(numero, 'credit_approval')['id_chat'], 'm2')
+        self.assertEqual(self.pointer_numbers(), ['+529991234567'])
+
+    def test_forget_uses_the_normalized_number(self):
+        message = self.message('m1', 1, '9991234567')
+        message_pointers.record(message)
+        message_pointers.forget(dict(message, para_numero='+529991234567'))
+        self.assertEqual(self.pointer_numbers(), [])
+
+    def test_rebuild_groups_the_formats_of_a_number(self):
+        self.message('m1', 1, '9991234567')
+        self.message('m2', 2, '+52 999 123 4567')
+        self.message('m3', 3, 'no es un número')
+        call_command('rebuild_message_pointers', segments=2, stdout=open(os.devnull, 'w'))
+
+        self.assertCountEqual(self.pointer_numbers(), ['+529991234567', 'no es un número'])
+        self.assertEqual(message_pointer_repo.get('+529991234567')['latest']['id_chat'], 'm2')
+
+
+class LatestMessageTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.messages = []
+        # La aprobación queda debajo de 40 mensajes más recientes
+        for i in range(42):
+            self.messages.append(self.message(f'm{i}', i, 'Tu expediente fue aprobado.' if i == 1 else 'hola'))
+        self.message('otro', 50, 'Tu expediente fue aprobado.', para_numero='9995550000')
+
+    def message(self, id_chat, minute, mensaje, para_numero='9991234567'):
+        message = {
+            'id_chat': id_chat, 'fecha': f'2024-01-01 10:{minute:02d}:00 CST-0600', 'de_numero': 'bot',
+            'para_numero': para_numero, 'mensaje': mensaje,
+        }
+        message_repo.put_item(message)
+        return message
+
+    def get(self, url_name, numero='9991234567', **params):
+        return self.client.get(reverse(url_name, args=[numero]), params)
+
+    def test_latest_message_is_a_single_item_query(self):
+        with mock.patch.object(message_repo, 'query', wraps=message_repo.query) as query:
+            response = self.get('messages-to-cliente')
+        self.assertEqual(response.json(), self.messages[-1])
+        self.assertEqual([call.kwargs['Limit'] for call in query.call_args_list], [1])
+
+        self.assertEqual(self.get('messages-to-cliente', fields='mensaje').json(), {
+            'mensaje': 'hola', 'fecha': self.messages[-1]['fecha'],
+        })
+        self.assertEqual(self.get('messages-to-cliente', '9990000000').status_code, 404)
+
+    def test_credit_approval_pages_grow_until_the_first_match(self):
+        with mock.patch.object(message_repo, 'query', wraps=message_repo.query) as query:
+            response = self.get('credit-approval-message')
+        self.assertEqual(response.json(), self.messages[1])
+        self.assertEqual([call.kwargs['Limit'] for call in query.call_args_list], [10, 20, 40])
+
+    def test_no_credit_approval(self):
+        self.assertEqual(self.get('credit-approval-message', '9990000000').status_code, 404)
+        message_repo.delete('m1', self.messages[1]['fecha'])
+        self.assertEqual(self.get('credit-approval-message').status_code, 404)
+
+    @override_settings(MESSAGE_POINTER_TABLE_NAME='message-pointers')
+    def test_pointers_give_the_same_answers(self):
+        create_table(get_dynamodb(), 'MESSAGE_POINTER_TABLE_NAME')
+        call_command('rebuild_message_pointers', stdout=open(os.devnull, 'w'))
+        with mock.patch.object(message_repo, 'query', side_effect=AssertionError('sin consultas al índice')):
+            self.assertEqual(self.get('messages-to-cliente').json(), self.messages[-1])
+            self.assertEqual(self.get('credit-approval-message').json(), self.messages[1])
+
+
+class E164LookupTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Datos escritos antes de los números normalizados
+        client_repo.put_item({'client_id': 'c1', 'name': 'Ana', 'number': '999 123 4567'})
+        client_repo.put_item({'client_id': 'c2', 'name': 'Luis', 'number': 'sin número'})
+        message_repo.put_item({
+            'id_chat': 'm1', 'fecha': '2024-01-01 10:00:00 CST-0600', 'de_numero': '5219991234567', 'para_numero': 'bot',
+        })
+        message_repo.put_item({
+            'id_chat': 'm2', 'fecha': '2024-01-02 10:00:00 CST-0600', 'de_numero': 'bot', 'para_numero': '9991234567',
+        })
+
+    def backfill(self, *args):
+        stdout = io.StringIO()
+        call_command('backfill_phone_numbers', *args, segments=2, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_backfill_is_idempotent(self):
+        self.assertIn('clients: 2 leídos, 1 por actualizar.', self.backfill('--dry-run'))
+        self.assertIsNone(client_repo.get_item({'client_id': 'c1'}).get('number_e164'))
+
+        output = self.backfill()
+        self.assertIn('clients: 2 leídos, 1 actualizados', output)
+        self.assertIn('messages: 2 leídos, 2 actualizados', output)
+        self.assertEqual(client_repo.get_item({'client_id': 'c1'})['number_e164'], '+529991234567')
+        self.assertNotIn('number_e164', client_repo.get_item({'client_id': 'c2'}))
+        messages = {message['id_chat']: message for message in message_repo.table.scan()['Items']}
+        self.assertEqual(messages['m1']['de_numero_e164'], '+529991234567')
+        self.assertEqual(messages['m2']['para_numero_e164'], '+529991234567')
+        self.assertNotIn('para_numero_e164', messages['m1'])
+
+        self.assertIn('clients: 2 leídos, 0 actualizados', self.backfill())
+
+    @override_settings(PHONE={**settings.PHONE, 'E164_LOOKUPS': True})
+    def test_any_format_finds_the_client_and_the_conversation(self):
+        self.backfill()
+        for number in ('9991234567', '+52 999 123 4567', '5219991234567'):
+            with self.subTest(number=number):
+                response = self.client.get(reverse('client-query-by-number', args=[number]))
+                self.assertEqual([client['client_id'] for client in response.json()], ['c1'])
+                response = self.client.get(reverse('messages-by-phone-number', args=[number]))
+                self.assertEqual([message['id_chat'] for message in response.json()], ['m2', 'm1'])
+        self.assertEqual(self.client.get(reverse('client-query-by-number', args=['sin número'])).status_code, 404)
+
+    @override_settings(PHONE={**settings.PHONE, 'E164_LOOKUPS': True})
+    def test_api_writes_keep_the_normalized_number(self):
+        response = self.client.post(
+            reverse('create_client'), {'client_id': 'c3', 'name': 'Eva', 'number': '52 999 555 0000'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(client_repo.get_item({'client_id': 'c3'})['number_e164'], '+529995550000')
+        self.assertEqual(self.client.get(reverse('client-query-by-number', args=['9995550000'])).status_code, 200)
+
+        self.client.put(reverse('detail_client', args=['c3']), {'number': '9997770000'}, content_type='application/json')
+        self.assertEqual(client_repo.get_item({'client_id': 'c3'})['number_e164'], '+529997770000')
+        self.assertEqual(self.client.get(reverse('client-query-by-number', args=['9995550000'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('client-query-by-number', args=['+529997770000'])).status_code, 200)
+
+
+class PurgeMessagesTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            numbers = ('9991234567', '9990000000') if i % 2 else ('9990000000', '9991234567')
+            message_repo.put_item({
+                'id_chat': f'm{i}', 'fecha': f'2024-01-0{i + 1} 10:00:00 CST-0600',
+                'de_numero': numbers[0], 'para_numero': numbers[1], 'mensaje': 'hola',
+            })
+        message_repo.put_item({
+            'id_chat': 'otro', 'fecha': '2024-01-01 10:00:00 CST-0600',
+            'de_numero': '9990000000', 'para_numero': '9995550000', 'mensaje': 'hola',
+        })
+
+    def purge(self, phone_number, **params):
+        url = reverse('delete-messages-by-phone-number', args=[phone_number])
+        return self.client.delete(f'{url}?{urlencode({"purge": "true", **params})}')
+
+    def test_purge_resumes_with_the_continuation_token(self):
+        deleted, params = 0, {'max_items': 2}
+        while True:
+            response = self.purge('9991234567', **params)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            deleted += body['deleted']
+            if not body['more_messages']:
+                break
+            params['continuation_token'] = body['continuation_token']
+        self.assertEqual(deleted, 5)
+        self.assertEqual([item['id_chat'] for item in message_repo.table.scan()['Items']], ['otro'])
+
+    def test_token_is_bound_to_the_number(self):
+        token = self.purge('9991234567', max_items=2).json()['continuation_token']
+        response = self.purge('9995550000', max_items=2, continuation_token=token)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(message_repo.table.scan()['Items']), 4)
+
+    @override_settings(PHONE={**settings.PHONE, 'E164_LOOKUPS': True})
+    def test_token_follows_any_format_of_the_number_with_e164_lookups(self):
+        for message in message_repo.table.scan()['Items']:
+            message_repo.set_numbers_e164(message, message_repo.missing_e164(message))
+        token = self.purge('9991234567', max_items=2).json()['continuation_token']
+        response = self.purge('+52 999 123 4567', max_items=10, continuation_token=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['deleted'], 3)
+
+
+class ClientVersioningTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Cliente escrito antes de versionar: sin atributo version (versión 0)
+        client_repo.put_item({'client_id': 'c1', 'name': 'Ana', 'email': 'ana@example.com', 'number': '9991234567'})
+        self.url = reverse('detail_client', args=['c1'])
+
+    def put(self, data, if_match=None):
+        headers = {'HTTP_IF_MATCH': if_match} if if_match is not None else {}
+        return self.client.put(self.url, data, content_type='application/json', **headers)
+
+    def test_only_the_sent_fields_change_and_the_version_grows(self):
+        response = self.put({'name': 'Ana María'}, if_match='0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 1)
+        self.assertEqual(response['ETag'], '"1"')
+
+        response = self.put({'instagram_username': 'ana'}, if_match='W/"1"')
+        self.assertEqual(response.json()['version'], 2)
+        client = client_repo.get_item({'client_id': 'c1'})
+        self.assertEqual(
+            (client['name'], client['email'], client['instagram_username'], client['version']),
+            ('Ana María', 'ana@example.com', 'ana', 2),
+        )
+
+        # Sin If-Match no se comprueba la versión
+        self.assertEqual(self.put({'name': 'Ana'}).json()['version'], 3)
+
+    def test_stale_version_is_rejected_with_the_current_client(self):
+        self.put({'name': 'Ana María'})
+        response = self.put({'name': 'Otra'}, if_match='"0"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], '"1"')
+        self.assertEqual(response.json()['current']['name'], 'Ana María')
+        self.assertEqual(client_repo.get_item({'client_id': 'c1'})['name'], 'Ana María')
+
+        response = self.client.patch(self.url, {'id_chat': 'chat1'}, content_type='application/json', HTTP_IF_MATCH='0')
+        self.assertEqual(response.status_code, 412)
+        response = self.client.patch(self.url, {'id_chat': 'chat1'}, content_type='application/json', HTTP_IF_MATCH='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client_repo.get_item({'client_id': 'c1'})['id_chat'], 'chat1')
+
+    def test_invalid_requests(self):
+        cases = [
+            ({'name': 'Ana'}, 'uno', 400),
+            ({'name': 'Ana'}, '-1', 400),
+            ({'client_id': 'c2'}, None, 400),
+            ({}, None, 400),
+        ]
+        for data, if_match, status_code in cases:
+            with self.subTest(data=data, if_match=if_match):
+                self.assertEqual(self.put(data, if_match).status_code, status_code)
+        response = self.client.put(
+            reverse('detail_client', args=['c9']), {'name': 'Ana'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(client_repo.get_item({'client_id': 'c9'}))
+
+
+class ClientProjectionTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        client_repo.save({
+            'client_id': 'c1', 'name': 'Ana', 'email': 'ana@example.com', 'number': '9991234567',
+            'instagram_username': 'ana', 'session_id': 's1',
+        })
+
+    def test_lookups_return_only_the_requested_fields(self):
+        # name y number son palabras reservadas de DynamoDB
+        for url in (
+            reverse('detail_client', args=['c1']),
+            reverse('client-query-by-email', args=['ana@example.com']),
+            reverse('client-query-by-number', args=['9991234567']),
+            reverse('client-query-by-name', args=['Ana']),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'fields': 'name, number'})
+                self.assertEqual(response.status_code, 200)
+                body = response.json()
+                items = body if isinstance(body, list) else [body]
+                self.assertEqual(items, [{'name': 'Ana', 'number': '9991234567'}])
+
+    def test_partial_reads_do_not_fill_the_cache(self):
+        self.client.get(reverse('detail_client', args=['c1']), {'fields': 'name'})
+        self.assertEqual(self.client.get(reverse('detail_client', args=['c1'])).json()['email'], 'ana@example.com')
+
+    def test_unknown_fields(self):
+        for fields in ('password', 'name,password', ',', ''):
+            with self.subTest(fields=fields):
+                response = self.client.get(reverse('detail_client', args=['c1']), {'fields': fields})
+                self.assertEqual(response.status_code, 400)
+
+
+class ClientBatchGetTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Más de un BatchGetItem (100 llaves)
+        for i in range(250):
+            client_repo.put_item({'client_id': f'c{i}', 'name': f'Cliente {i}', 'email': f'c{i}@example.com'})
+
+    def batch_get(self, body):
+        return self.client.post(reverse('batch_get_clients'), body, content_type='application/json')
+
+    def test_clients_follow_the_order_of_the_ids(self):
+        client_ids = [f'c{i}' for i in range(249, -1, -1)] + ['c5', 'no-existe']
+        response = self.batch_get({'client_ids': client_ids})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([client and client['client_id'] for client in body['clients']], client_ids[:-1] + [None])
+        self.assertEqual(body['missing'], ['no-existe'])
+        self.assertEqual(body['unprocessed'], [])
+
+    def test_fields(self):
+        body = self.batch_get({'client_ids': ['c1', 'c2'], 'fields': ['name']}).json()
+        self.assertEqual(body['clients'], [{'client_id': 'c1', 'name': 'Cliente 1'}, {'client_id': 'c2', 'name': 'Cliente 2'}])
+
+    def test_unprocessed_ids_are_not_reported_as_missing(self):
+        with mock.patch('apiMZD.repositories.batch_get', return_value=([{'client_id': 'c1'}], [{'client_id': 'c2'}])):
+            body = self.batch_get({'client_ids': ['c1', 'c2', 'c3']}).json()
+        self.assertEqual(body, {'clients': [{'client_id': 'c1'}, None, None], 'missing': ['c3'], 'unprocessed': ['c2']})
+
+    def test_invalid_bodies(self):
+        for body in (
+            {}, {'client_ids': []}, {'client_ids': 'c1'}, {'client_ids': ['c1', '']}, {'client_ids': ['c1', 2]},
+            {'client_ids': [f'c{i}' for i in range(1001)]}, {'client_ids': ['c1'], 'fields': ['password']},
+            {'client_ids': ['c1'], 'fields': []},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.batch_get(body).status_code, 400)
+
+
+class ClientCacheTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        client_repo.save({'client_id': 'c1', 'name': 'Ana', 'email': 'ana@example.com', 'number': '9991234567'})
+
+    def lookups(self):
+        """Status code of each cached lookup."""
+        urls = {
+            'detail': reverse('detail_client', args=['c1']),
+            'email': reverse('client-query-by-email', args=['ana@example.com']),
+            'number': reverse('client-query-by-number', args=['9991234567']),
+            'name': reverse('client-query-by-name', args=['Ana']),
+        }
+        return {lookup: self.client.get(url).status_code for lookup, url in urls.items()}
+
+    def test_lookups_are_served_from_the_cache(self):
+        self.assertEqual(set(self.lookups().values()), {200})
+        # Escritura directa en la tabla, sin pasar por el repositorio
+        client_repo.table.put_item(Item={'client_id': 'c1', 'name': 'Otra', 'email': 'otra@example.com'})
+        self.assertEqual(set(self.lookups().values()), {200})
+        self.assertEqual(self.client.get(reverse('detail_client', args=['c1'])).json()['name'], 'Ana')
+
+    def test_writes_invalidate_every_lookup(self):
+        self.lookups()
+        response = self.client.put(
+            reverse('detail_client', args=['c1']), {'name': 'Ana María', 'email': 'ana.maria@example.com', 'number': '9995550000'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lookups(), {'detail': 200, 'email': 404, 'number': 404, 'name': 404})
+        self.assertEqual(self.client.get(reverse('detail_client', args=['c1'])).json()['name'], 'Ana María')
+        self.assertEqual(self.client.get(reverse('client-query-by-email', args=['ana.maria@example.com'])).status_code, 200)
+
+        self.client.delete(reverse('detail_client', args=['c1']))
+        self.assertEqual(self.client.get(reverse('detail_client', args=['c1'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('client-query-by-email', args=['ana.maria@example.com'])).status_code, 404)
+
+    def test_saving_again_invalidates_the_previous_version(self):
+        self.lookups()
+        client_repo.save({'client_id': 'c1', 'name': 'Ana', 'email': 'nuevo@example.com', 'number': '9991234567'})
+        lookups = self.lookups()
+        self.assertEqual(lookups['email'], 404)
+        self.assertEqual(self.client.get(reverse('detail_client', args=['c1'])).json()['email'], 'nuevo@example.com')
+
+
+class ConversationTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        messages = [
+            ('m0', 1, '9991234567', '9990000000'),
+            ('m1', 2, '9990000000', '9991234567'),
+            ('m2', 3, '9991234567', '9990000000'),
+            # Misma fecha que m2, recibido
+            ('m3', 3, '9990000000', '9991234567'),
+            # Enviado a sí mismo: lo devuelven los dos índices
+            ('m4', 4, '9991234567', '9991234567'),
+            ('m5', 5, '9990000000', '9995550000'),
+        ]
+        for id_chat, day, de_numero, para_numero in messages:
+            message_repo.put_item({
+                'id_chat': id_chat, 'fecha': f'2024-01-0{day} 10:00:00 CST-0600',
+                'de_numero': de_numero, 'para_numero': para_numero, 'mensaje': 'hola',
+            })
+
+    def get(self, **params):
+        return self.client.get(reverse('messages-by-phone-number', args=['9991234567']), params)
+
+    def test_both_indexes_are_merged_newest_first(self):
+        ids = [message['id_chat'] for message in self.get().json()]
+        self.assertEqual(ids[0], 'm4')
+        self.assertCountEqual(ids[1:3], ['m2', 'm3'])
+        self.assertEqual(ids[3:], ['m1', 'm0'])
+
+    def test_iter_conversation_is_lazy_and_reads_small_pages(self):
+        messages = message_repo.iter_conversation('9991234567', page_size=1)
+        self.assertEqual(next(messages)['id_chat'], 'm4')
+        messages.close()
+        self.assertEqual([m['id_chat'] for m in message_repo.iter_conversation('9991234567', page_size=1)][-1], 'm0')
+
+    def test_pages_are_not_split_between_messages_with_the_same_fecha(self):
+        pages, params = [], {'limit': 2}
+        while True:
+            body = self.get(**params).json()
+            pages.append([message['id_chat'] for message in body['messages']])
+            if not body['next_before']:
+                break
+            params['before'] = body['next_before']
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(pages[0][0], 'm4')
+        self.assertCountEqual(pages[0][1:], ['m2', 'm3'])
+        self.assertEqual(pages[1], ['m1', 'm0'])
+
+    def test_before_and_fields(self):
+        messages = self.get(before='2024-01-03 10:00:00 CST-0600', fields='mensaje').json()
+        self.assertEqual(messages, [
+            {'id_chat': 'm1', 'fecha': '2024-01-02 10:00:00 CST-0600', 'mensaje': 'hola'},
+            {'id_chat': 'm0', 'fecha': '2024-01-01 10:00:00 CST-0600', 'mensaje': 'hola'},
+        ])
+
+    def test_invalid_limit(self):
+        for limit in ('0', '1001', 'diez'):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.get(limit=limit).status_code, 400)
+
+
+class NDJSONStreamingTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Más de una página (100) de eventos del cliente
+        for i in range(150):
+            event_repo.save({'event_id': f'e{i}', 'session_id': 's1', 'client_id': 'c1', 'event_type': 'page_view'})
+        for i in range(3):
+            message_repo.put_item({
+                'id_chat': f'm{i}', 'fecha': f'2024-01-0{i + 1} 10:00:00 CST-0600',
+                'de_numero': '9991234567', 'para_numero': '9990000000', 'mensaje': 'hola',
+            })
+
+    def ndjson(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_client_events(self):
+        url = reverse('client-events', args=['c1'])
+        events = self.ndjson(self.client.get(url, {'format': 'ndjson', 'fields': 'event_id'}))
+        self.assertCountEqual(events, [{'event_id': f'e{i}'} for i in range(150)])
+        self.assertEqual(len(self.client.get(url).json()['events']), 150)
+
+    def test_conversation(self):
+        url = reverse('messages-by-phone-number', args=['9991234567'])
+        messages = self.ndjson(self.client.get(url, HTTP_ACCEPT='application/x-ndjson'))
+        self.assertEqual([message['id_chat'] for message in messages], ['m2', 'm1', 'm0'])
+        self.assertEqual(messages, self.client.get(url).json())
+
+
+class LinkSessionTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Más de un BatchWriteItem (25) de eventos en la sesión
+        for i in range(30):
+            event_repo.save({'event_id': f'e{i}', 'session_id': 's1', 'event_type': 'page_view'})
+        event_repo.save({'event_id': 'otra', 'session_id': 's2', 'event_type': 'page_view'})
+
+    def test_client_creation_links_the_session(self):
+        response = self.client.post(
+            reverse('create_client'), {'client_id': 'c1', 'name': 'Ana', 'session_id': 's1'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['linked_events'], 30)
+        events = {event['event_id']: event for event in event_repo.table.scan()['Items']}
+        for i in range(30):
+            self.assertEqual(events[f'e{i}']['client_id'], 'c1')
+            self.assertEqual(events[f'e{i}']['version'], 1)
+        self.assertNotIn('client_id', events['otra'])
+
+    def test_only_the_linked_attribute_and_the_version_change(self):
+        event_repo.get('e0')
+        event_repo.update('e0', {'event_data': {'pagina': '/'}})
+        event_repo.update('e0', {'event_source': 'website'})
+
+        self.assertEqual(event_repo.link_session('s1', 'client_id', 'c1'), 30)
+        event = event_repo.get('e0')
+        self.assertEqual(event['client_id'], 'c1')
+        self.assertEqual(event['event_data'], {'pagina': '/'})
+        self.assertEqual(event['event_source'], 'website')
+        self.assertEqual(event['version'], 3)
+
+    def test_events_deleted_or_moved_meanwhile_are_skipped(self):
+        # El índice (eventualmente consistente) aún los devuelve en la sesión
+        stale = [{'event_id': 'e0'}, {'event_id': 'otra'}, {'event_id': 'borrado'}]
+        with mock.patch.object(event_repo, 'query_all', return_value=stale):
+            self.assertEqual(event_repo.link_session('s1', 'client_id', 'c1'), 1)
+        self.assertNotIn('client_id', event_repo.get('otra'))
+        self.assertIsNone(event_repo.get('borrado'))
+
+
+class BotoAsyncClient:
+    """Stand-in for the aiobotocore client: each call runs on a low-level boto3 client (moto)."""
+
+    def __init__(self):
+        # No el de get_dynamodb(): el cliente de un recurso convierte los items por su cuenta
+        self.client = boto3.session.Session().client('dynamodb', config=client_config())
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        async def call(**kwargs):
+            return method(**kwargs)
+
+        return call
+
+
+class AsyncViewsTests(DynamoDBTestCase):
+    """The async views (ASGI) must answer what the synchronous views of the same URL answer."""
+
+    def setUp(self):
+        super().setUp()
+
+        client = BotoAsyncClient()
+
+        async def get_client():
+            return client
+
+        patcher = mock.patch('apiMZD.async_dynamodb.get_client', get_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+        client_repo.put_item({'client_id': 'c1', 'name': 'Ana', 'number': '9991234567', 'email': 'ana@example.com'})
+        for i in range(3):
+            event_repo.save({'event_id': f'e{i}', 'session_id': 's1', 'client_id': 'c1', 'event_type': 'page_view'})
+        for i in range(5):
+            numbers = ('9991234567', '9990000000') if i % 2 else ('9990000000', '9991234567')
+            message_repo.put_item({
+                # Dos mensajes con la misma fecha: la página no se corta entre ellos
+                'id_chat': f'm{i}', 'fecha': f'2024-01-0{min(i, 3) + 1} 10:00:00 CST-0600',
+                'de_numero': numbers[0], 'para_numero': numbers[1], 'mensaje': 'hola',
+            })
+
+    def assertSameResponse(self, view_class, url_name, kwargs, params=None):
+        expected = self.client.get(reverse(url_name, kwargs=kwargs), params)
+        request = self.factory.get(reverse(url_name, kwargs=kwargs), params)
+        response = async_to_sync(view_class.as_view())(request, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+        return expected.json()
+
+    def test_client_lookups(self):
+        cases = [
+            (async_views.AsyncClientDetailView, 'detail_client', {'client_id': 'c1'}, None),
+            (async_views.AsyncClientDetailView, 'detail_client', {'client_id': 'c1'}, {'fields': 'name'}),
+            (async_views.AsyncClientDetailView, 'detail_client', {'client_id': 'c9'}, None),
+            (async_views.AsyncClientQueryByNumberView, 'client-query-by-number', {'number': '9991234567'}, None),
+            (async_views.AsyncClientQueryByNumberView, 'client-query-by-number', {'number': '9995550000'}, None),
+            (async_views.AsyncClientQueryByNameView, 'client-query-by-name', {'name': 'Ana'}, None),
+            (async_views.AsyncClientQueryByEmailView, 'client-query-by-email', {'email': 'ana@example.com'}, None),
+        ]
+        for view_class, url_name, kwargs, params in cases:
+            with self.subTest(url_name=url_name, kwargs=kwargs, params=params):
+                self.assertSameResponse(view_class, url_name, kwargs, params)
+
+    def test_client_events(self):
+        body = self.assertSameResponse(async_views.AsyncClientEventsView, 'client-events', {'client_id': 'c1'})
+        self.assertEqual(len(body['events']), 3)
+
+    def test_conversation_pages(self):
+        kwargs = {'phone_number': '9991234567'}
+        self.assertEqual(
+            len(self.assertSameResponse(async_views.AsyncMessagesByPhoneNumberView, 'messages-by-phone-number', kwargs)), 5,
+        )
+        params = {'limit': 3}
+        pages = []
+        while True:
+            body = self.assertSameResponse(async_views.AsyncMessagesByPhoneNumberView, 'messages-by-phone-number', kwargs, params)
+            pages.append([message['id_chat'] for message in body['messages']])
+            if not body['next_before']:
+                break
+            params['before'] = body['next_before']
+        self.assertEqual(len(pages), 2)
+        self.assertCountEqual(sum(pages, []), [f'm{i}' for i in range(5)])
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ListClientsView,
     ClientCreateAPiView,
+    ClientBatchGetView,
     ClientDetailView,
     ClientQueryByEmailAPIView,
     ClientEventsView,
@@ -9,14 +11,28 @@ from .views import (
     ClientQueryByNumberAPIView,
     MessagesToClienteView,
     ClientQueryByNameAPIView,
+    ClientSearchView,
     CreditApprovalMessageView,
     DeleteMessagesByPhoneNumberView
 )
 
+if settings.ASYNC_VIEWS:
+    # Bajo ASGI las lecturas más frecuentes usan las vistas async (mismas rutas y nombres)
+    from .async_views import (
+        AsyncClientDetailView as ClientDetailView,
+        AsyncClientQueryByEmailView as ClientQueryByEmailAPIView,
+        AsyncClientQueryByNumberView as ClientQueryByNumberAPIView,
+        AsyncClientQueryByNameView as ClientQueryByNameAPIView,
+        AsyncClientEventsView as ClientEventsView,
+        AsyncMessagesByPhoneNumberView as MessagesByPhoneNumberView,
+    )
+
 urlpatterns = [
     # Rutas para clientes
     path('', ListClientsView.as_view(), name='list_clients'),
     path('create/', ClientCreateAPiView.as_view(), name='create_client'),
+    path('batch-get/', ClientBatchGetView.as_view(), name='batch_get_clients'),
+    path('search/', ClientSearchView.as_view(), name='client-search'),
     path('<str:client_id>/', ClientDetailView.as_view(), name='detail_client'),
     path('query/<str:email>/', ClientQueryByEmailAPIView.as_view(), name='client-query-by-email'),
     path('query/number/<str:number>/', ClientQueryByNumberAPIView.as_view(), name='client-query-by-number'),
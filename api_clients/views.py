@@ -1,57 +1,89 @@
 # Importaciones necesarias
-from .serializers import ClientSerializer
-from boto3.dynamodb.conditions import Key, Attr
+from .message_pointers import find as find_message
+from .search import SearchNotConfigured, index_client, remove_client, search
+from .serializers import ClientSerializer, client_validator
+from api_events.serializers import EventSerializer
+from apiMZD.fields import InvalidFields, parse_fields
+from apiMZD.pagination import (
+    InvalidPageToken, decode_cursor, decode_page_token, encode_cursor, encode_page_token, page_token_param,
+    parse_page_size,
+)
+from apiMZD.permissions import has_admin_token
+from apiMZD.phone import to_e164
+from apiMZD.renderers import STREAMING_RENDERER_CLASSES, ndjson_response, wants_ndjson
+from apiMZD.repositories import ItemNotFound, VersionConflict, client_repo, event_repo, message_repo
+from apiMZD.versioning import InvalidVersion, conflict_response, etag, expected_version
 from rest_framework.views import APIView
 from rest_framework import generics, status
 from rest_framework.response import Response
 from datetime import datetime
 from uuid import uuid4, UUID
 from botocore.exceptions import ClientError
+from django.conf import settings
 import uuid
-import boto3
-import pytz
-import os
 
-# Configuración inicial de DynamoDB
-dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
-client_table = dynamodb.Table(os.getenv('CLIENT_TABLE_NAME', 'clients_default'))
-event_table = dynamodb.Table(os.getenv('EVENT_TABLE_NAME', 'eventsv2_default'))
-messages_table = dynamodb.Table(os.getenv('MESSAGE_TABLE_NAME', 'chat-mensaje-dev2'))
+
+def invalid_fields_response(error):
+    return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
 
 # Vista para listar todos los clientes
 class ListClientsView(APIView):
+    """
+    View for listing clients page by page.
+    Supports:
+    - GET: Fetches a page of clients (a Scan of the table).
+
+    Query Parameters:
+    - page_size: Clients per page (default 100, max 1000).
+    - next_page_token: Signed token returned by the previous page
+      (?last_evaluated_key= is accepted as an older name).
+    - fields: Comma-separated ClientSerializer fields to return (default: all).
+    - all=true: Admin only ("Authorization: Bearer <ADMIN_API_TOKEN>"). Streams
+      every client as newline-delimited JSON, read with a parallel scan of
+      `all_segments` segments; there is no page token.
+    """
+
+    renderer_classes = STREAMING_RENDERER_CLASSES
+    default_page_size = 100
+    max_page_size = 1000
+    all_segments = 8
+    token_scope = 'clients'
+
     def get(self, request):
         """
         Handles GET requests to list all clients with pagination.
 
-        Query Parameters:
-        - last_evaluated_key: The last client ID from the previous page; used for pagination.
-
         Responses:
-        - 200 OK: Returns a page of clients along with a token for the next page.
+        - 200 OK: Returns a page of clients along with a token for the next page
+          (None on the last page), or the NDJSON stream with ?all=true.
+        - 400 Bad Request: Invalid fields, page_size or page token.
+        - 403 Forbidden: ?all=true without the admin token.
         - 500 Internal Server Error: Unexpected server error.
         """
-        # Obtain pagination token if provided
-        last_evaluated_key = request.GET.get("last_evaluated_key")
-
-        # Initial configuration for the query
-        scan_kwargs = {"Limit": 100}  # Limit to 100 records per page, adjust as needed
+        try:
+            # client_id se proyecta siempre: es la clave de paginación
+            fields = parse_fields(request, ClientSerializer, ("client_id",))
+        except InvalidFields as e:
+            return invalid_fields_response(e)
 
-        # Use pagination token if provided
-        if last_evaluated_key:
-            scan_kwargs["ExclusiveStartKey"] = {"client_id": last_evaluated_key}
+        if request.GET.get("all") == "true":
+            return self.list_all(request, fields)
 
         try:
-            # Perform a paginated scan on the clients table
-            response = client_table.scan(**scan_kwargs)
+            page_size = parse_page_size(request, self.default_page_size, self.max_page_size)
+            token = page_token_param(request)
+            exclusive_start_key = decode_page_token(token, self.token_scope) if token else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Obtain the pagination token for the next page
-            next_page_token = response.get("LastEvaluatedKey")
+        try:
+            response = client_repo.scan_page(page_size, exclusive_start_key, fields)
 
             # Prepare the response data
             data = {
                 "clients": response.get("Items", []),
-                "next_page_token": next_page_token,
+                "next_page_token": encode_page_token(response.get("LastEvaluatedKey"), self.token_scope),
             }
 
             return Response(data)
@@ -61,6 +93,17 @@ class ListClientsView(APIView):
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def list_all(self, request, fields):
+        """Streams every client with a parallel scan (admin only)."""
+        if not has_admin_token(request):
+            return Response(
+                {"error": "El listado completo requiere el token de administración."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        # Cada segmento ocupa un hilo de los STREAM_WORKERS mientras dura el stream
+        segments = max(1, min(self.all_segments, settings.DYNAMODB["STREAM_WORKERS"]))
+        return ndjson_response(client_repo.scan_parallel(segments, fields))
+
 
 # Vista para crear un nuevo cliente
 class ClientCreateAPiView(APIView):
@@ -77,34 +120,32 @@ class ClientCreateAPiView(APIView):
         - 404 Not Found: The table was not found.
         - 500 Internal Server Error: Unexpected server error.
         """
-        serializer = ClientSerializer(data=request.data)
-        if serializer.is_valid():
+        client_data, errors = client_validator.validate(request.data)
+        if errors is None:
             try:
                 # Create the client in the table
-                client_table.put_item(Item=serializer.validated_data)
+                client_repo.save(client_data)
+                index_client(client_data)
 
                 # Get the client_id of the newly created client
-                client_id = serializer.validated_data.get("client_id")
+                client_id = client_data.get("client_id")
 
                 # Get the session_id from the request
                 session_id = request.data.get("session_id")
 
-                # If the session_id is present, update the events
+                # If the session_id is present, link every event of the session
+                linked_events = 0
                 if session_id:
-                    # Query to get all events with that session_id
-                    response = event_table.query(
-                        IndexName="session_id-index",
-                        KeyConditionExpression=Key("session_id").eq(session_id),
+                    linked_events = event_repo.link_session(
+                        session_id, "client_id", client_id
                     )
-                    events = response.get("Items", [])
-
-                    # Update each event to add the client_id
-                    for event in events:
-                        event["client_id"] = client_id
-                        event_table.put_item(Item=event)
 
                 return Response(
-                    {"message": "Cliente creado exitosamente.", "client_id": client_id},
+                    {
+                        "message": "Cliente creado exitosamente.",
+                        "client_id": client_id,
+                        "linked_events": linked_events,
+                    },
                     status=status.HTTP_201_CREATED,
                 )
 
@@ -117,7 +158,7 @@ class ClientCreateAPiView(APIView):
                     {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
     def handle_client_error(self, error_code):
         """
@@ -153,6 +194,64 @@ class ClientCreateAPiView(APIView):
         return Response({"error": error_message}, status=status_code)
 
 
+class ClientBatchGetView(APIView):
+    """
+    View for retrieving many clients in a single call.
+    Supports:
+    - POST: Fetches the clients whose client_id is in the request body.
+
+    Request Body:
+    - client_ids: List of client IDs (max 1000).
+    - fields: Optional list of ClientSerializer fields to return.
+
+    Responses:
+    - 200 OK: {"clients": [...], "missing": [...], "unprocessed": [...]}. `clients`
+      follows the order of `client_ids`, with null for the ones not returned.
+    - 400 Bad Request: Invalid data was supplied.
+    """
+
+    max_ids = 1000
+
+    def post(self, request):
+        client_ids = request.data.get("client_ids")
+        fields = request.data.get("fields")
+
+        if (
+            not isinstance(client_ids, list)
+            or not client_ids
+            or len(client_ids) > self.max_ids
+            or not all(isinstance(client_id, str) and client_id for client_id in client_ids)
+        ):
+            return Response(
+                {"error": f"client_ids debe ser una lista de 1 a {self.max_ids} IDs."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if fields is not None:
+            allowed_fields = set(ClientSerializer().fields)
+            if not isinstance(fields, list) or not fields or not all(field in allowed_fields for field in fields):
+                return Response(
+                    {"error": "fields debe ser una lista de campos válidos del cliente."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        try:
+            clients, unprocessed = client_repo.get_many("client_id", client_ids, fields)
+        except ClientError as e:
+            return ClientCreateAPiView.handle_client_error(self, e.response["Error"]["Code"])
+
+        unprocessed_ids = set(unprocessed)
+        missing = [
+            client_id
+            for client_id, client in zip(client_ids, clients)
+            if client is None and client_id not in unprocessed_ids
+        ]
+        return Response(
+            {"clients": clients, "missing": missing, "unprocessed": unprocessed},
+            status=status.HTTP_200_OK,
+        )
+
+
 class ClientDetailView(APIView):
     """
     Handles the retrieval, update, and deletion of a specific client based on client_id.
@@ -162,11 +261,20 @@ class ClientDetailView(APIView):
         """
         Retrieves a specific client by client_id.
 
+        Query Parameters:
+        - fields: Comma-separated ClientSerializer fields to return (default: all).
+
         Responses:
         - 200 OK: Client was successfully retrieved.
+        - 400 Bad Request: Invalid fields.
         - 404 Not Found: Client was not found.
         """
-        client = self.get_client(client_id)
+        try:
+            fields = parse_fields(request, ClientSerializer)
+        except InvalidFields as e:
+            return invalid_fields_response(e)
+
+        client = self.get_client(client_id, fields)
         if client:
             return Response(client)
         return Response(
@@ -177,51 +285,86 @@ class ClientDetailView(APIView):
         """
         Updates a specific client by client_id with the provided data.
 
+        Only the fields present in the body are written, with a single
+        UpdateItem; the rest of the client is left untouched. Send the version
+        you read in the If-Match header to reject the update if the client was
+        modified in the meantime.
+
         Responses:
-        - 200 OK: Client was successfully updated.
+        - 200 OK: Client was successfully updated; returns its new version (also as ETag).
         - 400 Bad Request: Invalid data was supplied.
         - 404 Not Found: Client was not found.
+        - 412 Precondition Failed: The client's version is not the one in If-Match.
         """
-        client = self.get_client(client_id)
-        if not client:
+        try:
+            version = expected_version(request)
+        except InvalidVersion as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.data.get("client_id", client_id) != client_id:
             return Response(
-                {"error": "Cliente no encontrado."}, status=status.HTTP_404_NOT_FOUND
+                {"error": "client_id no se puede modificar."}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        update_data = {**client, **request.data}
-        serializer = ClientSerializer(data=update_data)
-        if serializer.is_valid():
-            client_table.put_item(Item=serializer.validated_data)
+        client_data, errors = client_validator.validate(request.data, partial=True)
+        if errors is not None:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = {name: value for name, value in client_data.items() if name != "client_id"}
+        if not changes:
             return Response(
-                {"message": "Cliente actualizado exitosamente."},
-                status=status.HTTP_200_OK,
+                {"error": "No se enviaron campos para actualizar."}, status=status.HTTP_400_BAD_REQUEST
             )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def get_client(self, client_id):
+        return self.update_client(client_id, changes, version, "Cliente actualizado exitosamente.")
+
+    def update_client(self, client_id, changes, version, message):
+        """
+        Helper method to apply `changes` and build the response.
+
+        Returns:
+        - A Response with the new version, 404 or 412.
+        """
+        try:
+            client = client_repo.update(client_id, changes, version)
+        except ItemNotFound:
+            return Response(
+                {"error": "Cliente no encontrado."}, status=status.HTTP_404_NOT_FOUND
+            )
+        except VersionConflict as e:
+            return conflict_response(e)
+
+        index_client(client)
+        return Response(
+            {"message": message, "version": client["version"]},
+            status=status.HTTP_200_OK,
+            headers={"ETag": etag(client["version"])},
+        )
+
+    def get_client(self, client_id, fields=None):
         """
         Helper method to retrieve a client by client_id.
 
         Returns:
-        - The client data if found, otherwise None.
+        - The client data if found (only `fields` when given), otherwise None.
         """
-        response = client_table.get_item(Key={"client_id": client_id})
-        return response.get("Item", None)
+        return client_repo.get(client_id, fields)
 
     def patch(self, request, client_id):
         """
         Partially updates a specific client by client_id with the provided id_chat.
+        Accepts If-Match like PUT.
 
         Responses:
         - 200 OK: Client id_chat was successfully updated.
         - 400 Bad Request: Invalid data was supplied.
         - 404 Not Found: Client was not found.
+        - 412 Precondition Failed: The client's version is not the one in If-Match.
         """
-        client = self.get_client(client_id)
-        if not client:
-            return Response(
-                {"error": "Cliente no encontrado."}, status=status.HTTP_404_NOT_FOUND
-            )
+        try:
+            version = expected_version(request)
+        except InvalidVersion as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         id_chat = request.data.get("id_chat")
         if not id_chat:
@@ -229,26 +372,61 @@ class ClientDetailView(APIView):
                 {"error": "id_chat es requerido."}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Actualiza solo el campo id_chat
-        response = client_table.update_item(
-            Key={"client_id": client_id},
-            UpdateExpression="SET id_chat = :val",
-            ExpressionAttributeValues={":val": id_chat},
-            ReturnValues="UPDATED_NEW",
-        )
-
-        return Response(
-            {"message": "id_chat actualizado exitosamente."}, status=status.HTTP_200_OK
-        )
+        # Actualiza solo el campo id_chat; la existencia se comprueba en la misma llamada
+        return self.update_client(client_id, {"id_chat": id_chat}, version, "id_chat actualizado exitosamente.")
 
     def delete(self, request, client_id):
         # Eliminar un cliente específico por su client_id
-        client_table.delete_item(Key={"client_id": client_id})
+        client_repo.delete(client_id)
+        remove_client(client_id)
         return Response(
             {"message": "Cliente eliminado exitosamente."}, status=status.HTTP_200_OK
         )
 
 
+class ClientSearchView(APIView):
+    """
+    View to search clients by partial, accent-insensitive or misspelled name,
+    email, phone number or instagram_username (see api_clients/search.py).
+    Supports:
+    - GET: Returns the best matches for ?q=, e.g. ?q=juan peres or ?q=999123.
+      ?limit= sets how many (default 20, max 100); ?fuzzy=false disables
+      misspelling tolerance.
+
+    Responses:
+    - 200 OK: {"query", "results"}; each result has client_id, name, email,
+      number, instagram_username, score and matched (query words found).
+    - 400 Bad Request: Missing q or invalid limit.
+    - 503 Service Unavailable: Search is off (CLIENT_SEARCH_PATH is not set).
+    """
+
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        query = request.GET.get("q", "").strip()
+        if not query:
+            return Response({"error": "El parámetro q es requerido."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.GET.get("limit", self.default_limit))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_limit:
+            return Response(
+                {"error": f"limit debe ser un número entre 1 y {self.max_limit}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fuzzy = request.GET.get("fuzzy", "true").lower() != "false"
+
+        try:
+            results = search(query, limit=limit, fuzzy=fuzzy)
+        except SearchNotConfigured as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({"query": query, "results": results}, status=status.HTTP_200_OK)
+
+
 class ClientQueryByEmailAPIView(APIView):
     """
     View for querying a client based on email.
@@ -256,19 +434,18 @@ class ClientQueryByEmailAPIView(APIView):
     - GET: Fetches the client details based on email.
     """
 
-    def query_client_by_email(self, email):
-        """Performs a query on the database using the email."""
-        return client_table.query(
-            IndexName="email-index",  # Assuming you have a secondary index called 'email-index'
-            KeyConditionExpression="email = :email_val",
-            ExpressionAttributeValues={":email_val": email},
-        )
-
     def get(self, request, email):
-        """Handles GET requests to fetch client details using email."""
+        """
+        Handles GET requests to fetch client details using email.
+        ?fields= (comma-separated ClientSerializer fields) limits the attributes returned.
+        """
+        try:
+            fields = parse_fields(request, ClientSerializer)
+        except InvalidFields as e:
+            return invalid_fields_response(e)
+
         try:
-            response = self.query_client_by_email(email)
-            clients = response.get("Items", [])
+            clients = client_repo.find_by_email(email, fields)
 
             if clients:
                 return Response(
@@ -292,21 +469,23 @@ class ClientQueryByNumberAPIView(APIView):
     """
     View for querying a client based on number.
     Supports:
-    - GET: Fetches the client details based on number.
+    - GET: Fetches the client details based on number. With
+      settings.PHONE['E164_LOOKUPS'] the number may be written in any format
+      ("+52 999…", "52999…", "999…"; see apiMZD.phone): one number_e164-index query.
     """
 
-    def query_client_by_number(self, number):
-        """Performs a query on the database using the number."""
-        return client_table.query(
-            IndexName="number-index",  # Usando el índice secundario global llamado 'number-index'
-            KeyConditionExpression=Key("number").eq(number),
-        )
-
     def get(self, request, number):
-        """Handles GET requests to fetch client details using number."""
+        """
+        Handles GET requests to fetch client details using number.
+        ?fields= (comma-separated ClientSerializer fields) limits the attributes returned.
+        """
         try:
-            response = self.query_client_by_number(number)
-            clients = response.get("Items", [])
+            fields = parse_fields(request, ClientSerializer)
+        except InvalidFields as e:
+            return invalid_fields_response(e)
+
+        try:
+            clients = client_repo.find_by_number(number, fields)
 
             if clients:
                 return Response(
@@ -330,31 +509,23 @@ class ClientQueryByNameAPIView(APIView):
     - GET: Fetches the client details based on name.
     """
 
-    def query_client_by_name(self, name):
-        """Performs a query on the database using the name."""
-        return client_table.query(
-            IndexName="name-index",  # Usando el índice secundario global llamado 'name-index'
-            KeyConditionExpression=Key("name").eq(name),
-        )
-
     def get(self, request, name):
-        """Handles GET requests to fetch client details using name."""
+        """
+        Handles GET requests to fetch client details using name.
+        Returns client_id, email and number unless ?fields= asks for other
+        ClientSerializer fields.
+        """
+        try:
+            fields = parse_fields(request, ClientSerializer)
+        except InvalidFields as e:
+            return invalid_fields_response(e)
+
         try:
-            response = self.query_client_by_name(name)
-            clients = response.get("Items", [])
+            # DynamoDB sólo devuelve los atributos proyectados (client_id, email y number por defecto)
+            clients = client_repo.find_by_name(name, fields)
 
             if clients:
-                filtered_clients = [
-                    {
-                        "client_id": client.get("client_id"),
-                        "email": client.get("email"),
-                        "number": client.get("number")
-                    }
-                    for client in clients
-                ]
-                return Response(
-                    filtered_clients, status=status.HTTP_200_OK
-                )  # Returns filtered clients with client_id, email, and number
+                return Response(clients, status=status.HTTP_200_OK)
             else:
                 return Response(
                     {"message": "No se encontraron clientes con ese nombre"},
@@ -371,30 +542,23 @@ class ClientEventsView(APIView):
     """
     Vista para listar todos los eventos asociados a un client_id específico.
     Se recuperan todos los eventos en batches y se devuelven en una sola respuesta.
+    Con ?format=ndjson los eventos se envían por streaming conforme llega cada página.
+    Con ?fields= sólo se devuelven esos campos de EventSerializer.
     """
 
+    renderer_classes = STREAMING_RENDERER_CLASSES
+
     def get(self, request, client_id):
-        # Lista para almacenar todos los eventos
-        all_events = []
-        
-        # Configuración inicial de la consulta usando el índice "client_id-index"
-        query_kwargs = {
-            "IndexName": "client_id-index",
-            "KeyConditionExpression": Key("client_id").eq(client_id),
-            # Puedes mantener o quitar el límite si lo deseas, ya que vamos a iterar hasta completar
-            "Limit": 100,
-        }
-        
-        # Bucle para ir acumulando los resultados de cada batch
-        while True:
-            response = event_table.query(**query_kwargs)
-            all_events.extend(response.get("Items", []))
-            
-            # Verificar si existe más datos a través de LastEvaluatedKey
-            if "LastEvaluatedKey" in response:
-                query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-            else:
-                break
+        try:
+            fields = parse_fields(request, EventSerializer)
+        except InvalidFields as e:
+            return invalid_fields_response(e)
+
+        if wants_ndjson(request):
+            return ndjson_response(event_repo.iter_by_client(client_id, fields=fields))
+
+        # Se recorren todas las páginas del índice "client_id-index" en batches de 100
+        all_events = list(event_repo.iter_by_client(client_id, fields=fields))
 
         # Devolver todos los eventos en la respuesta
         return Response({"events": all_events})
@@ -402,56 +566,56 @@ class ClientEventsView(APIView):
 
 class DeleteMessagesByPhoneNumberView(APIView):
     """
-    View for deleting up to 50 messages related to a specific phone number.
+    View for deleting messages related to a specific phone number.
     Supports:
     - DELETE: Delete up to 50 messages sent to or received from the specified phone number.
+      With ?purge=true, deletes every message of the number in parallel batches,
+      up to `max_items` per call (default 5000); pass the returned
+      `continuation_token` to resume (400 Bad Request if it belongs to
+      another number).
+    With settings.PHONE['E164_LOOKUPS'] the number may be written in any
+    format ("+52 999…", "52999…", "999…"; see apiMZD.phone).
     """
 
+    default_purge_items = 5000
+    max_purge_items = 20000
+    purge_concurrency = 4
+
     def delete(self, request, phone_number):
-        """Handles DELETE requests to remove up to 50 messages by phone number."""
+        """Handles DELETE requests to remove messages by phone number."""
+        if request.GET.get("purge") == "true":
+            return self.purge(request, phone_number)
+
         try:
             # Limitar la cantidad de mensajes a eliminar en cada llamada
             limit = 50
 
             # Query messages sent from the phone number
-            response_from = messages_table.query(
-                IndexName="de_numero-index",
-                KeyConditionExpression=Key("de_numero").eq(phone_number),
-                Limit=limit,
-                ScanIndexForward=False,
-            )
+            response_from = message_repo.query_from(phone_number, Limit=limit)
 
             # Query messages sent to the phone number
-            sended_to = messages_table.query(
-                IndexName="para_numero-index",
-                KeyConditionExpression=Key("para_numero").eq(phone_number),
-                Limit=limit,
-                ScanIndexForward=False,
-            )
+            sended_to = message_repo.query_to(phone_number, Limit=limit)
 
             # Extract messages from both responses
             messages_from = response_from.get("Items", [])
             messages_to = sended_to.get("Items", [])
 
-            # Combine messages from both queries, ensuring we only handle up to 50 in total
-            all_messages = messages_from + messages_to
-            all_messages = all_messages[:limit]
-
-            # Eliminate the messages
-            for message in all_messages:
-                messages_table.delete_item(
-                    Key={
-                        'id_chat': message['id_chat'],
-                        'fecha': message['fecha'],
-                    }
-                )
+            # Combine the keys of both queries without duplicates
+            # (a message with de_numero == para_numero is returned by both indexes)
+            keys = list(dict.fromkeys(
+                (message["id_chat"], message["fecha"]) for message in messages_from + messages_to
+            ))[:limit]
+
+            # Eliminate the messages with BatchWriteItem
+            failed = message_repo.delete_many(keys)
 
             # Check if there might be more messages to delete
-            more_messages = len(all_messages) == limit
+            more_messages = len(keys) == limit
 
             return Response(
                 {
                     "message": "Messages deleted successfully.",
+                    "deleted": len(keys) - failed,
                     "more_messages": more_messages  # Indicate if there might be more messages to delete
                 },
                 status=status.HTTP_200_OK
@@ -461,38 +625,124 @@ class DeleteMessagesByPhoneNumberView(APIView):
             return Response(
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        
+
+    def purge_scope(self, phone_number):
+        """
+        The scope of the continuation tokens of a purge (see
+        apiMZD.pagination): the number as the indexes are queried, so a token
+        only resumes the purge of the same number.
+        """
+        if settings.PHONE['E164_LOOKUPS']:
+            return f'messages-purge:e164:{to_e164(phone_number) or phone_number}'
+        return f'messages-purge:{phone_number}'
+
+    def purge(self, request, phone_number):
+        """Deletes every message of the number, resumable through a continuation token."""
+        try:
+            max_items = int(request.GET.get("max_items", self.default_purge_items))
+            if not 1 <= max_items <= self.max_purge_items:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": f"max_items debe ser un entero entre 1 y {self.max_purge_items}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        token_scope = self.purge_scope(phone_number)
+        cursor = None
+        token = request.GET.get("continuation_token")
+        if token:
+            try:
+                cursor = decode_cursor(token, token_scope)
+            except InvalidPageToken as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            deleted, failed, cursor = message_repo.purge_number(
+                phone_number, max_items, cursor, concurrency=self.purge_concurrency
+            )
+        except ClientError as e:
+            return Response(
+                {"error": e.response['Error']['Message']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        continuation_token = encode_cursor(cursor, token_scope) if cursor else None
+        return Response(
+            {
+                "message": "Messages deleted successfully.",
+                "deleted": deleted,
+                "failed": failed,
+                "continuation_token": continuation_token,
+                "more_messages": continuation_token is not None,
+            },
+            status=status.HTTP_200_OK,
+        )
+
 class MessagesByPhoneNumberView(APIView):
     """
     View for retrieving messages related to a specific phone number.
     Supports:
-    - GET: Retrieve messages sent to or received from the specified phone number.
+    - GET: Retrieve messages sent to or received from the specified phone number,
+      newest first. Both indexes are queried concurrently and merged by fecha.
+      With ?format=ndjson the whole conversation is streamed as newline-delimited JSON.
+    With settings.PHONE['E164_LOOKUPS'] the number may be written in any
+    format ("+52 999…", "52999…", "999…"; see apiMZD.phone).
+
+    Query Parameters:
+    - limit: Page size (max 1000). When present the response is
+      {"messages": [...], "next_before": ...}; send next_before as `before`
+      to get the previous (older) page.
+    - before: Only return messages older than this fecha.
+    - fields: Comma-separated message attributes to return (id_chat and fecha
+      are always included).
     """
 
+    renderer_classes = STREAMING_RENDERER_CLASSES
+    max_limit = 1000
+
     def get(self, request, phone_number):
         """Handles GET requests to retrieve messages by phone number."""
+        before = request.GET.get("before")
+        limit = request.GET.get("limit")
+        if limit is not None:
+            try:
+                limit = int(limit)
+                if not 1 <= limit <= self.max_limit:
+                    raise ValueError
+            except ValueError:
+                return Response(
+                    {"error": f"limit debe ser un entero entre 1 y {self.max_limit}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
         try:
-            # Perform two separate queries on the chat messages table
-            response_from = messages_table.query(
-                IndexName="de_numero-index",  # Utilizando el índice global secundario 'de_numero-index'
-                KeyConditionExpression=Key("de_numero").eq(phone_number),
-                ScanIndexForward=False,  # Orden inverso para obtener los mensajes más recientes primero
-            )
+            fields = parse_fields(request, message_repo.FIELDS, message_repo.CONVERSATION_KEY_FIELDS)
+        except InvalidFields as e:
+            return invalid_fields_response(e)
 
-            sended_to = messages_table.query(
-                IndexName="para_numero-index",
-                KeyConditionExpression=Key("para_numero").eq(phone_number),
-                ScanIndexForward=False,
-            )
+        if wants_ndjson(request):
+            return ndjson_response(message_repo.iter_conversation(phone_number, before, fields=fields))
 
-            # Extract messages from both responses
-            messages_from = response_from.get("Items", [])
-            messages_to = sended_to.get("Items", [])
-
-            # Combine messages from both queries
-            all_messages = messages_from + messages_to
+        try:
+            if limit is None:
+                all_messages = list(message_repo.iter_conversation(phone_number, before, fields=fields))
+                return Response(all_messages, status=status.HTTP_200_OK)
+
+            # Se pide un mensaje de más para saber si hay una página siguiente
+            messages = message_repo.iter_conversation(phone_number, before, page_size=limit + 1, fields=fields)
+            page, next_before = [], None
+            for message in messages:
+                # No se corta la página entre mensajes con la misma fecha,
+                # así el cursor `before` no se salta ninguno
+                if len(page) >= limit and message["fecha"] != page[-1]["fecha"]:
+                    next_before = page[-1]["fecha"]
+                    break
+                page.append(message)
 
-            return Response(all_messages, status=status.HTTP_200_OK)
+            return Response(
+                {"messages": page, "next_before": next_before},
+                status=status.HTTP_200_OK,
+            )
 
         except Exception as e:
             return Response(
@@ -503,21 +753,19 @@ class MessagesByPhoneNumberView(APIView):
 class MessagesToClienteView(APIView):
     """
     View to get the most recent message sent to a specific cliente (numero_cliente).
+    ?fields= limits the message attributes returned (fecha is always included).
+    Reads the message pointer (one GetItem) when MESSAGE_POINTER_TABLE_NAME is
+    set, otherwise only the newest item of para_numero-index.
     """
     def get(self, request, numero_cliente):
         try:
-            response = messages_table.query(
-                IndexName='para_numero-index',
-                KeyConditionExpression=Key('para_numero').eq(numero_cliente),
-                ScanIndexForward=False  # Orden inverso para obtener los mensajes más recientes primero
-            )
+            fields = parse_fields(request, message_repo.FIELDS, ("fecha",))
+        except InvalidFields as e:
+            return invalid_fields_response(e)
 
-            if response['Items']:
-                mensajes = response['Items']
-                # Ordenar los mensajes por fecha del más reciente al más antiguo
-                mensajes.sort(key=lambda x: x['fecha'], reverse=True)
-                # Devolver solo el mensaje más reciente
-                ultimo_mensaje = mensajes[0]
+        try:
+            ultimo_mensaje = find_message(numero_cliente, 'latest', fields)
+            if ultimo_mensaje is not None:
                 return Response(ultimo_mensaje, status=status.HTTP_200_OK)
             else:
                 return Response({"message": "No se encontró ningún mensaje"}, status=status.HTTP_404_NOT_FOUND)
@@ -531,22 +779,19 @@ class MessagesToClienteView(APIView):
 class CreditApprovalMessageView(APIView):
     """
     View to get the specific message that indicates credit approval for a cliente.
+    ?fields= limits the message attributes returned (fecha is always included).
+    Reads the message pointer when MESSAGE_POINTER_TABLE_NAME is set; otherwise
+    pages through para_numero-index newest first and stops at the first match.
     """
     def get(self, request, numero_cliente):
         try:
-            response = messages_table.query(
-                IndexName='para_numero-index',
-                KeyConditionExpression=Key('para_numero').eq(numero_cliente),
-                FilterExpression=Attr('mensaje').contains("expediente"),
-                ScanIndexForward=False  # Orden inverso para obtener los mensajes más recientes primero
-            )
+            fields = parse_fields(request, message_repo.FIELDS, ("fecha",))
+        except InvalidFields as e:
+            return invalid_fields_response(e)
 
-            if response['Items']:
-                mensajes = response['Items']
-                # Ordenar los mensajes por fecha del más reciente al más antiguo
-                mensajes.sort(key=lambda x: x['fecha'], reverse=True)
-                # Devolver solo el mensaje más reciente que cumple con el filtro
-                mensaje_autorizacion = mensajes[0]
+        try:
+            mensaje_autorizacion = find_message(numero_cliente, 'credit_approval', fields)
+            if mensaje_autorizacion is not None:
                 return Response(mensaje_autorizacion, status=status.HTTP_200_OK)
             else:
                 return Response({"message": "No se encontró ningún mensaje de autorización de crédito"}, status=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,65 @@
+"""
+Reconstruye los agregados diarios de eventos a partir de la tabla de eventos.
+
+    python manage.py rebuild_event_stats
+    python manage.py rebuild_event_stats --from 2026-10-01 --to 2026-10-31 --segments 16
+
+Lee la tabla con un scan paralelo (sólo event_type, event_source y timestamp),
+cuenta en memoria y sobrescribe los días del rango. Los incrementos que lleguen
+mientras corre pueden perderse; conviene ejecutarlo con poco tráfico.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from boto3.dynamodb.conditions import Attr
+from django.core.management.base import BaseCommand, CommandError
+
+from apiMZD.dynamodb import projection_kwargs, scan_segments
+from apiMZD.repositories import event_repo, event_stats_repo
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily event aggregates with a parallel scan of the events table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='date_to', help="Last day to rebuild (YYYY-MM-DD).")
+        parser.add_argument('--segments', type=int, default=8, help="Parallel scan segments (default 8).")
+
+    def handle(self, *args, date_from=None, date_to=None, segments=8, **options):
+        try:
+            for value in (date_from, date_to):
+                if value:
+                    datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato YYYY-MM-DD.")
+        if segments < 1:
+            raise CommandError("--segments debe ser mayor que 0.")
+
+        date_from = date_from or '0000-01-01'
+        date_to = date_to or '9999-12-31'
+        scan_kwargs = {
+            **projection_kwargs(['event_type', 'event_source', 'timestamp']),
+            'FilterExpression': Attr('timestamp').between(date_from, date_to + '\uffff'),
+        }
+
+        def count_segment(segment, events):
+            by_day = defaultdict(Counter)
+            for event in events:
+                by_day[event['timestamp'][:10]].update(event_stats_repo.counters(event))
+            return by_day
+
+        counters_by_day = defaultdict(Counter)
+        for by_day in scan_segments(event_repo.table, segments, count_segment, **scan_kwargs):
+            for day, counters in by_day.items():
+                counters_by_day[day].update(counters)
+
+        unprocessed = event_stats_repo.replace(
+            {day: dict(counters) for day, counters in counters_by_day.items()}, date_from, date_to,
+        )
+        if unprocessed:
+            raise CommandError(f"{unprocessed} días no se pudieron escribir; vuelve a ejecutar el comando.")
+
+        total = sum(counters['total'] for counters in counters_by_day.values())
+        self.stdout.write(self.style.SUCCESS(f"Agregados reconstruidos: {len(counters_by_day)} días, {total} eventos."))
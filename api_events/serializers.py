@@ -1,6 +1,8 @@
 import uuid
 from rest_framework import serializers
 
+from apiMZD.validation import CompiledSerializer
+
 class UUIDFieldToString(serializers.Field):
     def to_representation(self, value):
         return str(value)
@@ -19,3 +21,7 @@ class EventSerializer(serializers.Serializer):
     event_type = serializers.CharField(max_length=50) 
     event_data = serializers.JSONField()
     timestamp = serializers.DateTimeField(required=False)
+
+
+# Validación compilada de EventSerializer (mismo resultado y errores; ver apiMZD.validation)
+event_validator = CompiledSerializer(EventSerializer)
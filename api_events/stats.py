@@ -0,0 +1,76 @@
+"""
+Agregados diarios de eventos (tabla EVENT_STATS_TABLE_NAME).
+
+Con settings.EVENT_STATS['ENABLED'] cada evento creado (uno por uno, en
+lote o desde el write-behind) suma 1 a los contadores de su día; los
+dashboards leen estos agregados con una sola consulta en lugar de recorrer
+la tabla de eventos. Cuesta una UpdateItem por día de cada escritura.
+
+Si una actualización falla, se registra en el log y en el contador
+apimzd_event_stats_failures_total de /metrics/, y el conteo queda desfasado.
+`manage.py rebuild_event_stats` es la forma de recuperarlo: recalcula los
+días desde la tabla de eventos (también después de tener ENABLED apagado).
+"""
+
+import logging
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+
+from apiMZD.dynamodb import get_executor
+from apiMZD.metrics import registry
+from apiMZD.repositories import event_stats_repo
+
+logger = logging.getLogger(__name__)
+
+
+def _count_failure(count, future):
+    error = future.exception()
+    if error is not None:
+        registry.inc('apimzd_event_stats_failures_total', (), count)
+        logger.error(
+            "No se pudieron actualizar los agregados de %d eventos (ver `manage.py rebuild_event_stats`): %s",
+            count, error,
+        )
+
+
+def record_stats(events):
+    """Adds `events` (already written) to the daily aggregates in the background, if EVENT_STATS is enabled."""
+    if not settings.EVENT_STATS['ENABLED']:
+        return
+    events = list(events)
+    if events:
+        future = get_executor().submit(event_stats_repo.record, events)
+        future.add_done_callback(partial(_count_failure, len(events)))
+
+
+def summarize(items, days):
+    """
+    Turns aggregate items into the stats response: one entry per day of
+    `days` (zero-filled) plus the totals of the whole range.
+    """
+    by_day = {item['day']: item for item in items}
+    totals = {'total': 0, 'by_type': Counter(), 'by_source': Counter()}
+    entries = []
+
+    for day in days:
+        entry = {'day': day, 'total': 0, 'by_type': {}, 'by_source': {}}
+        for name, value in by_day.get(day, {}).items():
+            if name == 'total':
+                entry['total'] = int(value)
+            elif name.startswith('type#'):
+                entry['by_type'][name[len('type#'):]] = int(value)
+            elif name.startswith('source#'):
+                entry['by_source'][name[len('source#'):]] = int(value)
+        totals['total'] += entry['total']
+        totals['by_type'].update(entry['by_type'])
+        totals['by_source'].update(entry['by_source'])
+        entries.append(entry)
+
+    return {
+        'total': totals['total'],
+        'by_type': dict(totals['by_type']),
+        'by_source': dict(totals['by_source']),
+        'days': entries,
+    }
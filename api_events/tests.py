@@ -1,3 +1,449 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import uuid
+from concurrent.futures import Future
+from unittest import mock
 
-# Create your tests here.
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from apiMZD.metrics import registry
+from apiMZD.repositories import event_repo, event_stats_repo
+from apiMZD.testing import DynamoDBTestCase
+
+from .write_behind import EventWriteBehind, MemoryQueue, SQLiteQueue
+
+
+def throttling_error():
+    return ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'x'}}, 'BatchWriteItem')
+
+
+class QueueTestsMixin:
+    """Behaviour shared by the write-behind queue backends."""
+
+    queue_class = None
+    spill_file = None
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spill_path = os.path.join(directory.name, self.spill_file)
+
+    def make_queue(self, max_size=10):
+        queue = self.queue_class(max_size, self.spill_path)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_fifo_with_ack_and_requeue(self):
+        queue = self.make_queue()
+        for i in range(5):
+            self.assertTrue(queue.put({'i': i}))
+        batch = queue.take(3)
+        self.assertEqual(batch, [{'i': 0}, {'i': 1}, {'i': 2}])
+        queue.ack(batch[:1])
+        queue.requeue(batch[1:])
+        self.assertEqual(len(queue), 4)
+        self.assertEqual(queue.take(10), [{'i': 1}, {'i': 2}, {'i': 3}, {'i': 4}])
+
+    def test_full_queue_counts_items_in_flight(self):
+        queue = self.make_queue(max_size=2)
+        self.assertTrue(queue.put({'i': 0}))
+        queue.take(1)
+        self.assertTrue(queue.put({'i': 1}))
+        self.assertFalse(queue.put({'i': 2}))
+
+    def test_pending_items_survive_a_restart(self):
+        queue = self.make_queue()
+        for i in range(4):
+            queue.put({'i': i})
+        queue.ack(queue.take(2))
+        queue.take(1)
+        queue.close()
+
+        reopened = self.make_queue()
+        self.assertEqual(reopened.take(10), [{'i': 2}, {'i': 3}])
+
+    def test_each_queue_owns_its_spill_file(self):
+        first = self.make_queue()
+        second = self.make_queue()
+        first.put({'owner': 'first'})
+        second.put({'owner': 'second'})
+        first.close()
+        second.close()
+
+        # Al reiniciar cada worker retoma un archivo, sin reproducir los del otro
+        replayed = [self.make_queue().take(10), self.make_queue().take(10)]
+        self.assertCountEqual(replayed, [[{'owner': 'first'}], [{'owner': 'second'}]])
+
+
+class MemoryQueueTests(QueueTestsMixin, SimpleTestCase):
+    queue_class = MemoryQueue
+    spill_file = 'event-queue.jsonl'
+
+    def test_compaction_keeps_pending_items(self):
+        queue = MemoryQueue(10, self.spill_path, compact_every=2)
+        self.addCleanup(queue.close)
+        for i in range(4):
+            queue.put({'i': i})
+        queue.take(1)
+        queue.ack(queue.take(2))
+        with open(queue.spill_path, encoding='utf-8') as journal:
+            self.assertEqual(len(journal.readlines()), 2)
+
+    def test_torn_line_is_ignored(self):
+        with open(self.spill_path, 'w', encoding='utf-8') as journal:
+            journal.write('{"i":0}\n{"i":')
+        self.assertEqual(self.make_queue().take(10), [{'i': 0}])
+
+
+class SQLiteQueueTests(QueueTestsMixin, SimpleTestCase):
+    queue_class = SQLiteQueue
+    spill_file = 'event-queue.sqlite3'
+
+
+class EventWriteBehindTests(SimpleTestCase):
+
+    def setUp(self):
+        record_stats = mock.patch('api_events.write_behind.record_stats')
+        self.record_stats = record_stats.start()
+        self.addCleanup(record_stats.stop)
+        self.save_many = self.patch_repo('save_many')
+        self.save = self.patch_repo('save')
+
+        # Sin hilo en segundo plano que compita con las llamadas a flush()
+        self.writer = EventWriteBehind(MemoryQueue(5), max_batch=10, flush_interval=3600)
+        self.addCleanup(self.writer.close, timeout=1)
+
+    def patch_repo(self, name):
+        patcher = mock.patch(f'api_events.write_behind.event_repo.{name}')
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def events(self, count):
+        return [{'event_id': f'e{i}'} for i in range(count)]
+
+    def test_backpressure(self):
+        for event in self.events(5):
+            self.assertTrue(self.writer.submit(event))
+        self.assertFalse(self.writer.submit({'event_id': 'e5'}))
+        self.assertEqual(self.writer.stats['rejected'], 1)
+
+    def test_unprocessed_events_are_retried_and_counted_once(self):
+        events = self.events(3)
+        for event in events:
+            self.writer.submit(event)
+        self.save_many.side_effect = [{'e1'}, set()]
+
+        self.assertFalse(self.writer.flush())
+        self.assertTrue(self.writer.flush())
+
+        self.assertEqual(self.save_many.call_args_list, [mock.call(events), mock.call([events[1]])])
+        recorded = [event for call in self.record_stats.call_args_list for event in call.args[0]]
+        self.assertCountEqual(recorded, events)
+        self.assertEqual(self.writer.stats['written'], 3)
+        self.assertEqual(self.writer.stats['retried'], 1)
+        self.assertEqual(len(self.writer.queue), 0)
+
+    def test_throttled_batch_stays_queued(self):
+        for event in self.events(2):
+            self.writer.submit(event)
+        self.save_many.side_effect = throttling_error()
+
+        self.assertFalse(self.writer.flush())
+        self.assertEqual(len(self.writer.queue), 2)
+        self.assertGreater(self.writer.retry_after, 1)
+        self.assertFalse([event for call in self.record_stats.call_args_list for event in call.args[0]])
+
+    def test_invalid_event_does_not_block_the_batch(self):
+        events = self.events(3)
+        for event in events:
+            self.writer.submit(event)
+        self.save_many.side_effect = ClientError({'Error': {'Code': 'ValidationException', 'Message': 'x'}}, 'BatchWriteItem')
+        self.save.side_effect = [None, ClientError({'Error': {'Code': 'ValidationException', 'Message': 'x'}}, 'PutItem'), None]
+
+        self.assertTrue(self.writer.flush())
+        self.assertEqual(self.writer.stats['written'], 2)
+        self.assertEqual(self.writer.stats['dropped'], 1)
+        self.assertEqual(len(self.writer.queue), 0)
+
+
+class EventListTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            event_repo.save({
+                'event_id': f'e{i}', 'session_id': 's1', 'client_id': 'c1' if i < 3 else 'c2',
+                'event_type': 'page_view', 'timestamp': f'2024-01-0{i + 1} 10:00:00 CST-0600',
+            })
+
+    def list(self, **params):
+        response = self.client.get(reverse('list_events'), params)
+        return response.status_code, response.json()
+
+    def test_pages_follow_the_token(self):
+        seen = []
+        params = {'client_id': 'c1', 'page_size': 2}
+        while True:
+            status_code, body = self.list(**params)
+            self.assertEqual(status_code, 200)
+            seen += [event['event_id'] for event in body['events']]
+            if not body['next_page_token']:
+                break
+            params['next_page_token'] = body['next_page_token']
+        self.assertCountEqual(seen, ['e0', 'e1', 'e2'])
+
+    def test_token_only_continues_its_own_listing(self):
+        _, body = self.list(client_id='c1', page_size=1)
+        token = body['next_page_token']
+        for params in (
+            {'client_id': 'c2'},
+            {'session_id': 's1'},
+            {},
+            {'client_id': 'c1', 'event_type': 'page_view'},
+            {'client_id': 'c1', 'from': '2024-01-01'},
+        ):
+            with self.subTest(params=params):
+                status_code, _ = self.list(next_page_token=token, page_size=1, **params)
+                self.assertEqual(status_code, 400)
+        status_code, _ = self.list(next_page_token=token, page_size=5, client_id='c1', fields='event_id')
+        self.assertEqual(status_code, 200)
+
+    def ndjson(self, response):
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_ndjson_streams_every_page(self):
+        response = self.client.get(reverse('list_events'), {'client_id': 'c1', 'page_size': 1, 'format': 'ndjson'})
+        self.assertTrue(response.streaming)
+        self.assertCountEqual([event['event_id'] for event in self.ndjson(response)], ['e0', 'e1', 'e2'])
+
+        response = self.client.get(
+            reverse('list_events'), {'page_size': 2, 'fields': 'event_id'}, HTTP_ACCEPT='application/x-ndjson',
+        )
+        self.assertCountEqual(self.ndjson(response), [{'event_id': f'e{i}'} for i in range(4)])
+
+    def test_ndjson_errors_are_a_single_line(self):
+        response = self.client.get(reverse('list_events'), {'page_size': 0, 'format': 'ndjson'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response.content.count(b'\n'), 1)
+        self.assertIn('error', json.loads(response.content))
+
+    def test_timeline_token_only_continues_its_own_timeline(self):
+        params = {'event_type': 'page_view', 'from': '2024-01-01', 'to': '2024-01-04', 'page_size': 1}
+        response = self.client.get(reverse('events_timeline'), params)
+        self.assertEqual(response.json()['total'], 4)
+        token = response.json()['next_page_token']
+
+        response = self.client.get(reverse('events_timeline'), {**params, 'next_page_token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['counts'])
+        for changes in ({'to': '2024-01-03'}, {'sucursal': 'Mérida'}, {'event_type': 'click'}):
+            with self.subTest(changes=changes):
+                response = self.client.get(reverse('events_timeline'), {**params, **changes, 'next_page_token': token})
+                self.assertEqual(response.status_code, 400)
+
+        # Un token del listado general no sirve para el timeline (ni al revés)
+        _, body = self.list(event_type='page_view', page_size=1)
+        response = self.client.get(reverse('events_timeline'), {**params, 'next_page_token': body['next_page_token']})
+        self.assertEqual(response.status_code, 400)
+        status_code, _ = self.list(event_type='page_view', next_page_token=token)
+        self.assertEqual(status_code, 400)
+
+
+class EventBatchCreateTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('api_events.views.record_stats')
+        self.record_stats = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def event(self, **fields):
+        return {'event_type': 'page_view', 'event_source': 'website', 'event_data': {}, **fields}
+
+    def post(self, events):
+        return self.client.post(reverse('batch_create_events'), events, content_type='application/json')
+
+    def test_every_event_is_created(self):
+        # Más de un BatchWriteItem (25 solicitudes)
+        response = self.post([self.event() for _ in range(60)])
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual([result['index'] for result in results], list(range(60)))
+        self.assertEqual({result['status'] for result in results}, {'created'})
+
+        events = event_repo.table.scan()['Items']
+        self.assertCountEqual([event['event_id'] for event in events], [result['event_id'] for result in results])
+        self.assertEqual(len({event['timestamp'] for event in events}), 1)
+        self.assertEqual(len(list(self.record_stats.call_args.args[0])), 60)
+
+    def test_invalid_events_do_not_block_the_rest(self):
+        event_id = str(uuid.uuid4())
+        response = self.post([
+            self.event(event_id=event_id), self.event(event_type=None), 'evento', self.event(event_id=event_id),
+            self.event(),
+        ])
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'invalid', 'invalid', 'invalid', 'created'])
+        self.assertIn('event_type', results[1]['errors'])
+        self.assertIn('event_id', results[3]['errors'])
+        self.assertEqual(event_repo.table.scan(Select='COUNT')['Count'], 2)
+
+    def test_unprocessed_events_are_reported_as_failed(self):
+        events = [self.event(event_id=str(uuid.uuid4())) for _ in range(3)]
+        with mock.patch.object(event_repo, 'save_many', return_value={events[1]['event_id']}):
+            response = self.post(events)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['created', 'failed', 'created'])
+        recorded = [event['event_id'] for event in self.record_stats.call_args.args[0]]
+        self.assertEqual(recorded, [events[0]['event_id'], events[2]['event_id']])
+
+    def test_invalid_bodies(self):
+        for body in ([], {'event_type': 'page_view'}, [self.event() for _ in range(501)]):
+            with self.subTest(size=len(body)):
+                self.assertEqual(self.post(body).status_code, 400)
+
+
+class EventCacheTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        event_repo.save({'event_id': 'e1', 'session_id': 's1', 'event_type': 'page_view'})
+        self.url = reverse('event-by-id-detail', args=['e1'])
+
+    def test_event_lookup_is_cached_and_invalidated_on_writes(self):
+        self.assertEqual(self.client.get(self.url).json()['event_type'], 'page_view')
+        # Escritura directa en la tabla: la caché sigue sirviendo la versión leída
+        event_repo.table.update_item(
+            Key={'event_id': 'e1'}, UpdateExpression='SET event_type = :t', ExpressionAttributeValues={':t': 'otro'},
+        )
+        self.assertEqual(self.client.get(self.url).json()['event_type'], 'page_view')
+
+        response = self.client.put(self.url, {'event_type': 'click'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).json()['event_type'], 'click')
+
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class EventVersioningTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.event_id = str(uuid.uuid4())
+        event_repo.save({
+            'event_id': self.event_id, 'session_id': 's1', 'event_type': 'page_view', 'event_data': {'pagina': '/'},
+        })
+        self.url = reverse('event-by-id-detail', args=[self.event_id])
+
+    def put(self, data, if_match=None):
+        headers = {'HTTP_IF_MATCH': if_match} if if_match is not None else {}
+        return self.client.put(self.url, data, content_type='application/json', **headers)
+
+    def test_versioned_partial_update(self):
+        response = self.put({'event_type': 'click'}, if_match='0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"1"')
+        event = event_repo.get_item({'event_id': self.event_id})
+        self.assertEqual((event['event_type'], event['event_data'], event['version']), ('click', {'pagina': '/'}, 1))
+
+        response = self.put({'event_source': 'website'}, if_match='0')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json()['current']['event_type'], 'click')
+
+    def test_invalid_requests(self):
+        cases = [
+            ({'event_type': 'click'}, 'x'),
+            ({'event_id': str(uuid.uuid4())}, None),
+            ({'event_type': 'x' * 51}, None),
+            ({}, None),
+        ]
+        for data, if_match in cases:
+            with self.subTest(data=data, if_match=if_match):
+                self.assertEqual(self.put(data, if_match).status_code, 400)
+        response = self.client.put(
+            reverse('event-by-id-detail', args=[str(uuid.uuid4())]), {'event_type': 'click'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class EventProjectionTests(DynamoDBTestCase):
+
+    def test_event_fields(self):
+        event_repo.save({
+            'event_id': 'e1', 'session_id': 's1', 'event_type': 'page_view', 'event_data': {'pagina': '/'},
+            'timestamp': '2024-01-01 10:00:00 CST-0600',
+        })
+        url = reverse('event-by-id-detail', args=['e1'])
+        # timestamp es palabra reservada de DynamoDB
+        response = self.client.get(url, {'fields': 'event_type,timestamp'})
+        self.assertEqual(response.json(), {'event_type': 'page_view', 'timestamp': '2024-01-01 10:00:00 CST-0600'})
+        self.assertEqual(self.client.get(url, {'fields': 'version_interna'}).status_code, 400)
+        self.assertEqual(self.client.get(url).json()['event_data'], {'pagina': '/'})
+
+
+class InlineExecutor:
+    """Runs each task when it is submitted, so the tests see the aggregates right away."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+@override_settings(EVENT_STATS={**settings.EVENT_STATS, 'ENABLED': True})
+class EventStatsTests(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('api_events.stats.get_executor', return_value=InlineExecutor())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(registry.clear)
+        registry.clear()
+
+    def create_events(self):
+        event = {'event_type': 'page_view', 'event_source': 'website', 'event_data': {}}
+        self.client.post(reverse('create_event'), event, content_type='application/json')
+        self.client.post(
+            reverse('batch_create_events'), [event, dict(event, event_type='click')], content_type='application/json',
+        )
+
+    def stats(self):
+        response = self.client.get(reverse('events_stats'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_writes_update_the_daily_aggregates(self):
+        self.create_events()
+        stats = self.stats()
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['by_type'], {'page_view': 2, 'click': 1})
+        self.assertEqual(stats['by_source'], {'website': 3})
+
+    @override_settings(EVENT_STATS={**settings.EVENT_STATS, 'ENABLED': False})
+    def test_disabled_stats_are_recovered_with_the_rebuild(self):
+        self.create_events()
+        self.assertEqual(self.stats()['total'], 0)
+        self.assertEqual(event_stats_repo.table.scan()['Items'], [])
+
+        call_command('rebuild_event_stats', segments=2, stdout=io.StringIO())
+        self.assertEqual(self.stats()['total'], 3)
+
+    def test_failures_are_counted(self):
+        with mock.patch.object(event_stats_repo, 'record', side_effect=throttling_error()):
+            with self.assertLogs('api_events.stats', 'ERROR'):
+                self.create_events()
+        self.assertIn('apimzd_event_stats_failures_total 3', registry.render())
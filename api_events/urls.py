@@ -2,8 +2,11 @@ from django.urls import path
 from .views import (
     EventListApiView,
     EventCreateAPIView,
+    EventBatchCreateAPIView,
     SessionEventsApiView,
     TodaysVisitsApiView,
+    EventTimelineApiView,
+    EventStatsApiView,
     EventByIdDetailView
     
 )
@@ -13,9 +16,12 @@ urlpatterns = [
     # Rutas para eventos
     path('', EventListApiView.as_view(), name='list_events'),
     path('create/', EventCreateAPIView.as_view(), name='create_event'),
+    path('batch/', EventBatchCreateAPIView.as_view(), name='batch_create_events'),
     path('event/<str:event_id>/', EventByIdDetailView.as_view(), name='event-by-id-detail'),
     path('session/<str:session_id>/events/', SessionEventsApiView.as_view(), name='session-events'),
     path('today-visits/', TodaysVisitsApiView.as_view(), name='today_visits_events'),
+    path('timeline/', EventTimelineApiView.as_view(), name='events_timeline'),
+    path('stats/', EventStatsApiView.as_view(), name='events_stats'),
      # Rutas para clientes - eventos 
     
 ]
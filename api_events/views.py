@@ -1,16 +1,54 @@
 # Importaciones necesarias
-from .serializers import  EventSerializer
-from boto3.dynamodb.conditions import Key
+from .serializers import  EventSerializer, event_validator
+from .stats import record_stats, summarize
+from .write_behind import get_writer
+from apiMZD.fields import InvalidFields, parse_fields
+from apiMZD.pagination import InvalidPageToken, decode_page_token, encode_page_token
+from apiMZD.renderers import STREAMING_RENDERER_CLASSES, ndjson_response, wants_ndjson
+from apiMZD.repositories import ItemNotFound, VersionConflict, event_repo, event_stats_repo
+from apiMZD.versioning import InvalidVersion, conflict_response, etag, expected_version
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework import generics, status
 from rest_framework.response import Response
-from datetime import datetime
+from rest_framework.settings import api_settings
+from datetime import datetime, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
 from uuid import uuid4, UUID
 from botocore.exceptions import ClientError
 import uuid
-import boto3
-import pytz
-import os
+
+MEXICO_TZ = ZoneInfo('America/Mexico_City')
+
+
+def event_timestamp(moment=None):
+    """`moment` (default: now) in Mexico City, in the format stored in the events table."""
+    return (moment or datetime.now()).astimezone(MEXICO_TZ).strftime('%Y-%m-%d %H:%M:%S %Z%z')
+
+
+def days_between(date_from, date_to, max_days):
+    """
+    Returns every YYYY-MM-DD day from `date_from` to `date_to` (inclusive);
+    raises ValueError for invalid dates or ranges longer than `max_days`.
+    """
+    start = datetime.strptime(date_from, '%Y-%m-%d').date()
+    end = datetime.strptime(date_to, '%Y-%m-%d').date()
+    if not 0 <= (end - start).days < max_days:
+        raise ValueError
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+
+def dynamodb_value(value):
+    """Converts the floats of a JSON value (e.g. inside event_data) to Decimal, as DynamoDB requires."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: dynamodb_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [dynamodb_value(item) for item in value]
+    return value
+
 
 # Función para validar si un valor es un UUID válido
 def is_valid_uuid(val):
@@ -20,35 +58,123 @@ def is_valid_uuid(val):
     except ValueError:
         return False
 
-# Configuración inicial de DynamoDB
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-client_table = dynamodb.Table(os.getenv('CLIENT_TABLE_NAME', 'clients_default'))
-event_table = dynamodb.Table(os.getenv('EVENT_TABLE_NAME', 'eventsv2_default'))
-
 
 
 # Vista para listar todos los eventos
 class EventListApiView(APIView):
     """
-    View for listing all events.
+    View for listing events page by page.
     Supports:
-    - GET: Fetches all events or, preferably, a filtered set based on conditions.
+    - GET: Fetches a page of events, optionally filtered.
+
+    Query Parameters:
+    - page_size: Events per page (default 100, max 1000).
+    - next_page_token: Opaque token returned by the previous page; only valid
+      with the same filters (400 Bad Request otherwise).
+    - event_type, event_source, client_id, session_id: Optional filters.
+    - sucursal: Optional filter on event_data.sucursal.
+    - from, to: Optional date range (YYYY-MM-DD, inclusive) on the timestamp.
+    - segment, total_segments: Parallel scan segment, for exports without index filters.
+    - fields: Comma-separated EventSerializer fields to return (default: all).
+    - format=ndjson: Streams every matching event (all pages) as newline-delimited JSON.
     """
 
-    def scan_events(self, filter_condition=None):
-        """Performs a scan on the event table, with optional filter condition."""
-        scan_kwargs = {}
-        if filter_condition:
-            scan_kwargs['FilterExpression'] = filter_condition
-        return event_table.scan(**scan_kwargs)
+    renderer_classes = STREAMING_RENDERER_CLASSES
+    default_page_size = 100
+    max_page_size = 1000
+    token_scope_prefix = 'events'
+
+    def token_scope(self, filters):
+        """
+        The scope of the page tokens of a listing (see apiMZD.pagination):
+        the index list_page reads plus every filter, so a token only
+        continues the listing that produced it.
+        """
+        index_name = event_repo.list_index(filters.get('client_id'), filters.get('session_id'), filters.get('event_type'))
+        parts = [self.token_scope_prefix, index_name or 'scan']
+        parts += [
+            f'{name}={value}' for name, value in sorted(filters.items())
+            if name != 'fields' and value not in (None, '')
+        ]
+        return '|'.join(parts)
+
+    def parse_date(self, value):
+        """Validates a YYYY-MM-DD date; returns it unchanged or raises ValueError."""
+        if value:
+            datetime.strptime(value, '%Y-%m-%d')
+        return value
+
+    def parse_int(self, value, minimum, maximum):
+        value = int(value)
+        if not minimum <= value <= maximum:
+            raise ValueError
+        return value
 
     def get(self, request):
-        """Handles GET requests to fetch all or filtered events."""
-        # For better performance, consider adding a filter condition instead of scanning all records
-        # e.g., filtering for recent or important events
-        response = self.scan_events()
-        events = response.get('Items', [])
-        return Response(events)
+        """Handles GET requests to fetch a page of events."""
+        params = request.GET
+        try:
+            page_size = self.parse_int(params.get('page_size', self.default_page_size), 1, self.max_page_size)
+            date_from = self.parse_date(params.get('from'))
+            date_to = self.parse_date(params.get('to'))
+            total_segments = params.get('total_segments')
+            segment = None
+            if total_segments is not None:
+                total_segments = self.parse_int(total_segments, 1, 1000000)
+                segment = self.parse_int(params.get('segment', 0), 0, total_segments - 1)
+        except ValueError:
+            return Response({"error": "Parámetros de consulta inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            fields = parse_fields(request, EventSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {
+            'event_type': params.get('event_type'),
+            'date_from': date_from,
+            'date_to': date_to,
+            'event_source': params.get('event_source'),
+            'client_id': params.get('client_id'),
+            'session_id': params.get('session_id'),
+            'sucursal': params.get('sucursal'),
+            'segment': segment,
+            'total_segments': total_segments,
+            'fields': fields,
+        }
+        token_scope = self.token_scope(filters)
+
+        exclusive_start_key = None
+        token = params.get('next_page_token')
+        if token:
+            try:
+                exclusive_start_key = decode_page_token(token, token_scope)
+            except InvalidPageToken as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            response = event_repo.list_page(page_size, exclusive_start_key, **filters)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ClientError as e:
+            return Response({"error": e.response['Error']['Message']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if wants_ndjson(request):
+            return ndjson_response(self.iter_events(response, page_size, filters))
+
+        return Response({
+            "events": response.get('Items', []),
+            "next_page_token": encode_page_token(response.get('LastEvaluatedKey'), token_scope),
+        })
+
+    def iter_events(self, response, page_size, filters):
+        """Yields the events of `response` and of every following page."""
+        while True:
+            yield from response.get('Items', [])
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                return
+            response = event_repo.list_page(page_size, last_evaluated_key, **filters)
 
 # Vista para crear un nuevo evento
 class EventCreateAPIView(APIView):
@@ -56,44 +182,190 @@ class EventCreateAPIView(APIView):
     View to create a new event.
     Supports:
     - POST: Creates a new event record.
+
+    With settings.EVENT_WRITE_BEHIND['ENABLED'] the event is validated and
+    queued instead: the response is 202 Accepted with the event_id, or 429
+    Too Many Requests (with Retry-After) while the queue is full.
     """
 
-    def generate_ids(self, request):
+    def generate_ids(self, data):
         """Generates session_id and event_id if not provided."""
-        if ('event_source' in request.data and request.data['event_source'] != 'website'):
-            request.data['session_id'] = "00000000-0000-0000-0000-000000000000"
-        elif 'session_id' not in request.data:
-            request.data['session_id'] = str(uuid4())
-        if 'event_id' not in request.data:
-            request.data['event_id'] = str(uuid4())
+        if ('event_source' in data and data['event_source'] != 'website'):
+            data['session_id'] = "00000000-0000-0000-0000-000000000000"
+        elif 'session_id' not in data:
+            data['session_id'] = str(uuid4())
+        if 'event_id' not in data:
+            data['event_id'] = str(uuid4())
 
     def post(self, request):
         """Handles POST requests to create a new event."""
         try:
-            self.generate_ids(request)
-            serializer = EventSerializer(data=request.data)
-            if serializer.is_valid():
-                event_data = serializer.validated_data
-                mexico_tz = pytz.timezone('America/Mexico_City')
-                event_data['timestamp'] = datetime.now(mexico_tz).strftime('%Y-%m-%d %H:%M:%S %Z%z')
-                event_table.put_item(Item=event_data)
+            self.generate_ids(request.data)
+            event_data, errors = event_validator.validate(request.data)
+            if errors is None:
+                event_data['timestamp'] = event_timestamp()
+                if settings.EVENT_WRITE_BEHIND['ENABLED']:
+                    return self.enqueue(event_data)
+                event_repo.save(event_data)
+                record_stats([event_data])
                 # Modified to include the event_id in the response
                 return Response({
                     "message": "Evento creado exitosamente.",
                     "event_id": request.data['event_id']  # Return the event_id
                 }, status=status.HTTP_201_CREATED)
         except ClientError as e:
-            error_code = e.response['Error']['Code']
-            error_message = {
-                'ProvisionedThroughputExceededException': "Se ha excedido la capacidad provisionada. Por favor, inténtalo de nuevo más tarde.",
-                'ResourceNotFoundException': "La tabla no fue encontrada.",
-                'ConditionalCheckFailedException': "La condición especificada no se cumplió.",
-                'ValidationException': "Hubo un problema con los datos de entrada."
-            }.get(error_code, "Ocurrió un error al acceder a DynamoDB.")
-            return Response({"error": error_message}, status=getattr(status, f'HTTP_{error_code}_INTERNAL_SERVER_ERROR', status.HTTP_500_INTERNAL_SERVER_ERROR))
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return self.handle_event_error(e)
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def enqueue(self, event_data):
+        """Queues the event for a background write (write-behind mode)."""
+        writer = get_writer()
+        if not writer.submit(dict(event_data)):
+            # Cola llena: DynamoDB no da abasto, el cliente debe reintentar más tarde
+            return Response(
+                {"error": "Demasiados eventos pendientes. Por favor, inténtalo de nuevo más tarde."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(writer.retry_after)},
+            )
+        return Response({
+            "message": "Evento recibido; se guardará en breve.",
+            "event_id": event_data['event_id'],
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def handle_event_error(self, e):
+        """Maps a DynamoDB ClientError to an error Response."""
+        error_code = e.response['Error']['Code']
+        error_message = {
+            'ProvisionedThroughputExceededException': "Se ha excedido la capacidad provisionada. Por favor, inténtalo de nuevo más tarde.",
+            'ResourceNotFoundException': "La tabla no fue encontrada.",
+            'ConditionalCheckFailedException': "La condición especificada no se cumplió.",
+            'ValidationException': "Hubo un problema con los datos de entrada."
+        }.get(error_code, "Ocurrió un error al acceder a DynamoDB.")
+        return Response({"error": error_message}, status=getattr(status, f'HTTP_{error_code}_INTERNAL_SERVER_ERROR', status.HTTP_500_INTERNAL_SERVER_ERROR))
+
+
+# Vista para crear varios eventos en una sola llamada
+class EventBatchCreateAPIView(EventCreateAPIView):
+    """
+    View to create many events at once (e.g. the website tracker's buffer).
+    Supports:
+    - POST: Validates and creates a list of events with BatchWriteItem.
+
+    Request Body:
+    - A JSON array of events, each one like the body of POST /events/create/.
+
+    Responses:
+    - 201 Created: Every event was created.
+    - 207 Multi-Status: Some events were invalid or could not be written.
+    Both include `results`, one entry per input event with its `index`, a
+    `status` ("created", "invalid" or "failed") and its `event_id` or `errors`,
+    so the client can retry only the failures.
+    - 400 Bad Request: The body is not a list of 1 to 500 events.
+    """
+
+    max_events = 500
+
+    def post(self, request):
+        """Handles POST requests to create a batch of events."""
+        events = request.data
+        if not isinstance(events, list) or not 1 <= len(events) <= self.max_events:
+            return Response(
+                {"error": f"Se esperaba una lista de 1 a {self.max_events} eventos."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Todos los eventos del batch comparten el mismo timestamp
+        timestamp = event_timestamp()
+        results = [None] * len(events)
+        valid_events = {}
+
+        for index, data in enumerate(events):
+            if not isinstance(data, dict):
+                results[index] = {"index": index, "status": "invalid", "errors": {"non_field_errors": ["Se esperaba un objeto."]}}
+                continue
+
+            data = dict(data)
+            self.generate_ids(data)
+            event_data, errors = event_validator.validate(data)
+            if errors is not None:
+                results[index] = {"index": index, "status": "invalid", "errors": errors}
+                continue
+
+            if event_data['event_id'] in valid_events:
+                # BatchWriteItem rechaza llaves repetidas en la misma solicitud
+                results[index] = {"index": index, "status": "invalid", "errors": {"event_id": ["event_id repetido en el batch."]}}
+                continue
+            event_data['timestamp'] = timestamp
+            valid_events[event_data['event_id']] = (index, event_data)
+
+        try:
+            failed_ids = event_repo.save_many([event_data for _, event_data in valid_events.values()])
+        except ClientError as e:
+            return self.handle_event_error(e)
+
+        for event_id, (index, _) in valid_events.items():
+            results[index] = {
+                "index": index,
+                "event_id": event_id,
+                "status": "failed" if event_id in failed_ids else "created",
+            }
+        record_stats(event_data for event_id, (_, event_data) in valid_events.items() if event_id not in failed_ids)
+
+        all_created = all(result["status"] == "created" for result in results)
+        return Response(
+            {"results": results},
+            status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS,
+        )
 
 # Vista para obtener, actualizar o eliminar un evento específico
+def update_event(request, event_id, session_id=None):
+    """
+    Writes the attributes in the request body to an event with a single
+    UpdateItem; the other attributes are left untouched. With `session_id`
+    the event must also belong to that session. The version read by the
+    client can be sent in If-Match to reject concurrent modifications.
+
+    Responses:
+    - 200 OK: Event was updated; returns its new version (also as ETag).
+    - 400 Bad Request: Invalid or empty body (only EventSerializer fields are
+      accepted), invalid If-Match or an attempt to change the IDs.
+    - 404 Not Found: Event was not found.
+    - 412 Precondition Failed: The event's version is not the one in If-Match.
+    """
+    try:
+        version = expected_version(request)
+    except InvalidVersion as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    event_data, errors = event_validator.validate(request.data, partial=True)
+    if errors is not None:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    fixed = {'event_id': str(event_id)}
+    if session_id is not None:
+        fixed['session_id'] = str(session_id)
+    if any(str(request.data.get(name, value)) != value for name, value in fixed.items()):
+        return Response({"error": "Los identificadores del evento no se pueden modificar."}, status=status.HTTP_400_BAD_REQUEST)
+
+    changes = {key: dynamodb_value(value) for key, value in event_data.items() if key not in fixed}
+    if 'timestamp' in changes:
+        changes['timestamp'] = event_timestamp(changes['timestamp'])
+    if not changes:
+        return Response({"error": "No se enviaron campos para actualizar."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        event = event_repo.update(event_id, changes, version, session_id)
+    except ItemNotFound:
+        return Response({"error": "Evento no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+    except VersionConflict as e:
+        return conflict_response(e)
+    return Response(
+        {"message": "Evento actualizado exitosamente.", "version": event['version']},
+        status=status.HTTP_200_OK,
+        headers={'ETag': etag(event['version'])},
+    )
+
+
 class EventDetailView(APIView):
     """
     View to retrieve, update, or delete a specific event.
@@ -103,31 +375,40 @@ class EventDetailView(APIView):
     - DELETE: Delete a specific event by event_id and session_id.
     """
     
-    def get_event(self, event_id, session_id):
-        """Helper method to fetch an event."""
-        response = event_table.get_item(Key={'event_id': str(event_id), 'session_id': str(session_id)})
-        return response.get('Item', None)
+    def get_event(self, event_id, session_id, fields=None):
+        """
+        Helper method to fetch an event (only `fields` when given) by its
+        event_id; returns None if it does not belong to `session_id`.
+        """
+        event = event_repo.get(event_id, [*fields, 'session_id'] if fields else None)
+        if not event or event.get('session_id') != str(session_id):
+            return None
+        if fields and 'session_id' not in fields:
+            event = {name: value for name, value in event.items() if name != 'session_id'}
+        return event
 
     def get(self, request, event_id, session_id):
-        """Handles GET requests to retrieve a specific event."""
-        event = self.get_event(event_id, session_id)
+        """Handles GET requests to retrieve a specific event; ?fields= limits the attributes returned."""
+        try:
+            fields = parse_fields(request, EventSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        event = self.get_event(event_id, session_id, fields)
         if event:
             return Response(event)
         return Response({"error": "Evento no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
     def put(self, request, event_id, session_id):
-        """Handles PUT requests to update a specific event."""
-        event = self.get_event(event_id, session_id)
-        if not event:
-            return Response({"error": "Evento no encontrado."}, status=status.HTTP_404_NOT_FOUND)
-        for key, value in request.data.items():
-            event[key] = value
-        event_table.put_item(Item=event)
-        return Response({"message": "Evento actualizado exitosamente."}, status=status.HTTP_200_OK)
+        """Handles PUT requests to update a specific event (see update_event)."""
+        return update_event(request, event_id, session_id)
 
     def delete(self, request, event_id, session_id):
-        """Handles DELETE requests to delete a specific event."""
-        event_table.delete_item(Key={'event_id': str(event_id), 'session_id': str(session_id)})
+        """Handles DELETE requests to delete a specific event (404 if it does not belong to session_id)."""
+        try:
+            event_repo.delete(event_id, session_id)
+        except ItemNotFound:
+            return Response({"error": "Evento no encontrado."}, status=status.HTTP_404_NOT_FOUND)
         return Response({"message": "Evento eliminado exitosamente."}, status=status.HTTP_204_NO_CONTENT)
     
 
@@ -138,41 +419,40 @@ class EventByIdDetailView(APIView):
     - GET: Retrieve a specific event by event_id.
     """
 
-    def get_event(self, event_id):
+    def get_event(self, event_id, fields=None):
         """
         Helper method to fetch an event based on event_id.
         :param event_id: The ID of the event to retrieve.
+        :param fields: Attributes to return (all of them when None).
         :return: The event data, or None if not found.
         """
-        response = event_table.get_item(Key={'event_id': str(event_id)})
-        return response.get('Item', None)
+        return event_repo.get(event_id, fields)
     
     def get(self, request, event_id):
         """
         Handles GET requests to retrieve a specific event.
-        :param request: The request object.
+        :param request: The request object; ?fields= limits the attributes returned.
         :param event_id: The ID of the event to retrieve.
         :return: The event data, or a 404 error if not found.
         """
-        event = self.get_event(event_id)
+        try:
+            fields = parse_fields(request, EventSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        event = self.get_event(event_id, fields)
         if event:
             return Response(event)
         return Response({"error": "Evento no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
     def put(self, request, event_id):
         """
-        Handles PUT requests to update a specific event.
+        Handles PUT requests to update a specific event (see update_event).
         :param request: The request object.
         :param event_id: The ID of the event to update.
-        :return: Updated event data, or a 404 error if not found.
+        :return: The new version, or a 404/412 error.
         """
-        event = self.get_event(event_id)
-        if not event:
-            return Response({"error": "Evento no encontrado."}, status=status.HTTP_404_NOT_FOUND)
-        for key, value in request.data.items():
-            event[key] = value
-        event_table.put_item(Item=event)
-        return Response({"message": "Evento actualizado exitosamente."}, status=status.HTTP_200_OK)
+        return update_event(request, event_id)
 
     def delete(self, request, event_id):
         """
@@ -184,7 +464,7 @@ class EventByIdDetailView(APIView):
         event = self.get_event(event_id)
         if not event:
             return Response({"error": "Evento no encontrado."}, status=status.HTTP_404_NOT_FOUND)
-        event_table.delete_item(Key={'event_id': str(event_id)})
+        event_repo.delete(event_id)
         return Response({"message": "Evento eliminado exitosamente."}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -197,46 +477,171 @@ class SessionEventsApiView(APIView):
     """
 
     def get(self, request, session_id):
-        """Handles GET requests to retrieve events based on session_id."""
+        """Handles GET requests to retrieve events based on session_id; ?fields= limits the attributes returned."""
+        try:
+            fields = parse_fields(request, EventSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         # Query the GSI based on session_id
-        response = event_table.query(
-            IndexName='session_id-index',
-            KeyConditionExpression=Key('session_id').eq(session_id)
-        )
-        events = response.get('Items', [])
+        events = event_repo.by_session(session_id, fields)
         
         if not events:
             return Response({"error": "No se encontraron eventos para la sesión proporcionada."}, status=status.HTTP_404_NOT_FOUND)
         
         return Response(events)
 
+class EventTimelineApiView(EventListApiView):
+    """
+    View for the events of one type over a date range, with per-day counts
+    (e.g. the weekly visits of a sucursal).
+    Supports:
+    - GET: Fetches the events and their counts by day.
+
+    Query Parameters:
+    - event_type: Event type to read (default "visit_registration").
+    - from, to: Date range (YYYY-MM-DD, inclusive, at most 93 days). Both
+      default to today in Mexico City; `to` defaults to `from`.
+    - sucursal: Optional filter on event_data.sucursal.
+    - all=true: Returns every event of the range in a single response.
+    - page_size, next_page_token: Cursor mode (the default), as in the event
+      list; a token only continues the same event_type, range and sucursal.
+    - fields: Comma-separated EventSerializer fields to return (timestamp is
+      always included).
+
+    Responses:
+    - 200 OK: {"event_type", "from", "to", "counts", "total", "events",
+      "next_page_token"}. `counts` maps every day of the range to its number
+      of events and covers the whole range, not only the returned page; in
+      cursor mode it is only computed for the first page (null afterwards).
+    - 400 Bad Request: Invalid dates, range or page parameters, or a
+      next_page_token of another timeline.
+    """
+
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    max_days = 93
+    token_scope_prefix = 'events-timeline'
+
+    def get(self, request):
+        """Handles GET requests to fetch the timeline of an event type."""
+        params = request.GET
+        event_type = params.get('event_type', 'visit_registration')
+        sucursal = params.get('sucursal')
+        fetch_all = params.get('all', '').lower() == 'true'
+        try:
+            page_size = self.parse_int(params.get('page_size', self.default_page_size), 1, self.max_page_size)
+            date_from = self.parse_date(params.get('from')) or datetime.now(MEXICO_TZ).strftime('%Y-%m-%d')
+            date_to = self.parse_date(params.get('to')) or date_from
+            days = days_between(date_from, date_to, self.max_days)
+        except ValueError:
+            return Response({"error": "Parámetros de consulta inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Con all=true los conteos por día salen del timestamp de cada evento
+            fields = parse_fields(request, EventSerializer, ('timestamp',))
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {
+            'event_type': event_type, 'date_from': date_from, 'date_to': date_to, 'sucursal': sucursal, 'fields': fields,
+        }
+        token_scope = self.token_scope(filters)
+
+        exclusive_start_key = None
+        token = params.get('next_page_token')
+        if token and not fetch_all:
+            try:
+                exclusive_start_key = decode_page_token(token, token_scope)
+            except InvalidPageToken as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            response = event_repo.list_page(page_size, exclusive_start_key, **filters)
+            if fetch_all:
+                events = list(self.iter_events(response, page_size, filters))
+                counts = dict.fromkeys(days, 0)
+                for event in events:
+                    counts[event['timestamp'][:10]] += 1
+                next_page_token = None
+            else:
+                events = response.get('Items', [])
+                counts = None if exclusive_start_key else event_repo.count_by_day(event_type, days, sucursal)
+                next_page_token = encode_page_token(response.get('LastEvaluatedKey'), token_scope)
+        except ClientError as e:
+            return Response({"error": e.response['Error']['Message']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            "event_type": event_type,
+            "from": date_from,
+            "to": date_to,
+            "counts": counts,
+            "total": sum(counts.values()) if counts is not None else None,
+            "events": events,
+            "next_page_token": next_page_token,
+        })
+
+
+class EventStatsApiView(APIView):
+    """
+    View for the daily event aggregates (see api_events/stats.py).
+    Supports:
+    - GET: Counts by day, event type and source over a date range, read from
+      the aggregates table with a single query. The counters only move with
+      settings.EVENT_STATS['ENABLED']; `manage.py rebuild_event_stats`
+      recomputes them from the events table.
+
+    Query Parameters:
+    - from, to: Date range (YYYY-MM-DD, inclusive, at most 366 days). `to`
+      defaults to today in Mexico City and `from` to six days before `to`.
+
+    Responses:
+    - 200 OK: {"from", "to", "total", "by_type", "by_source", "days"}, where
+      `days` has one entry per day of the range with its own counters.
+    - 400 Bad Request: Invalid dates or range.
+    """
+
+    max_days = 366
+
+    def get(self, request):
+        """Handles GET requests to fetch the event aggregates of a range."""
+        try:
+            date_to = request.GET.get('to') or datetime.now(MEXICO_TZ).strftime('%Y-%m-%d')
+            date_from = request.GET.get('from') or (
+                datetime.strptime(date_to, '%Y-%m-%d') - timedelta(days=6)
+            ).strftime('%Y-%m-%d')
+            days = days_between(date_from, date_to, self.max_days)
+        except ValueError:
+            return Response({"error": "Parámetros de consulta inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            items = event_stats_repo.between(date_from, date_to)
+        except ClientError as e:
+            return Response({"error": e.response['Error']['Message']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({"from": date_from, "to": date_to, **summarize(items, days)})
+
+
 class TodaysVisitsApiView(APIView):
     """
     View to list all visit registration events for the current day.
     Supports:
-    - GET: Retrieve today's visit registration events.
+    - GET: Retrieve today's visit registration events (every page); ?fields=
+      limits the attributes returned.
+
+    See EventTimelineApiView for other days, ranges and counts.
     """
 
     def get(self, request):
         """Handles GET requests to retrieve today's visit registration events."""
         # Set the timezone for Mexico City
-        mexico_tz = pytz.timezone('America/Mexico_City')
         # Get the current date in that timezone
-        today = datetime.now(mexico_tz).strftime('%Y-%m-%d')
-        
-        # Query the table for today's visit registration events
-        response = event_table.query(
-            IndexName='event_type-timestamp-index',
-            KeyConditionExpression='event_type = :etype AND begins_with(#ts, :today)',
-            ExpressionAttributeNames={
-                '#ts': 'timestamp',
-            },
-            ExpressionAttributeValues={
-                ':today': today,
-                ':etype': 'visit_registration',
-            }
-        )
+        today = datetime.now(MEXICO_TZ).strftime('%Y-%m-%d')
 
-        events = response.get('Items', [])
+        try:
+            fields = parse_fields(request, EventSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Query the table for today's visit registration events
+        events = event_repo.by_type_on_day('visit_registration', today, fields)
         return Response(events)
 
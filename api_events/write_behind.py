@@ -0,0 +1,403 @@
+"""
+Escritura diferida (write-behind) de eventos.
+
+Con settings.EVENT_WRITE_BEHIND['ENABLED'], EventCreateAPIView valida el
+evento, lo deja en una cola local y responde 202 sin esperar a DynamoDB. Un
+hilo por proceso vacía la cola con BatchWriteItem cada MAX_BATCH eventos o
+cada FLUSH_INTERVAL segundos, lo que ocurra primero.
+
+Backends de cola (settings.EVENT_WRITE_BEHIND['BACKEND']):
+
+- MemoryQueue: deque en memoria; cada evento aceptado se anota también en un
+  archivo de respaldo (var/event-queue.jsonl) que se vuelve a leer al
+  arrancar, así que los eventos pendientes sobreviven a un reinicio del
+  proceso.
+- SQLiteQueue: la cola vive en un archivo SQLite (var/event-queue.sqlite3);
+  útil para pruebas y para inspeccionar lo que queda pendiente.
+
+Cada proceso es dueño de su archivo de respaldo: lo bloquea (flock sobre
+<archivo>.lock) mientras vive. Si el archivo configurado ya está bloqueado por
+otro worker, el proceso usa <archivo>.1, <archivo>.2, etc., así ningún evento
+se reproduce (ni se cuenta en las estadísticas) dos veces y un worker que
+reinicia retoma el archivo libre que haya dejado otro.
+
+No usar en Lambda (Zappa): entre invocaciones el contenedor se congela con el
+hilo dentro, así que un evento aceptado con 202 puede quedarse sin escribir
+hasta que el contenedor se recicle y perderse con él. Ahí
+EVENT_WRITE_BEHIND_ENABLED debe quedarse en False.
+
+Si DynamoDB limita la capacidad, los eventos vuelven a la cola y el hilo
+espera antes de reintentar; cuando la cola se llena, la vista responde 429
+(backpressure) en lugar de un error 5xx.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import deque
+
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from apiMZD.dynamodb import backoff
+from apiMZD.repositories import event_repo
+
+from .stats import record_stats
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_ERROR_CODES = {
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'ThrottlingException',
+}
+
+
+def is_retryable(error):
+    """True for throttling, DynamoDB 5xx and connection errors."""
+    if isinstance(error, BotoCoreError):
+        return True
+    if isinstance(error, ClientError):
+        status_code = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return error.response['Error']['Code'] in THROTTLING_ERROR_CODES or status_code >= 500
+    return False
+
+
+def claim_spill_path(path):
+    """
+    Locks `path` (or, when another process holds it, the first free
+    `path`.1, `path`.2, ...) for this process.
+
+    Returns:
+    - (claimed path, open lock file); the lock lasts until the file is closed.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    index = 0
+    while True:
+        candidate = path if index == 0 else f'{path}.{index}'
+        # El lock va en un archivo aparte: la compactación reemplaza el respaldo
+        lock_file = open(f'{candidate}.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            index += 1
+            continue
+        return candidate, lock_file
+
+
+class MemoryQueue:
+    """
+    In-memory FIFO journaled to an append-only file.
+
+    Every accepted item is appended to the spill file, which this process
+    owns (see claim_spill_path); the file is rewritten with the pending items
+    once enough of them have been acknowledged, and read back when the queue
+    is created.
+    """
+
+    default_spill_file = 'event-queue.jsonl'
+
+    def __init__(self, max_size, spill_path=None, compact_every=1000):
+        self.max_size = max_size
+        self.spill_path = spill_path
+        self.compact_every = compact_every
+        self._items = deque()
+        self._in_flight = []
+        self._acked_since_compaction = 0
+        self._lock = threading.Lock()
+        self._journal = None
+        self._spill_lock = None
+
+        if spill_path:
+            self.spill_path, self._spill_lock = claim_spill_path(spill_path)
+            self._items.extend(self._replay())
+            self._journal = open(self.spill_path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        if not os.path.exists(self.spill_path):
+            return []
+        items = []
+        with open(self.spill_path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    # Línea a medio escribir por una caída del proceso
+                    logger.warning("Se ignoró una línea inválida en %s", self.spill_path)
+        return items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items) + len(self._in_flight)
+
+    def put(self, item):
+        """Adds `item`; returns False when the queue is full."""
+        with self._lock:
+            if len(self._items) + len(self._in_flight) >= self.max_size:
+                return False
+            if self._journal:
+                self._journal.write(json.dumps(item, separators=(',', ':')) + '\n')
+                self._journal.flush()
+            self._items.append(item)
+            return True
+
+    def take(self, count):
+        """Removes and returns up to `count` items; they stay journaled until acked."""
+        with self._lock:
+            batch = [self._items.popleft() for _ in range(min(count, len(self._items)))]
+            self._in_flight.extend(batch)
+            return batch
+
+    def ack(self, items):
+        """Marks `items` (returned by take) as written."""
+        with self._lock:
+            for item in items:
+                self._in_flight.remove(item)
+            self._acked_since_compaction += len(items)
+            if self._journal and self._acked_since_compaction >= self.compact_every:
+                self._compact()
+
+    def requeue(self, items):
+        """Puts `items` (returned by take) back at the head of the queue."""
+        with self._lock:
+            for item in items:
+                self._in_flight.remove(item)
+            self._items.extendleft(reversed(items))
+
+    def _compact(self):
+        # Reescribe el respaldo sólo con lo pendiente; os.replace es atómico
+        tmp_path = f'{self.spill_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as tmp:
+            for item in [*self._in_flight, *self._items]:
+                tmp.write(json.dumps(item, separators=(',', ':')) + '\n')
+        self._journal.close()
+        os.replace(tmp_path, self.spill_path)
+        self._journal = open(self.spill_path, 'a', encoding='utf-8')
+        self._acked_since_compaction = 0
+
+    def close(self):
+        with self._lock:
+            if self._journal:
+                self._compact()
+                self._journal.close()
+                self._journal = None
+            if self._spill_lock:
+                self._spill_lock.close()
+                self._spill_lock = None
+
+
+class SQLiteQueue:
+    """
+    FIFO stored in a SQLite file, so pending items survive restarts.
+
+    The file is owned by this process (see claim_spill_path) and has a single
+    consumer (the flusher thread), which reads past the rows it already holds;
+    acked rows are deleted.
+    """
+
+    default_spill_file = 'event-queue.sqlite3'
+
+    def __init__(self, max_size, spill_path=None):
+        self.max_size = max_size
+        self.path = ':memory:'
+        self._spill_lock = None
+        if spill_path:
+            self.path, self._spill_lock = claim_spill_path(spill_path)
+        self._lock = threading.Lock()
+        self._last_taken = 0
+        self._in_flight = {}
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute('CREATE TABLE IF NOT EXISTS event_queue (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)')
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM event_queue').fetchone()[0]
+
+    def put(self, item):
+        with self._lock:
+            if self._db.execute('SELECT COUNT(*) FROM event_queue').fetchone()[0] >= self.max_size:
+                return False
+            self._db.execute('INSERT INTO event_queue (payload) VALUES (?)', (json.dumps(item, separators=(',', ':')),))
+            return True
+
+    def take(self, count):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, payload FROM event_queue WHERE id > ? ORDER BY id LIMIT ?', (self._last_taken, count),
+            ).fetchall()
+            batch = []
+            for row_id, payload in rows:
+                item = json.loads(payload)
+                self._in_flight[id(item)] = row_id
+                batch.append(item)
+            if rows:
+                self._last_taken = rows[-1][0]
+            return batch
+
+    def ack(self, items):
+        with self._lock:
+            row_ids = [(self._in_flight.pop(id(item)),) for item in items]
+            self._db.executemany('DELETE FROM event_queue WHERE id = ?', row_ids)
+
+    def requeue(self, items):
+        with self._lock:
+            row_ids = [self._in_flight.pop(id(item)) for item in items]
+            if row_ids:
+                # Se vuelven a leer en la siguiente llamada a take
+                self._last_taken = min(self._last_taken, min(row_ids) - 1)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+            if self._spill_lock:
+                self._spill_lock.close()
+                self._spill_lock = None
+
+
+class EventWriteBehind:
+    """
+    Accepts validated events and writes them to DynamoDB from a background
+    thread, in batches.
+    """
+
+    def __init__(self, queue, max_batch=100, flush_interval=1.0, max_backoff=30.0):
+        self.queue = queue
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.stats = {'accepted': 0, 'rejected': 0, 'written': 0, 'retried': 0, 'dropped': 0, 'throttled': 0}
+        self._stats_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._throttled_attempts = 0
+        self._thread = threading.Thread(target=self._run, name='event-write-behind', daemon=True)
+        self._thread.start()
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def submit(self, event):
+        """Queues `event`; returns False when the queue is full (backpressure)."""
+        if not self.queue.put(event):
+            self._count('rejected')
+            return False
+        self._count('accepted')
+        if len(self.queue) >= self.max_batch:
+            self._wake.set()
+        return True
+
+    @property
+    def retry_after(self):
+        """Seconds a rejected client should wait before retrying."""
+        delay = min(self.max_backoff, 0.5 * 2 ** self._throttled_attempts) if self._throttled_attempts else 0
+        return max(1, round(self.flush_interval + delay))
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                if not self.flush():
+                    # Espera antes de reintentar; mientras tanto la cola se llena
+                    backoff(self._throttled_attempts, 0.5, self.max_backoff)
+            except Exception:
+                logger.exception("Error al vaciar la cola de eventos")
+
+    def flush(self):
+        """
+        Writes everything queued, batch by batch. Returns False when it stopped
+        early because DynamoDB throttled a batch.
+        """
+        while True:
+            batch = self.queue.take(self.max_batch)
+            if not batch:
+                return True
+            if not self._write(batch):
+                return False
+
+    def _write(self, batch):
+        """Writes `batch`; returns False when it has to be retried later."""
+        try:
+            failed_ids = event_repo.save_many(batch)
+        except Exception as e:
+            if not is_retryable(e):
+                self._write_one_by_one(batch)
+                return True
+            failed_ids = {event['event_id'] for event in batch}
+
+        failed = [event for event in batch if event['event_id'] in failed_ids]
+        written = [event for event in batch if event['event_id'] not in failed_ids]
+        self.queue.ack(written)
+        record_stats(written)
+        self._count('written', len(written))
+        if not failed:
+            self._throttled_attempts = 0
+            return True
+
+        self.queue.requeue(failed)
+        self._count('retried', len(failed))
+        self._count('throttled')
+        self._throttled_attempts += 1
+        return False
+
+    def _write_one_by_one(self, batch):
+        # Un evento inválido no debe bloquear al resto del batch
+        for event in batch:
+            try:
+                event_repo.save(event)
+            except Exception as e:
+                if is_retryable(e):
+                    self.queue.requeue([event])
+                    self._count('retried')
+                    continue
+                logger.error("Se descartó el evento %s: %s", event.get('event_id'), e)
+                self.queue.ack([event])
+                self._count('dropped')
+            else:
+                self.queue.ack([event])
+                self._count('written')
+                record_stats([event])
+
+    def close(self, timeout=5.0):
+        """Stops the thread after a last flush; whatever is left stays in the spill file."""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Error al vaciar la cola de eventos")
+        self.queue.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Returns this process' EventWriteBehind, creating it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                options = settings.EVENT_WRITE_BEHIND
+                queue_class = import_string(options['BACKEND'])
+                # Cada backend tiene su propio archivo por defecto en var/
+                spill_path = options['SPILL_PATH'] or os.path.join(settings.BASE_DIR, 'var', queue_class.default_spill_file)
+                queue = queue_class(options['MAX_QUEUE'], spill_path)
+                _writer = EventWriteBehind(
+                    queue,
+                    max_batch=options['MAX_BATCH'],
+                    flush_interval=options['FLUSH_INTERVAL'],
+                )
+                atexit.register(_writer.close)
+    return _writer
@@ -1,3 +1,59 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from apiMZD.repositories import vendedor_repo
+from apiMZD.testing import DynamoDBTestCase
+
+
+def vendedor(vendedor_id, **fields):
+    return {
+        'vendedor_id': vendedor_id, 'nombre': 'Luis', 'email': f'{vendedor_id}@example.com', 'telefono': '',
+        'direccion': '', 'ciudad': '', 'estado': '', 'codigo_postal': '', 'sucursal': 'Mérida', **fields,
+    }
+
+
+class VendedorCacheTests(DynamoDBTestCase):
+
+    def test_lookup_is_cached_and_invalidated_when_saved(self):
+        response = self.client.post(reverse('vendedor-create'), vendedor('v1'), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        url = reverse('vendedor-by-id', args=['v1'])
+        self.assertEqual(self.client.get(url).json()['nombre'], 'Luis')
+
+        vendedor_repo.table.put_item(Item=dict(vendedor('v1'), nombre='Directo'))
+        self.assertEqual(self.client.get(url).json()['nombre'], 'Luis')
+
+        self.client.post(reverse('vendedor-create'), vendedor('v1', nombre='Luis Ángel'), content_type='application/json')
+        self.assertEqual(self.client.get(url).json()['nombre'], 'Luis Ángel')
+
+
+class VendedorBatchGetTests(DynamoDBTestCase):
+
+    def test_vendedores_follow_the_order_of_the_ids(self):
+        for i in range(120):
+            vendedor_repo.save(dict(vendedor(f'v{i}'), gsi_pk='VENDEDORES'))
+        vendedor_ids = [f'v{i}' for i in range(119, -1, -1)] + ['no-existe']
+        response = self.client.post(
+            reverse('vendedor-batch-get'), {'vendedor_ids': vendedor_ids, 'fields': ['nombre']}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([item and item['vendedor_id'] for item in body['vendedores']], vendedor_ids[:-1] + [None])
+        self.assertEqual(set(body['vendedores'][0]), {'vendedor_id', 'nombre'})
+        self.assertEqual(body['missing'], ['no-existe'])
+
+    def test_invalid_bodies(self):
+        for body in ({}, {'vendedor_ids': []}, {'vendedor_ids': ['v1'], 'fields': ['clave']}):
+            with self.subTest(body=body):
+                response = self.client.post(reverse('vendedor-batch-get'), body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+
+class VendedorProjectionTests(DynamoDBTestCase):
+
+    def test_vendedor_fields(self):
+        vendedor_repo.save(dict(vendedor('v1'), gsi_pk='VENDEDORES'))
+        url = reverse('vendedor-by-id', args=['v1'])
+        self.assertEqual(self.client.get(url, {'fields': 'nombre,sucursal'}).json(), {'nombre': 'Luis', 'sucursal': 'Mérida'})
+        self.assertEqual(self.client.get(url, {'fields': 'clave'}).status_code, 400)
+        response = self.client.get(reverse('vendedor-by-email', args=['v1@example.com']), {'fields': 'nombre'})
+        self.assertEqual(response.json(), {'nombre': 'Luis'})
@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import VendedorCreateAPIView,ListVendedoresView, VendedorByEmailAPIView, VendedorByIdAPIView, ListVendedoresBySucursalView
+from .views import VendedorCreateAPIView,ListVendedoresView, VendedorByEmailAPIView, VendedorByIdAPIView, ListVendedoresBySucursalView, VendedorBatchGetView
 
 urlpatterns = [
     path('', ListVendedoresView.as_view(), name='vendedor-list'),
     path('create/', VendedorCreateAPIView.as_view(), name='vendedor-create'),
+    path('batch-get/', VendedorBatchGetView.as_view(), name='vendedor-batch-get'),
     path('vendedor/<str:email>/', VendedorByEmailAPIView.as_view(), name='vendedor-by-email'),
-    path('<str:vendedor_id>/', VendedorByIdAPIView.as_view(), name='vendedor-by-id'),
     path('sucursal/', ListVendedoresBySucursalView.as_view(), name='vendedor-by-sucursal'),
+    path('<str:vendedor_id>/', VendedorByIdAPIView.as_view(), name='vendedor-by-id'),
 ]
\ No newline at end of file
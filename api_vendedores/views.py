@@ -3,16 +3,9 @@ from rest_framework.response import Response
 from rest_framework import status
 from botocore.exceptions import ClientError
 from .serializers import VendedorSerializer  # Importa el serializer para el vendedor
-import boto3
-import json
-from boto3.dynamodb.conditions import Key
-import os
-# Configuración inicial de DynamoDB
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-
-client_table = dynamodb.Table(os.getenv('CLIENT_TABLE_NAME', 'clients_default'))
-event_table = dynamodb.Table(os.getenv('EVENT_TABLE_NAME', 'eventsv2_default'))
-vendedores_table = dynamodb.Table(os.getenv('VENDEDORES_TABLE_NAME', 'vendedores'))
+from apiMZD.fields import InvalidFields, parse_fields, restrict_serializer
+from apiMZD.pagination import decode_page_token, encode_page_token, page_token_param, parse_page_size
+from apiMZD.repositories import event_repo, vendedor_repo
 
 
 
@@ -24,19 +17,23 @@ class VendedorByIdAPIView(APIView):
         Path Parameters:
         - vendedor_id: The ID of the vendedor to retrieve.
 
+        Query Parameters:
+        - fields: Comma-separated VendedorSerializer fields to return (default: all).
+
         Responses:
         - 200 OK: Returns the vendedor object if found.
+        - 400 Bad Request: Invalid fields.
         - 404 Not Found: Vendedor not found.
         - 500 Internal Server Error: Unexpected server error.
         """
         try:
-            # Realizar una consulta para obtener el vendedor por su ID
-            response = vendedores_table.get_item(
-                Key={'vendedor_id': vendedor_id}
-            )
+            fields = parse_fields(request, VendedorSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Obtener el vendedor de la respuesta
-            vendedor = response.get('Item')
+        try:
+            # Realizar una consulta para obtener el vendedor por su ID
+            vendedor = vendedor_repo.get(vendedor_id, fields)
 
             # Comprobar si se encontró algún vendedor
             if vendedor:
@@ -56,39 +53,79 @@ class VendedorByIdAPIView(APIView):
     
 
 
+class VendedorBatchGetView(APIView):
+    def post(self, request):
+        """
+        Handles POST requests to retrieve many vendedores in a single call.
+
+        Request Body:
+        - vendedor_ids: List of vendedor IDs (max 1000).
+        - fields: Optional list of VendedorSerializer fields to return.
+
+        Responses:
+        - 200 OK: {"vendedores": [...], "missing": [...], "unprocessed": [...]}.
+          `vendedores` follows the order of `vendedor_ids`, with null for the ones not returned.
+        - 400 Bad Request: Invalid data was supplied.
+        """
+        max_ids = 1000
+        vendedor_ids = request.data.get('vendedor_ids')
+        fields = request.data.get('fields')
+
+        if (not isinstance(vendedor_ids, list) or not vendedor_ids or len(vendedor_ids) > max_ids
+                or not all(isinstance(vendedor_id, str) and vendedor_id for vendedor_id in vendedor_ids)):
+            return Response({"error": f"vendedor_ids debe ser una lista de 1 a {max_ids} IDs."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if fields is not None:
+            allowed_fields = set(VendedorSerializer().fields)
+            if not isinstance(fields, list) or not fields or not all(field in allowed_fields for field in fields):
+                return Response({"error": "fields debe ser una lista de campos válidos del vendedor."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            vendedores, unprocessed = vendedor_repo.get_many('vendedor_id', vendedor_ids, fields)
+        except ClientError as e:
+            return VendedorCreateAPIView.handle_vendedor_error(self, e.response['Error']['Code'])
+
+        unprocessed_ids = set(unprocessed)
+        missing = [vendedor_id for vendedor_id, vendedor in zip(vendedor_ids, vendedores)
+                   if vendedor is None and vendedor_id not in unprocessed_ids]
+        return Response({'vendedores': vendedores, 'missing': missing, 'unprocessed': unprocessed})
+
+
 class ListVendedoresView(APIView):
+    default_page_size = 400
+    max_page_size = 1000
+    token_scope = 'vendedores'
+
     def get(self, request):
         """
         Maneja peticiones GET para listar todos los vendedores usando un GSI (query).
-        """
-        # 'last_evaluated_key' debe ser un string JSON enviado por el cliente
-        last_evaluated_key_str = request.GET.get('last_evaluated_key')
-
-        query_kwargs = {
-            'IndexName': 'gsi_pk-nombre-index', # <-- Usa el nombre de tu nuevo índice
-            'KeyConditionExpression': Key('gsi_pk').eq('VENDEDORES'), # <-- Consulta por la llave estática
-            'Limit': 400
-        }
 
-        # Manejo de paginación
-        if last_evaluated_key_str:
-            try:
-                # Convertir el string JSON de vuelta a un dict para DynamoDB
-                query_kwargs['ExclusiveStartKey'] = json.loads(last_evaluated_key_str)
-            except json.JSONDecodeError:
-                return Response({"error": "Formato de 'last_evaluated_key' inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        Parámetros de consulta:
+        - page_size: Vendedores por página (400 por defecto, máximo 1000).
+        - next_page_token: Token firmado que devolvió la página anterior
+          (también se acepta como last_evaluated_key).
+        - fields: Campos de VendedorSerializer a devolver, separados por comas (opcional).
+        """
+        try:
+            fields = parse_fields(request, VendedorSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # --- CAMBIO DE SCAN A QUERY ---
-            response = vendedores_table.query(**query_kwargs)
+            page_size = parse_page_size(request, self.default_page_size, self.max_page_size)
+            token = page_token_param(request)
+            exclusive_start_key = decode_page_token(token, self.token_scope) if token else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # 'LastEvaluatedKey' es un dict. El cliente debe guardarlo
-            # y enviarlo de vuelta (como string JSON) para la sig. página.
-            next_page_token = response.get('LastEvaluatedKey')
+        try:
+            # Query sobre "gsi_pk-nombre-index" con la llave estática
+            response = vendedor_repo.list_page(page_size, exclusive_start_key, fields)
 
             data = {
                 'vendedores': response.get('Items', []),
-                'next_page_token': next_page_token # Devuelve el dict
+                # Token opaco para la siguiente página (None en la última)
+                'next_page_token': encode_page_token(response.get('LastEvaluatedKey'), self.token_scope),
             }
 
             return Response(data)
@@ -102,40 +139,48 @@ class ListVendedoresView(APIView):
 
 
 class ListVendedoresBySucursalView(APIView):
+    default_page_size = 300
+    max_page_size = 1000
+
     def get(self, request):
         """
         Maneja peticiones GET para listar vendedores filtrados por sucursal usando el índice "sucursal-index".
 
         Parámetros de consulta:
         - sucursal: Valor de la sucursal para filtrar (obligatorio).
-        - last_evaluated_key: Token para paginación (opcional).
+        - page_size: Vendedores por página (300 por defecto, máximo 1000).
+        - next_page_token: Token firmado que devolvió la página anterior
+          (también se acepta como last_evaluated_key); sólo sirve para la misma sucursal.
+        - fields: Campos de VendedorSerializer a devolver, separados por comas (opcional).
 
         Respuestas:
         - 200 OK: Devuelve una página de vendedores junto con el token para la siguiente página.
-        - 400 Bad Request: Si no se proporciona el parámetro 'sucursal'.
+        - 400 Bad Request: Si no se proporciona el parámetro 'sucursal', o 'fields', 'page_size' o el token son inválidos.
         - 500 Internal Server Error: Error inesperado en el servidor.
         """
         sucursal = request.GET.get('sucursal')
         if not sucursal:
             return Response({"error": "El parámetro 'sucursal' es obligatorio."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        last_evaluated_key = request.GET.get('last_evaluated_key')
-        query_kwargs = {
-            'IndexName': 'sucursal-index',
-            'KeyConditionExpression': Key('sucursal').eq(sucursal),
-            'Limit': 300  # Ajusta este valor según tus necesidades
-        }
-        
-        if last_evaluated_key:
-            # Es importante que la llave de paginación incluya todos los atributos que conforman la clave primaria del índice.
-            query_kwargs['ExclusiveStartKey'] = {'vendedor_id': last_evaluated_key, 'sucursal': sucursal}
 
         try:
-            response = vendedores_table.query(**query_kwargs)
-            next_page_token = response.get('LastEvaluatedKey')
+            fields = parse_fields(request, VendedorSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # El token queda ligado a la sucursal: la llave incluye la del índice
+        token_scope = f'vendedores-sucursal:{sucursal}'
+        try:
+            page_size = parse_page_size(request, self.default_page_size, self.max_page_size)
+            token = page_token_param(request)
+            exclusive_start_key = decode_page_token(token, token_scope) if token else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            response = vendedor_repo.by_sucursal_page(sucursal, page_size, exclusive_start_key, fields)
             data = {
                 'vendedores': response.get('Items', []),
-                'next_page_token': next_page_token
+                'next_page_token': encode_page_token(response.get('LastEvaluatedKey'), token_scope),
             }
             return Response(data, status=status.HTTP_200_OK)
         except Exception as e:
@@ -159,7 +204,7 @@ class VendedorCreateAPIView(APIView):
         if serializer.is_valid():
             try:
                 # Create the vendedor in the table
-                vendedores_table.put_item(Item=serializer.validated_data)
+                vendedor_repo.save(serializer.validated_data)
                 
                 # Get the vendedor_id of the newly created vendedor
                 vendedor_id = serializer.validated_data.get('vendedor_id')
@@ -167,20 +212,12 @@ class VendedorCreateAPIView(APIView):
                 # Get the session_id from the request if needed for updating events
                 session_id = request.data.get('session_id')
                 
-                # If the session_id is present, update the events to add the vendedor_id
+                # If the session_id is present, link every event of the session to the vendedor_id
+                linked_events = 0
                 if session_id:
-                    response = event_table.query(
-                        IndexName='session_id-index',
-                        KeyConditionExpression=Key('session_id').eq(session_id)
-                    )
-                    events = response.get('Items', [])
-
-                    # Update each event to add the vendedor_id
-                    for event in events:
-                        event['vendedor_id'] = vendedor_id
-                        event_table.put_item(Item=event)
-
-                return Response({"message": "Vendedor creado exitosamente."}, status=status.HTTP_201_CREATED)
+                    linked_events = event_repo.link_session(session_id, 'vendedor_id', vendedor_id)
+
+                return Response({"message": "Vendedor creado exitosamente.", "linked_events": linked_events}, status=status.HTTP_201_CREATED)
             
             except ClientError as e:
                 error_code = e.response['Error']['Code']
@@ -225,27 +262,27 @@ class VendedorByEmailAPIView(APIView):
         """
         Handles GET requests to retrieve a vendedor by email.
 
+        Query Parameters:
+        - fields: Comma-separated VendedorSerializer fields to return (default: all).
+
         Responses:
         - 200 OK: Returns the vendedor object if found.
+        - 400 Bad Request: Invalid fields.
         - 404 Not Found: Vendedor not found.
         - 500 Internal Server Error: Unexpected server error.
         """
         try:
-            # Realizar una consulta en el índice global secundario por email
-            response = vendedores_table.query(
-                IndexName='email-index',
-                KeyConditionExpression='email = :email',
-                ExpressionAttributeValues={
-                    ':email': email
-                }
-            )
+            fields = parse_fields(request, VendedorSerializer)
+        except InvalidFields as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Obtener el vendedor de la respuesta
-            vendedor = response.get('Items', [])
+        try:
+            # Realizar una consulta en el índice global secundario por email
+            vendedor = vendedor_repo.find_by_email(email, fields)
 
             # Comprobar si se encontró algún vendedor
             if vendedor:
-                return Response(VendedorSerializer(vendedor[0]).data)
+                return Response(restrict_serializer(VendedorSerializer(vendedor[0]), fields).data)
             else:
                 return Response({'error': 'Vendedor no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -0,0 +1,287 @@
+"""
+Load test: sync (WSGI) vs async (ASGI + aiobotocore) client read views.
+
+A local moto server plays DynamoDB, with an artificial per-request latency
+(--latency-ms) so the numbers resemble a real network round trip. Each mode
+runs in a fresh process that calls the Django application directly, the way
+a single worker would:
+
+- wsgi: the WSGI handler with --threads threads (one gunicorn gthread worker).
+- asgi: the ASGI handler on one event loop with up to --concurrency requests
+  in flight (one uvicorn worker).
+
+The same mix of requests is sent in both modes: client detail, email and
+number lookups, client events and messages by phone. The item cache is
+disabled so every request reaches DynamoDB.
+
+Usage (from the repository root):
+
+    python benchmarks/async_load.py --requests 2000 --threads 8 --concurrency 64 --latency-ms 50
+
+Results are printed as JSON: requests per second, latency percentiles and the
+worker's CPU time per request. moto answers every call in Python, so with
+high concurrency it becomes the bottleneck of both modes; requests per CPU
+second show the cost of each mode independently of it.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+CLIENTS = 10
+
+
+def request_paths(count):
+    paths = []
+    for i in range(count):
+        client = i % CLIENTS
+        paths.append([
+            f'/clients/client-{client}/',
+            f'/clients/query/cliente{client}@example.com/',
+            f'/clients/query/number/52999{client:07d}/',
+            f'/clients/client-{client}/events/',
+            f'/clients/messages/52999{client:07d}/?limit=20',
+        ][i % 5])
+    return paths
+
+
+def start_dynamodb(latency_ms):
+    """Starts a moto server that answers after `latency_ms`; returns (server, endpoint)."""
+    from moto.moto_server.werkzeug_app import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import make_server
+
+    moto_app = DomainDispatcherApplication(create_backend_app)
+
+    def app(environ, start_response):
+        time.sleep(latency_ms / 1000)
+        return moto_app(environ, start_response)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def create_tables(endpoint):
+    import boto3
+
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1', endpoint_url=endpoint)
+
+    def index(name, hash_key, range_key=None):
+        key_schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+        if range_key:
+            key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+        return {'IndexName': name, 'KeySchema': key_schema, 'Projection': {'ProjectionType': 'ALL'}}
+
+    def create(name, key_schema, attributes, indexes):
+        dynamodb.create_table(
+            TableName=name,
+            KeySchema=[{'AttributeName': key, 'KeyType': key_type} for key, key_type in key_schema],
+            AttributeDefinitions=[{'AttributeName': attribute, 'AttributeType': 'S'} for attribute in attributes],
+            GlobalSecondaryIndexes=indexes,
+            BillingMode='PAY_PER_REQUEST',
+        )
+        return dynamodb.Table(name)
+
+    clients = create(
+        os.environ['CLIENT_TABLE_NAME'], [('client_id', 'HASH')], ['client_id', 'email', 'number', 'name'],
+        [index('email-index', 'email'), index('number-index', 'number'), index('name-index', 'name')],
+    )
+    events = create(
+        os.environ['EVENT_TABLE_NAME'], [('event_id', 'HASH')], ['event_id', 'client_id'],
+        [index('client_id-index', 'client_id')],
+    )
+    messages = create(
+        os.environ['MESSAGE_TABLE_NAME'], [('id_chat', 'HASH'), ('fecha', 'RANGE')],
+        ['id_chat', 'fecha', 'de_numero', 'para_numero'],
+        [index('de_numero-index', 'de_numero', 'fecha'), index('para_numero-index', 'para_numero', 'fecha')],
+    )
+
+    with clients.batch_writer() as clients_batch, events.batch_writer() as events_batch, \
+            messages.batch_writer() as messages_batch:
+        for i in range(CLIENTS):
+            number = f'52999{i:07d}'
+            clients_batch.put_item(Item={
+                'client_id': f'client-{i}', 'name': f'Cliente {i}', 'email': f'cliente{i}@example.com',
+                'number': number, 'sucursal': 'Mérida', 'numero_catalogo': Decimal(i),
+            })
+            for j in range(10):
+                events_batch.put_item(Item={
+                    'event_id': f'event-{i}-{j}', 'session_id': f'session-{i}', 'client_id': f'client-{i}',
+                    'event_type': 'page_view', 'timestamp': f'2026-10-17 10:{j:02d}:00',
+                    'event_data': {'url': f'https://example.com/{j}', 'duration': Decimal(j)},
+                })
+            for j in range(10):
+                outgoing = j % 2 == 0
+                messages_batch.put_item(Item={
+                    'id_chat': f'chat-{i}-{j}', 'fecha': f'2026-10-17T10:{j:02d}:00',
+                    'de_numero': 'bot' if outgoing else number, 'para_numero': number if outgoing else 'bot',
+                    'mensaje': 'Hola, ¿sigue disponible la CX-30?',
+                })
+
+
+def summarize(mode, elapsed, cpu, latencies, statuses):
+    latencies = sorted(latencies)
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        # CPU del proceso del worker: no depende de lo rápido que responda moto
+        'cpu_ms_per_request': round(cpu / len(latencies) * 1000, 3),
+        'requests_per_cpu_second': round(len(latencies) / cpu, 1),
+        'latency_ms': {
+            'p50': round(statistics.median(latencies) * 1000, 2),
+            'p95': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+            'p99': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        },
+        'statuses': sorted(set(statuses)),
+    }
+
+
+def run_wsgi(paths, concurrency):
+    from django.core.wsgi import get_wsgi_application
+    from wsgiref.util import setup_testing_defaults
+
+    application = get_wsgi_application()
+
+    def request(path):
+        route, _, query = path.partition('?')
+        environ = {'PATH_INFO': route, 'QUERY_STRING': query, 'REQUEST_METHOD': 'GET', 'HTTP_HOST': 'localhost'}
+        setup_testing_defaults(environ)
+        statuses = []
+        started = time.perf_counter()
+        b''.join(application(environ, lambda status, headers: statuses.append(status)))
+        return time.perf_counter() - started, int(statuses[0].split()[0])
+
+    request(paths[0])  # Calentamiento: imports, URLconf y cliente de DynamoDB
+    started, cpu_started = time.perf_counter(), time.process_time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request, paths))
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    return summarize('wsgi', elapsed, cpu, [r[0] for r in results], [r[1] for r in results])
+
+
+def run_asgi(paths, concurrency):
+    from django.core.asgi import get_asgi_application
+
+    from apiMZD.async_dynamodb import close_client
+
+    application = get_asgi_application()
+
+    async def request(path):
+        route, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': route, 'raw_path': route.encode(), 'query_string': query.encode(),
+            'headers': [(b'host', b'localhost')], 'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        return time.perf_counter() - started, messages[0]['status']
+
+    async def main():
+        await request(paths[0])
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(path):
+            async with semaphore:
+                return await request(path)
+
+        started, cpu_started = time.perf_counter(), time.process_time()
+        results = await asyncio.gather(*(limited(path) for path in paths))
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+        await close_client()
+        return summarize('asgi', elapsed, cpu, [r[0] for r in results], [r[1] for r in results])
+
+    return asyncio.run(main())
+
+
+def child(mode, requests, concurrency):
+    os.environ['ASYNC_VIEWS'] = 'True' if mode == 'asgi' else 'False'
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'apiMZD.settings_slim'
+    sys.path.insert(0, str(BASE_DIR))
+    paths = request_paths(requests)
+    return run_asgi(paths, concurrency) if mode == 'asgi' else run_wsgi(paths, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads.')
+    parser.add_argument('--concurrency', type=int, default=64, help='ASGI requests in flight.')
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='Added to every DynamoDB call.')
+    parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.requests, args.concurrency)))
+        return
+
+    os.environ.update({
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'benchmark'),
+        'ALLOWED_HOSTS': 'localhost',
+        'DEBUG': 'False',
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'CLIENT_TABLE_NAME': 'clients_benchmark',
+        'EVENT_TABLE_NAME': 'events_benchmark',
+        'MESSAGE_TABLE_NAME': 'messages_benchmark',
+        # Sin caché: todas las peticiones llegan a DynamoDB
+        'DYNAMODB_CACHE_BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        'DYNAMODB_MAX_POOL_CONNECTIONS': str(max(50, args.threads, args.concurrency)),
+    })
+    with contextlib.redirect_stdout(sys.stderr):
+        server, endpoint = start_dynamodb(args.latency_ms)
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = endpoint
+    create_tables(endpoint)
+
+    results = {}
+    try:
+        for mode in args.modes:
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', mode, '--requests', str(args.requests),
+                 '--concurrency', str(args.threads if mode == 'wsgi' else args.concurrency)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+    finally:
+        server.shutdown()
+
+    if 'wsgi' in results and 'asgi' in results:
+        results['speedup'] = round(
+            results['asgi']['requests_per_second'] / results['wsgi']['requests_per_second'], 2
+        )
+        results['cpu_efficiency'] = round(
+            results['asgi']['requests_per_cpu_second'] / results['wsgi']['requests_per_cpu_second'], 2
+        )
+    print(json.dumps({
+        'requests': args.requests,
+        'threads': args.threads,
+        'concurrency': args.concurrency,
+        'latency_ms': args.latency_ms,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Cold-start benchmark for the Django settings profiles.
+
+Every run starts a fresh Python process that imports Django, builds the WSGI
+application and serves two requests, so each measurement is a real cold start:
+
+- setup_ms: imports + django.setup() + WSGI handler (Lambda init phase).
+- first_request_ms: first request, including URLconf/view imports and the
+  lazy DynamoDB resource.
+- warm_request_ms: the same request once everything is loaded.
+
+Usage (from the repository root):
+
+    python benchmarks/cold_start.py --runs 10
+    python benchmarks/cold_start.py --moto --settings apiMZD.settings apiMZD.settings_slim
+
+With --moto the requests go to a local moto server instead of AWS. Results are
+printed as JSON.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def child(settings_module, path):
+    """Measures one cold start inside the current (fresh) process."""
+    started = time.perf_counter()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    sys.path.insert(0, str(BASE_DIR))
+    from django.core.wsgi import get_wsgi_application
+    from wsgiref.util import setup_testing_defaults
+
+    application = get_wsgi_application()
+    setup_done = time.perf_counter()
+
+    def request():
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'HTTP_HOST': 'localhost'}
+        setup_testing_defaults(environ)
+        statuses = []
+        body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+        return statuses[0], len(body)
+
+    status, _ = request()
+    first_done = time.perf_counter()
+    request()
+    warm_done = time.perf_counter()
+
+    return {
+        'status': status,
+        'setup_ms': (setup_done - started) * 1000,
+        'first_request_ms': (first_done - setup_done) * 1000,
+        'warm_request_ms': (warm_done - first_done) * 1000,
+        'modules_loaded': len(sys.modules),
+    }
+
+
+def start_moto():
+    """Starts a local moto server with an empty clients table; returns its endpoint."""
+    import boto3
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(port=0)
+    # moto anuncia el servidor en stdout; stdout queda reservado para el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        server.start()
+    host, port = server.get_host_and_port()
+    endpoint = f'http://{host}:{port}'
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = endpoint
+
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1', endpoint_url=endpoint)
+    dynamodb.create_table(
+        TableName=os.getenv('CLIENT_TABLE_NAME', 'clients_default'),
+        KeySchema=[{'AttributeName': 'client_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'client_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    return server
+
+
+def summarize(samples):
+    summary = {}
+    for field in ('setup_ms', 'first_request_ms', 'warm_request_ms', 'modules_loaded'):
+        values = [sample[field] for sample in samples]
+        summary[field] = {
+            'median': round(statistics.median(values), 2),
+            'min': round(min(values), 2),
+            'max': round(max(values), 2),
+        }
+    summary['statuses'] = sorted({sample['status'] for sample in samples})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--settings', nargs='+', default=['apiMZD.settings', 'apiMZD.settings_slim'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/clients/benchmark-client/')
+    parser.add_argument('--moto', action='store_true', help='Serve DynamoDB from a local moto server.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.path)))
+        return
+
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('ALLOWED_HOSTS', 'localhost')
+    server = start_moto() if args.moto else None
+
+    results = {}
+    try:
+        for settings_module in args.settings:
+            samples = []
+            for _ in range(args.runs):
+                output = subprocess.run(
+                    [sys.executable, __file__, '--child', settings_module, '--path', args.path],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                samples.append(json.loads(output.strip().splitlines()[-1]))
+            results[settings_module] = summarize(samples)
+    finally:
+        if server:
+            server.stop()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,584 @@
+"""
+Load test: every endpoint of apiMZD/urls.py against a local DynamoDB.
+
+Provisions the five tables with every index the repositories use (clients,
+events, daily event stats, messages and vendedores), seeds them with
+realistic volumes and then sends --requests requests to each endpoint, up to
+--concurrency at a time, through the WSGI application (one gthread worker),
+one endpoint after the other: reads first, then writes, then deletes.
+
+DynamoDB is a local moto server by default (with --latency-ms added to every
+call so the numbers resemble a network round trip) or DynamoDB Local with
+--endpoint http://localhost:8000. The DynamoDB calls of each request are
+counted with apiMZD.metrics, so the report shows how many calls (and how much
+capacity) each endpoint needs, not only how fast it answers.
+
+Usage (from the repository root):
+
+    python benchmarks/load.py --clients 1000 --requests 200 --concurrency 8
+    python benchmarks/load.py --only list_clients detail_client --no-cache
+    python benchmarks/load.py --endpoint http://localhost:8000 --output load.json
+
+Results are printed as JSON, one entry per endpoint (route name and method):
+requests per second, latency percentiles, status codes and DynamoDB calls,
+operations and capacity units per request. Routes that appear in
+apiMZD/urls.py without a scenario here are listed under "uncovered", and
+"resolved_to" shows when a path is answered by another route than the one it
+was written for.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+TABLE_NAMES = {
+    'CLIENT_TABLE_NAME': 'clients_load',
+    'EVENT_TABLE_NAME': 'events_load',
+    'EVENT_STATS_TABLE_NAME': 'event_stats_load',
+    'MESSAGE_TABLE_NAME': 'messages_load',
+    'VENDEDORES_TABLE_NAME': 'vendedores_load',
+}
+
+SUCURSALES = ['Mérida', 'Cancún', 'Campeche']
+EVENT_TYPES = ['page_view'] * 6 + ['click'] * 2 + ['form_submit', 'visit_registration']
+PAGES = ['/', '/modelos/cx-30', '/modelos/mazda-3-sedan', '/financiamiento', '/agenda-prueba']
+NAMES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Lucía', 'Miguel']
+SURNAMES = ['Pérez', 'López', 'Canul', 'Pech', 'Martínez', 'Chan', 'González']
+
+# Clientes, eventos y números reservados para los endpoints DELETE
+DISPOSABLE = 'disposable'
+
+
+# Tablas y datos
+
+def create_tables(endpoint):
+    import boto3
+
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1', endpoint_url=endpoint)
+
+    def index(name, hash_key, range_key=None):
+        key_schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+        if range_key:
+            key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+        return {'IndexName': name, 'KeySchema': key_schema, 'Projection': {'ProjectionType': 'ALL'}}
+
+    def create(setting, key_schema, attributes, indexes=()):
+        options = {
+            'TableName': TABLE_NAMES[setting],
+            'KeySchema': [{'AttributeName': key, 'KeyType': key_type} for key, key_type in key_schema],
+            'AttributeDefinitions': [{'AttributeName': attribute, 'AttributeType': 'S'} for attribute in attributes],
+            'BillingMode': 'PAY_PER_REQUEST',
+        }
+        if indexes:
+            options['GlobalSecondaryIndexes'] = list(indexes)
+        dynamodb.create_table(**options)
+
+    create(
+        'CLIENT_TABLE_NAME', [('client_id', 'HASH')], ['client_id', 'email', 'number', 'number_e164', 'name'],
+        [
+            index('email-index', 'email'),
+            index('number-index', 'number'),
+            index('number_e164-index', 'number_e164'),
+            index('name-index', 'name'),
+        ],
+    )
+    create(
+        'EVENT_TABLE_NAME', [('event_id', 'HASH')], ['event_id', 'session_id', 'client_id', 'event_type', 'timestamp'],
+        [
+            index('session_id-index', 'session_id'),
+            index('client_id-index', 'client_id'),
+            index('event_type-timestamp-index', 'event_type', 'timestamp'),
+        ],
+    )
+    create('EVENT_STATS_TABLE_NAME', [('pk', 'HASH'), ('day', 'RANGE')], ['pk', 'day'])
+    create(
+        'MESSAGE_TABLE_NAME', [('id_chat', 'HASH'), ('fecha', 'RANGE')],
+        ['id_chat', 'fecha', 'de_numero', 'para_numero', 'de_numero_e164', 'para_numero_e164'],
+        [
+            index('de_numero-index', 'de_numero', 'fecha'),
+            index('para_numero-index', 'para_numero', 'fecha'),
+            index('de_numero_e164-index', 'de_numero_e164', 'fecha'),
+            index('para_numero_e164-index', 'para_numero_e164', 'fecha'),
+        ],
+    )
+    create(
+        'VENDEDORES_TABLE_NAME', [('vendedor_id', 'HASH')], ['vendedor_id', 'email', 'sucursal', 'gsi_pk', 'nombre'],
+        [index('email-index', 'email'), index('sucursal-index', 'sucursal'), index('gsi_pk-nombre-index', 'gsi_pk', 'nombre')],
+    )
+    return dynamodb
+
+
+def client_number(i):
+    return f'52999{i:07d}'
+
+
+def e164(number):
+    # Los números sembrados ya llevan el código de país (ver apiMZD.phone.to_e164)
+    return '+' + number
+
+
+def disposable_number(i):
+    return f'52888{i:07d}'
+
+
+def session_id(kind, n):
+    # Las sesiones del sitio web son UUID (EventSerializer las valida)
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f'{kind}-{n}'))
+
+
+def client_name(i):
+    return f'{NAMES[i % len(NAMES)]} {SURNAMES[i % len(SURNAMES)]} {i}'
+
+
+def timestamp(moment):
+    # Mismo formato que api_events.views.event_timestamp (hora de la Ciudad de México)
+    return moment.strftime('%Y-%m-%d %H:%M:%S CST-0600')
+
+
+def seed(dynamodb, args, today):
+    """Writes the seed data; returns the number of items per table."""
+    rng = random.Random(42)
+    tables = {setting: dynamodb.Table(name) for setting, name in TABLE_NAMES.items()}
+    counts = Counter()
+    stats = defaultdict(Counter)
+
+    def put(setting, writer, item):
+        writer.put_item(Item=item)
+        counts[setting] += 1
+
+    def event(event_id, session, client_id, moment):
+        event_type = rng.choice(EVENT_TYPES)
+        item = {
+            'event_id': event_id,
+            'session_id': session,
+            'event_source': 'website',
+            'event_type': event_type,
+            'timestamp': timestamp(moment),
+            'event_data': {
+                'url': 'https://www.mazda-ejemplo.mx' + rng.choice(PAGES),
+                'duration_ms': Decimal(rng.randint(200, 120000)),
+                'sucursal': rng.choice(SUCURSALES),
+            },
+        }
+        if client_id:
+            item['client_id'] = client_id
+        stats[item['timestamp'][:10]].update({'total': 1, f'type#{event_type}': 1, 'source#website': 1})
+        return item
+
+    with tables['CLIENT_TABLE_NAME'].batch_writer() as clients, \
+            tables['EVENT_TABLE_NAME'].batch_writer() as events, \
+            tables['MESSAGE_TABLE_NAME'].batch_writer() as messages, \
+            tables['VENDEDORES_TABLE_NAME'].batch_writer() as vendedores, \
+            tables['EVENT_STATS_TABLE_NAME'].batch_writer() as event_stats:
+        for i in range(args.vendedores):
+            put('VENDEDORES_TABLE_NAME', vendedores, {
+                'vendedor_id': f'vendedor-{i}', 'nombre': client_name(i), 'email': f'vendedor{i}@example.com',
+                'telefono': f'99900{i:05d}', 'direccion': 'Calle 60 #500', 'ciudad': 'Mérida', 'estado': 'Yucatán',
+                'codigo_postal': '97000', 'sucursal': SUCURSALES[i % len(SUCURSALES)], 'activo': True,
+                'gsi_pk': 'VENDEDORES',
+            })
+
+        for i in range(args.clients):
+            client_id = f'client-{i}'
+            put('CLIENT_TABLE_NAME', clients, {
+                'client_id': client_id, 'name': client_name(i), 'email': f'cliente{i}@example.com',
+                'number': client_number(i), 'number_e164': e164(client_number(i)), 'sucursal': SUCURSALES[i % len(SUCURSALES)],
+                'vendedor_asignado': f'vendedor-{i % max(args.vendedores, 1)}', 'unidad_de_interes': 'CX-30',
+                'numero_catalogo': Decimal(i), 'version': Decimal(1),
+            })
+            for j in range(args.events_per_client):
+                moment = today - timedelta(days=rng.randint(0, 29), minutes=rng.randint(0, 600))
+                put('EVENT_TABLE_NAME', events, event(f'event-{i}-{j}', session_id('client', f'{i}-{j // 5}'), client_id, moment))
+            for j in range(args.messages_per_client):
+                outgoing = j % 2 == 0
+                put('MESSAGE_TABLE_NAME', messages, {
+                    'id_chat': f'chat-{i}', 'fecha': timestamp(today - timedelta(hours=args.messages_per_client - j)),
+                    'de_numero': 'bot' if outgoing else client_number(i),
+                    'para_numero': client_number(i) if outgoing else 'bot',
+                    ('para_numero_e164' if outgoing else 'de_numero_e164'): e164(client_number(i)),
+                    'mensaje': 'Tu expediente de crédito fue aprobado.' if j == 2 else '¿Sigue disponible la CX-30?',
+                })
+
+        # Visitas anónimas: eventos sin cliente, como los del sitio web
+        for i in range(args.clients * args.events_per_client // 4):
+            moment = today - timedelta(days=rng.randint(0, 29), minutes=rng.randint(0, 600))
+            put('EVENT_TABLE_NAME', events, event(f'anonymous-{i}', session_id('anonymous', i // 3), None, moment))
+
+        for i in range(args.requests + 1):
+            put('CLIENT_TABLE_NAME', clients, {
+                'client_id': f'{DISPOSABLE}-{i}', 'name': f'Temporal {i}', 'email': f'{DISPOSABLE}{i}@example.com',
+                'number': disposable_number(i), 'number_e164': e164(disposable_number(i)),
+            })
+            put('EVENT_TABLE_NAME', events, event(f'{DISPOSABLE}-{i}', session_id(DISPOSABLE, i), None, today))
+            for j in range(2):
+                put('MESSAGE_TABLE_NAME', messages, {
+                    'id_chat': f'{DISPOSABLE}-chat-{i}', 'fecha': timestamp(today - timedelta(minutes=j)),
+                    'de_numero': disposable_number(i), 'de_numero_e164': e164(disposable_number(i)),
+                    'para_numero': 'bot', 'mensaje': 'Hola',
+                })
+
+        for day, counters in stats.items():
+            put('EVENT_STATS_TABLE_NAME', event_stats, {'pk': 'DAILY', 'day': day, **counters})
+
+    return {TABLE_NAMES[setting]: count for setting, count in sorted(counts.items())}
+
+
+# Escenarios: (nombre de la ruta, método, función i -> (path, body))
+
+def scenarios(args, today):
+    clients = args.clients
+    day = today.strftime('%Y-%m-%d')
+    week_ago = (today - timedelta(days=6)).strftime('%Y-%m-%d')
+
+    def client(i):
+        return i * 7919 % clients
+
+    def tracker_event(i, prefix):
+        return {
+            'session_id': session_id(prefix, i // 5),
+            'event_source': 'website',
+            'event_type': EVENT_TYPES[i % len(EVENT_TYPES)],
+            'event_data': {'url': 'https://www.mazda-ejemplo.mx' + PAGES[i % len(PAGES)], 'duration_ms': 1200},
+        }
+
+    def new_client(i):
+        return {
+            'client_id': str(uuid.uuid5(uuid.NAMESPACE_URL, f'new-client-{i}')), 'name': f'Nuevo {client_name(i)}', 'email': f'nuevo{i}@example.com', 'number': f'52777{i:07d}',
+            'sucursal': SUCURSALES[i % len(SUCURSALES)], 'session_id': session_id('anonymous', i),
+        }
+
+    def new_vendedor(i):
+        return {
+            'vendedor_id': f'nuevo-vendedor-{i}', 'nombre': f'Vendedor {i}', 'email': f'nuevo.vendedor{i}@example.com',
+            'telefono': '9991234567', 'direccion': 'Calle 60 #500', 'ciudad': 'Mérida', 'estado': 'Yucatán',
+            'codigo_postal': '97000', 'sucursal': SUCURSALES[i % len(SUCURSALES)],
+        }
+
+    return [
+        # Lecturas
+        ('list_clients', 'GET', lambda i: ('/clients/', None)),
+        ('detail_client', 'GET', lambda i: (f'/clients/client-{client(i)}/', None)),
+        ('client-query-by-email', 'GET', lambda i: (f'/clients/query/cliente{client(i)}@example.com/', None)),
+        ('client-query-by-number', 'GET', lambda i: (f'/clients/query/number/{client_number(client(i))}/', None)),
+        ('client-query-by-name', 'GET', lambda i: (f'/clients/query/name/{quote(client_name(client(i)))}/', None)),
+        ('client-search', 'GET', lambda i: (f'/clients/search/?q={quote(client_name(client(i))[:-2] + "z")}', None)),
+        ('client-events', 'GET', lambda i: (f'/clients/client-{client(i)}/events/', None)),
+        ('messages-by-phone-number', 'GET', lambda i: (f'/clients/messages/{client_number(client(i))}/?limit=20', None)),
+        ('messages-to-cliente', 'GET', lambda i: (f'/clients/messages-to-cliente/{client_number(client(i))}/', None)),
+        ('credit-approval-message', 'GET', lambda i: (f'/clients/credit-approval-message/{client_number(client(i))}/', None)),
+        ('batch_get_clients', 'POST', lambda i: (
+            '/clients/batch-get/', {'client_ids': [f'client-{client(i + j)}' for j in range(20)]},
+        )),
+        ('list_events', 'GET', lambda i: ('/events/?page_size=100', None)),
+        ('event-by-id-detail', 'GET', lambda i: (f'/events/event/event-{client(i)}-0/', None)),
+        ('session-events', 'GET', lambda i: (f"/events/session/{session_id('client', f'{client(i)}-0')}/events/", None)),
+        ('today_visits_events', 'GET', lambda i: ('/events/today-visits/', None)),
+        ('events_timeline', 'GET', lambda i: (f'/events/timeline/?from={week_ago}&to={day}', None)),
+        ('events_stats', 'GET', lambda i: (f'/events/stats/?from={week_ago}&to={day}', None)),
+        ('vendedor-list', 'GET', lambda i: ('/vendedores/', None)),
+        ('vendedor-by-id', 'GET', lambda i: (f'/vendedores/vendedor-{i % max(args.vendedores, 1)}/', None)),
+        ('vendedor-by-email', 'GET', lambda i: (
+            f'/vendedores/vendedor/vendedor{i % max(args.vendedores, 1)}@example.com/', None,
+        )),
+        ('vendedor-by-sucursal', 'GET', lambda i: (f'/vendedores/sucursal/?sucursal={quote(SUCURSALES[i % 3])}', None)),
+        ('vendedor-batch-get', 'POST', lambda i: (
+            '/vendedores/batch-get/', {'vendedor_ids': [f'vendedor-{(i + j) % max(args.vendedores, 1)}' for j in range(10)]},
+        )),
+        ('cache-stats', 'GET', lambda i: ('/cache/stats/', None)),
+        ('metrics', 'GET', lambda i: ('/metrics/', None)),
+        # Escrituras
+        ('create_client', 'POST', lambda i: ('/clients/create/', new_client(i))),
+        ('detail_client', 'PUT', lambda i: (f'/clients/client-{client(i)}/', {'unidad_de_interes': f'CX-{i % 90}'})),
+        ('detail_client', 'PATCH', lambda i: (f'/clients/client-{client(i)}/', {'id_chat': f'chat-{client(i)}'})),
+        ('create_event', 'POST', lambda i: ('/events/create/', tracker_event(i, 'load'))),
+        ('batch_create_events', 'POST', lambda i: (
+            '/events/batch/', [tracker_event(i * 25 + j, 'load-batch') for j in range(25)],
+        )),
+        ('event-by-id-detail', 'PUT', lambda i: (
+            f'/events/event/event-{client(i)}-1/', {'event_data': {'url': 'https://www.mazda-ejemplo.mx/', 'edited': i}},
+        )),
+        ('vendedor-create', 'POST', lambda i: ('/vendedores/create/', new_vendedor(i))),
+        # Borrados, sobre datos reservados para ellos
+        ('detail_client', 'DELETE', lambda i: (f'/clients/{DISPOSABLE}-{i}/', None)),
+        ('event-by-id-detail', 'DELETE', lambda i: (f'/events/event/{DISPOSABLE}-{i}/', None)),
+        ('delete-messages-by-phone-number', 'DELETE', lambda i: (f'/clients/messages/delete/{disposable_number(i)}/', None)),
+    ]
+
+
+def api_routes():
+    """(route name, method, pattern) of every view of the project URLconf, without namespaced apps (admin)."""
+    from django.urls import URLPattern, URLResolver, get_resolver
+
+    routes = []
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if not pattern.namespace:
+                    walk(pattern.url_patterns, prefix + str(pattern.pattern))
+                continue
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            view_class = getattr(pattern.callback, 'view_class', None)
+            methods = ['get']
+            if view_class is not None:
+                methods = [
+                    method for method in view_class.http_method_names
+                    if method not in ('head', 'options') and hasattr(view_class, method)
+                ]
+            for method in methods:
+                routes.append((pattern.name, method.upper(), prefix + str(pattern.pattern)))
+
+    walk(get_resolver().url_patterns, '')
+    return routes
+
+
+# Ejecución (proceso hijo, con Django)
+
+class CallCollector:
+    """apiMZD.metrics exporter that keeps the summary of every request of the current endpoint."""
+
+    lock = threading.Lock()
+    summaries = []
+
+    def export(self, summary):
+        with self.lock:
+            self.summaries.append(summary)
+
+    @classmethod
+    def take(cls):
+        with cls.lock:
+            summaries = list(cls.summaries)
+            cls.summaries.clear()
+        return summaries
+
+
+def percentile(values, fraction):
+    return values[max(int(round(len(values) * fraction)) - 1, 0)]
+
+
+def summarize(name, method, route, resolved_to, elapsed, results, summaries):
+    latencies = sorted(latency for latency, _ in results)
+    statuses = Counter(str(status) for _, status in results)
+    operations = Counter()
+    for summary in summaries:
+        for call in summary['calls']:
+            operations[call['operation']] += call['count']
+    requests = len(results)
+    calls = [sum(call['count'] for call in summary['calls']) for summary in summaries] or [0]
+    dynamodb_ms = sorted(summary['dynamodb_seconds'] * 1000 for summary in summaries) or [0.0]
+    entry = {
+        'name': name,
+        'method': method,
+        'route': route,
+        'requests': requests,
+        'statuses': dict(sorted(statuses.items())),
+        'errors': sum(count for status, count in statuses.items() if not status.startswith(('2', '3'))),
+        'requests_per_second': round(requests / elapsed, 1),
+        'latency_ms': {
+            'p50': round(statistics.median(latencies) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2),
+        },
+        'dynamodb': {
+            'calls_per_request': round(statistics.mean(calls), 2),
+            'max_calls': max(calls),
+            'operations': dict(sorted(operations.items())),
+            'read_capacity_per_request': round(sum(s['read_capacity_units'] for s in summaries) / max(len(summaries), 1), 2),
+            'write_capacity_per_request': round(sum(s['write_capacity_units'] for s in summaries) / max(len(summaries), 1), 2),
+            'time_ms_p50': round(statistics.median(dynamodb_ms), 2),
+        },
+    }
+    if resolved_to != name:
+        entry['resolved_to'] = resolved_to
+    return entry
+
+
+def child(args):
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'apiMZD.settings_slim'
+    sys.path.insert(0, str(BASE_DIR))
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import Resolver404, resolve
+    from wsgiref.util import setup_testing_defaults
+
+    application = get_wsgi_application()
+    today = datetime.fromisoformat(args.today)
+    if not args.only or 'client-search' in args.only:
+        from django.core.management import call_command
+
+        call_command('rebuild_client_search', stdout=io.StringIO())
+
+    def request(method, path, body):
+        route, _, query = path.partition('?')
+        payload = json.dumps(body).encode() if body is not None else b''
+        environ = {
+            # PATH_INFO va sin escapar, en bytes UTF-8 leídos como latin-1 (PEP 3333)
+            'PATH_INFO': unquote(route).encode().decode('latin-1'), 'QUERY_STRING': query, 'REQUEST_METHOD': method, 'HTTP_HOST': 'localhost',
+            'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(payload)), 'wsgi.input': io.BytesIO(payload),
+            # /metrics/ y /cache/stats/ exigen el token
+            'HTTP_AUTHORIZATION': f"Bearer {os.environ['ADMIN_API_TOKEN']}",
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+        started = time.perf_counter()
+        response = application(environ, lambda status, headers: statuses.append(status))
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return time.perf_counter() - started, int(statuses[0].split()[0])
+
+    routes = api_routes()
+    patterns = {(name, method): route for name, method, route in routes}
+    selected = [s for s in scenarios(args, today) if not args.only or s[0] in args.only]
+    covered = {(name, method) for name, method, _ in scenarios(args, today)}
+
+    endpoints = []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for name, method, build in selected:
+            path, _ = build(0)
+            try:
+                resolved_to = resolve(path.partition('?')[0]).url_name
+            except Resolver404:
+                resolved_to = None
+
+            # La petición 0 calienta imports, URLconf y conexiones; no se mide
+            request(method, *build(0))
+            CallCollector.take()
+            started = time.perf_counter()
+            results = list(executor.map(lambda i: request(method, *build(i)), range(1, args.requests + 1)))
+            elapsed = time.perf_counter() - started
+            endpoints.append(summarize(
+                name, method, patterns.get((name, method)), resolved_to, elapsed, results, CallCollector.take(),
+            ))
+
+    return {
+        'endpoints': endpoints,
+        'uncovered': [
+            {'name': name, 'method': method, 'route': route}
+            for name, method, route in routes if (name, method) not in covered
+        ],
+    }
+
+
+def start_dynamodb(latency_ms):
+    """Starts a moto server that answers after `latency_ms`; returns (server, endpoint)."""
+    from moto.moto_server.werkzeug_app import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import make_server
+
+    moto_app = DomainDispatcherApplication(create_backend_app)
+
+    def app(environ, start_response):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return moto_app(environ, start_response)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint.')
+    parser.add_argument('--concurrency', type=int, default=8, help='WSGI worker threads.')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--events-per-client', type=int, default=20)
+    parser.add_argument('--messages-per-client', type=int, default=10)
+    parser.add_argument('--vendedores', type=int, default=60)
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Added to every moto call.')
+    parser.add_argument('--endpoint', help='DynamoDB Local URL; the tables must not exist yet.')
+    parser.add_argument('--only', nargs='+', metavar='ROUTE', help='Route names to run (default: all).')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the DynamoDB item cache.')
+    parser.add_argument('--output', help='Also write the JSON report to this file.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--today', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args)))
+        return
+
+    os.environ.update({
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'benchmark'),
+        'ALLOWED_HOSTS': 'localhost',
+        'DEBUG': 'False',
+        'AWS_ACCESS_KEY_ID': os.environ.get('AWS_ACCESS_KEY_ID', 'testing'),
+        'AWS_SECRET_ACCESS_KEY': os.environ.get('AWS_SECRET_ACCESS_KEY', 'testing'),
+        'DYNAMODB_REGION_NAME': 'us-east-1',
+        'DYNAMODB_MAX_POOL_CONNECTIONS': str(max(50, args.concurrency * 2)),
+        'EVENT_WRITE_BEHIND_ENABLED': 'False',
+        'EVENT_STATS_ENABLED': 'True',
+        'METRICS_ENABLED': 'True',
+        'METRICS_EXPORTERS': '__main__.CallCollector',
+        'ADMIN_API_TOKEN': 'benchmark',
+        'CLIENT_SEARCH_PATH': ':memory:',
+        **TABLE_NAMES,
+    })
+    if args.no_cache:
+        os.environ['DYNAMODB_CACHE_BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+
+    server = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        with contextlib.redirect_stdout(sys.stderr):
+            server, endpoint = start_dynamodb(args.latency_ms)
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = endpoint
+
+    # Misma fecha para los datos y los escenarios, aunque la prueba cruce la medianoche
+    from zoneinfo import ZoneInfo
+
+    today = datetime.now(ZoneInfo('America/Mexico_City')).replace(tzinfo=None, microsecond=0)
+    try:
+        started = time.perf_counter()
+        items = seed(create_tables(endpoint), args, today)
+        seed_seconds = time.perf_counter() - started
+
+        command = [
+            sys.executable, __file__, '--child', '--today', today.isoformat(),
+            '--requests', str(args.requests), '--concurrency', str(args.concurrency),
+            '--clients', str(args.clients), '--vendedores', str(args.vendedores),
+        ]
+        if args.only:
+            command += ['--only', *args.only]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        'dynamodb': 'moto' if server is not None else endpoint,
+        'latency_ms': args.latency_ms if server is not None else None,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'cache': not args.no_cache,
+        'seed': {'items': items, 'seconds': round(seed_seconds, 1)},
+        **results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Microbenchmark: DRF's JSONRenderer vs apiMZD.renderers.ORJSONRenderer.
+
+Renders payloads shaped like the responses of ListClientsView,
+ClientEventsView and MessagesByPhoneNumberView, with the Decimal values boto3
+returns for DynamoDB numbers.
+
+Usage (from the repository root):
+
+    python benchmarks/renderers.py --items 100 --repeat 200
+
+Results are printed as JSON (microseconds per render, best of 5 rounds).
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def client_item(i):
+    return {
+        'client_id': str(uuid.uuid4()),
+        'name': f'Cliente {i} Pérez',
+        'email': f'cliente{i}@example.com',
+        'number': f'52999{i:07d}',
+        'vendedor_asignado': str(uuid.uuid4()),
+        'unidad_de_interes': 'CX-30',
+        'sucursal': 'Mérida',
+        'id_chat': f'chat-{i}',
+        'numero_catalogo': Decimal(i),
+        'unidades_de_interes': [{'modelo': 'CX-5', 'anio': Decimal(2024), 'precio': Decimal('589900.50')}],
+    }
+
+
+def event_item(i):
+    return {
+        'event_id': str(uuid.uuid4()),
+        'session_id': str(uuid.uuid4()),
+        'client_id': str(uuid.uuid4()),
+        'event_type': 'page_view' if i % 3 else 'visit_registration',
+        'event_source': 'website',
+        'timestamp': '2026-10-17 10:%02d:00 CST-0600' % (i % 60),
+        'event_data': {
+            'url': f'https://example.com/modelos/{i}',
+            'duration': Decimal(i % 120),
+            'scroll': Decimal('0.75'),
+            'tags': {'cx-30', 'promo'},
+        },
+    }
+
+
+def message_item(i):
+    return {
+        'id_chat': f'chat-{i % 7}',
+        'fecha': '2026-10-17T10:%02d:%02d' % (i % 60, i % 60),
+        'de_numero': '5219991234567' if i % 2 else 'bot',
+        'para_numero': 'bot' if i % 2 else '5219991234567',
+        'mensaje': 'Hola, ¿sigue disponible la CX-30 en color rojo? ' * 2,
+    }
+
+
+def payloads(count):
+    return {
+        'clients': {'clients': [client_item(i) for i in range(count)], 'next_page_token': None},
+        'events': {'events': [event_item(i) for i in range(count)]},
+        'messages': [message_item(i) for i in range(count)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apiMZD.settings')
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+
+    django.setup()
+    from rest_framework.renderers import JSONRenderer
+
+    from apiMZD.renderers import ORJSONRenderer
+
+    renderers = {'drf_json': JSONRenderer(), 'orjson': ORJSONRenderer()}
+    results = {}
+    for name, data in payloads(args.items).items():
+        results[name] = {}
+        for renderer_name, renderer in renderers.items():
+            timer = timeit.Timer(lambda: renderer.render(data, 'application/json'))
+            best = min(timer.repeat(repeat=5, number=args.repeat)) / args.repeat
+            results[name][renderer_name] = {
+                'us_per_render': round(best * 1e6, 1),
+                'bytes': len(renderer.render(data, 'application/json')),
+            }
+        results[name]['speedup'] = round(
+            results[name]['drf_json']['us_per_render'] / results[name]['orjson']['us_per_render'], 1
+        )
+
+    print(json.dumps({'items': args.items, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
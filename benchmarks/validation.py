@@ -0,0 +1,165 @@
+"""
+Microbenchmark: DRF serializer validation vs apiMZD.validation.CompiledSerializer.
+
+Validates payloads shaped like the ones the website tracker sends to
+POST /events/create/ and /events/batch/ (page views, clicks, form submits and
+visit registrations), plus client payloads for POST /clients/create/.
+
+Before timing, every payload (and a set of invalid ones) is validated both
+ways and the results are compared: same validated data for valid input,
+same `serializer.errors` for invalid input.
+
+Usage (from the repository root):
+
+    python benchmarks/validation.py --payloads 500 --repeat 5
+
+Results are printed as JSON (microseconds per validation, best of --repeat
+rounds over every payload).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PAGES = ['/', '/modelos/cx-30', '/modelos/mazda-3-sedan', '/financiamiento', '/agenda-prueba', '/seminuevos?page=2']
+
+
+def tracker_event(rng, i):
+    event_type = rng.choice(['page_view', 'page_view', 'page_view', 'click', 'form_submit', 'visit_registration'])
+    event_data = {
+        'url': 'https://www.mazda-ejemplo.mx' + rng.choice(PAGES),
+        'referrer': rng.choice(['https://www.google.com/', '', 'https://www.facebook.com/']),
+        'title': 'Mazda CX-30 2025 | Agencia',
+        'viewport': {'width': rng.choice([390, 1366, 1920]), 'height': rng.choice([844, 768, 1080])},
+        'utm': {'source': 'facebook', 'medium': 'cpc', 'campaign': 'buen-fin'} if i % 4 == 0 else {},
+        'duration_ms': rng.randint(200, 120000),
+        'scroll_depth': round(rng.random(), 2),
+        'sucursal': rng.choice(['Mérida', 'Cancún', 'Campeche']),
+    }
+    if event_type == 'click':
+        event_data['element'] = {'id': 'btn-cotizar', 'text': 'Cotizar ahora'}
+    if event_type == 'form_submit':
+        event_data['form'] = {'name': 'Ana Pérez', 'email': f'ana{i}@example.com', 'modelo': 'CX-30', 'acepta_aviso': True}
+    event = {
+        'event_id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'session_id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'event_source': 'website',
+        'event_type': event_type,
+        'event_data': event_data,
+    }
+    if i % 3 == 0:
+        event['client_id'] = f'client-{i % 50}'
+    return event
+
+
+def client_payload(i):
+    return {
+        'client_id': str(uuid.uuid4()),
+        'name': f'  Cliente {i} Pérez ',
+        'email': f'cliente{i}@example.com',
+        'number': f'52999{i:07d}',
+        'vendedor_asignado': str(uuid.uuid4()),
+        'unidad_de_interes': 'CX-30',
+        'sucursal': 'Mérida',
+        'numero_catalogo': str(i),
+        'fecha_cumpleanos': None,
+        'unidades_de_interes': [{'modelo': 'CX-5', 'anio': 2024}],
+    }
+
+
+def invalid_payloads():
+    event = tracker_event(random.Random(0), 0)
+    return {
+        'events': [
+            {**event, 'event_id': 'not-a-uuid'},
+            {key: value for key, value in event.items() if key != 'event_type'},
+            {**event, 'event_type': 'x' * 51},
+            {**event, 'event_type': ''},
+            {**event, 'event_type': ['page_view']},
+            {**event, 'event_source': None},
+            {**event, 'timestamp': 'ayer'},
+            {**event, 'event_data': {1, 2}},
+            [event],
+        ],
+        'clients': [
+            {**client_payload(0), 'email': 'no-es-correo'},
+            {**client_payload(0), 'numero_catalogo': 'doce'},
+            {**client_payload(0), 'number': '5' * 16},
+            {**client_payload(0), 'name': True},
+            {key: value for key, value in client_payload(0).items() if key != 'name'},
+        ],
+    }
+
+
+def check_equivalence(serializer_class, compiled, valid, invalid):
+    for data in valid + invalid:
+        serializer = serializer_class(data=data)
+        expected = (dict(serializer.validated_data), None) if serializer.is_valid() else (None, serializer.errors)
+        validated, errors = compiled.validate(data)
+        actual = (dict(validated) if validated is not None else None, errors)
+        if actual != expected:
+            raise AssertionError(f'{serializer_class.__name__} differs for {data!r}: {actual!r} != {expected!r}')
+
+
+def best_us_per_call(function, payloads, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for data in payloads:
+            function(data)
+        best = min(best, time.perf_counter() - started)
+    return round(best / len(payloads) * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apiMZD.settings')
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+
+    django.setup()
+    from api_clients.serializers import ClientSerializer, client_validator
+    from api_events.serializers import EventSerializer, event_validator
+
+    rng = random.Random(42)
+    cases = {
+        'events': (EventSerializer, event_validator, [tracker_event(rng, i) for i in range(args.payloads)]),
+        'clients': (ClientSerializer, client_validator, [client_payload(i) for i in range(args.payloads)]),
+    }
+    invalid = invalid_payloads()
+
+    results = {}
+    for name, (serializer_class, compiled, payloads) in cases.items():
+        check_equivalence(serializer_class, compiled, payloads, invalid[name])
+
+        def drf(data):
+            serializer = serializer_class(data=data)
+            serializer.is_valid()
+            return serializer.validated_data
+
+        drf_us = best_us_per_call(drf, payloads, args.repeat)
+        compiled_us = best_us_per_call(compiled.validate, payloads, args.repeat)
+        results[name] = {
+            'drf_us_per_validation': drf_us,
+            'compiled_us_per_validation': compiled_us,
+            'speedup': round(drf_us / compiled_us, 1),
+            'invalid_payloads_checked': len(invalid[name]),
+        }
+
+    print(json.dumps({'payloads': args.payloads, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()